@@ -0,0 +1,19 @@
+# Конфигурация gunicorn для запуска проекта под ASGI:
+#   gunicorn warehouse.asgi:application -c gunicorn.conf.py
+#
+# Воркеры uvicorn обслуживают async-представления в цикле событий, поэтому
+# медленные клиенты (ТСД на плохом Wi-Fi) не занимают отдельный поток каждый.
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+
+# Медленные клиенты не должны приводить к убийству воркера
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
@@ -3,6 +3,15 @@ ASGI config for warehouse project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Списки (склад, партии, операции, номенклатура) реализованы как async-представления,
+поэтому в рабочем режиме проект запускается под ASGI-сервером, например:
+
+    gunicorn warehouse.asgi:application -c gunicorn.conf.py
+
+или для отладки:
+
+    uvicorn warehouse.asgi:application --reload
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -36,6 +37,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'warehouse_app.routers.replica_pin_middleware',
+    'warehouse_app.profiling.profiling_middleware',
 ]
 
 ROOT_URLCONF = 'warehouse.urls'
@@ -44,18 +47,27 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Скомпилированные шаблоны хранятся в памяти процесса и не читаются
+            # с диска на каждый запрос; при DEBUG автоперезагрузка сбрасывает кэш
+            # после правки шаблона (manage.py bench_render показывает выигрыш)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'warehouse.wsgi.application'
+ASGI_APPLICATION = 'warehouse.asgi.application'
 
 
 # Database
@@ -68,6 +80,17 @@ DATABASES = {
     }
 }
 
+# Реплика для чтения отчётов, журнала и выгрузок (warehouse_app/routers.py):
+# имя базы реплики с теми же параметрами подключения, для SQLite — путь к копии файла
+if os.environ.get('WAREHOUSE_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['WAREHOUSE_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['warehouse_app.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -104,6 +127,95 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# --------------------------------------
+# Фоновые выгрузки
+# Каталог готовых файлов выгрузки
+EXPORT_ROOT = BASE_DIR / 'exports'
+# Выполнять задания в потоке веб-процесса (только для разработки без воркера)
+EXPORT_JOBS_RUN_INLINE = False
+# Полная выгрузка: число процессов (None — по числу ядер) и строк журнала на файл
+EXPORT_PARALLEL_WORKERS = None
+EXPORT_PARTITION_ROWS = 100_000
+# Выгрузка для аналитики (Parquet): строк в группе строк (row group)
+EXPORT_PARQUET_ROW_GROUP = 100_000
+
+# --------------------------------------
+# Кэш (отчёты и прогнозы). В рабочем режиме с несколькими процессами
+# следует указать общий бэкенд, например Redis или Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Отрисованные строки таблиц ({% cache %} в шаблонах списков). Ключ строки
+    # включает её версию, поэтому устаревшие фрагменты не выдаются, а просто
+    # вытесняются по MAX_ENTRIES
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+# Время хранения рассчитанных страниц отчётов, сек
+REPORT_CACHE_TIMEOUT = 300
+
+# --------------------------------------
+# Прогноз расхода (требуется numpy)
+# Глубина истории списаний, дни
+FORECAST_HISTORY_DAYS = 90
+# Окно скользящего среднего, дни
+FORECAST_SMA_WINDOW = 14
+# Коэффициент экспоненциального сглаживания (0..1)
+FORECAST_EWMA_ALPHA = 0.3
+# Горизонт планирования закупок, дни
+FORECAST_HORIZON_DAYS = 14
+
+# --------------------------------------
+# Места хранения
+# Код места, куда принимаются партии, если место не указано
+DEFAULT_STORAGE_LOCATION = "MAIN"
+# Наибольшее количество строк в одном пакетном перемещении
+TRANSFER_MAX_LINES = 1000
+# Число частей сводного остатка на номенклатуру (0 — остаток в одной строке
+# Warehouse). Части снимают очередь на строке популярной номенклатуры;
+# при включении запускайте compact_balance_shards по расписанию
+WAREHOUSE_BALANCE_SHARDS = 0
+
+# --------------------------------------
+# Синхронизация ТСД
+# Наибольшее количество записей журнала изменений в одном ответе /sync/changes/
+SYNC_CHANGES_LIMIT = 5000
+# Поток изменений остатков для страницы склада (Server-Sent Events):
+# период опроса журнала, время жизни соединения и интервал пустых сообщений, сек
+SSE_POLL_SECONDS = 1
+SSE_MAX_SECONDS = 300
+SSE_HEARTBEAT_SECONDS = 15
+# Через сколько браузер переподключается после закрытия соединения, мс
+SSE_RETRY_MS = 2000
+
+# --------------------------------------
+# Реплика для чтения
+# Сколько секунд после POST браузер читает основную базу (видит свои изменения)
+REPLICA_PIN_SECONDS = 10
+# Наибольшее отставание реплики, сек, при котором с неё ещё читают
+REPLICA_MAX_LAG_SECONDS = 5
+# Как часто заново оценивать отставание реплики, сек
+REPLICA_LAG_CHECK_SECONDS = 2
+
+# --------------------------------------
+# Профилирование запросов (warehouse_app/profiling.py)
+# Заголовок, по которому профилируется запрос персонала (X-Profile: 1)
+PROFILE_HEADER = 'X-Profile'
+# Доля случайно профилируемых запросов (0 — только по заголовку)
+PROFILE_SAMPLE_RATE = 0
+# Каталог профилей и сколько последних профилей хранить
+PROFILE_ROOT = BASE_DIR / 'profiles'
+PROFILE_KEEP = 200
+
+# --------------------------------------
+# Архивация журнала операций
+# Операции старше указанного числа дней (целыми месяцами) переносятся в архив
+OPERATION_ARCHIVE_AFTER_DAYS = 365
+
 # --------------------------------------
 # Настройки авторизации
 LOGIN_URL = 'login'
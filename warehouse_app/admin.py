@@ -2,11 +2,12 @@ from django.contrib import admin
 from django.db.models import ProtectedError
 from django.contrib import messages
 from .models import Nomenclature, ProductBatch, Operation, Warehouse
+from .sync import lock_commit_order
 
 
 @admin.register(Nomenclature)
 class NomenclatureAdmin(admin.ModelAdmin):
-    list_display = ("code", "name", "unit", "shelf_life_days")
+    list_display = ("code", "name", "unit", "shelf_life_days", "min_stock", "reorder_point")
     search_fields = ("code", "name")
     
     def delete_model(self, request, obj):
@@ -58,6 +59,13 @@ class OperationAdmin(admin.ModelAdmin):
     list_display = ("operation_type_display", "nomenclature_display", "batch_display", "quantity", "operation_date", "document", "reason")
     list_filter = ("operation_type", "operation_date")
     search_fields = ("batch__batch_number", "nomenclature__name", "document")
+    list_select_related = ("batch", "nomenclature")
+
+    def save_model(self, request, obj, form, change):
+        # Новые операции, как и в проводках, нумеруются в порядке фиксации (incremental.py)
+        if not change:
+            lock_commit_order()
+        super().save_model(request, obj, form, change)
     
     def operation_type_display(self, obj):
         """Отображаем тип операции"""
@@ -65,12 +73,8 @@ class OperationAdmin(admin.ModelAdmin):
     operation_type_display.short_description = "Тип операции"
     
     def nomenclature_display(self, obj):
-        """Отображаем номенклатуру (для списаний)"""
-        if obj.nomenclature:
-            return obj.nomenclature.name
-        elif obj.batch:
-            return obj.batch.nomenclature.name
-        return "—"
+        """Отображаем номенклатуру"""
+        return obj.nomenclature.name if obj.nomenclature else "—"
     nomenclature_display.short_description = "Номенклатура"
     
     def batch_display(self, obj):
@@ -94,19 +98,135 @@ from .models import LiveBatch
 
 @admin.register(LiveBatch)
 class LiveBatchAdmin(admin.ModelAdmin):
-    list_display = ('product_batch', 'current_quantity', 'nomenclature', 'batch_number', 'expiration_date')
-    list_filter = ('product_batch__nomenclature',)
-    search_fields = ('product_batch__batch_number', 'product_batch__nomenclature__name')
+    list_display = ('product_batch', 'location', 'current_quantity', 'nomenclature', 'batch_number', 'expiration_date')
+    list_filter = ('location', 'nomenclature')
+    search_fields = ('product_batch__batch_number', 'nomenclature__name')
+    list_select_related = ('product_batch', 'nomenclature', 'location')
+    actions = ['write_off_expired']
     
     # Вычисляемые поля для отображения
-    def nomenclature(self, obj):
-        return obj.product_batch.nomenclature
-    nomenclature.short_description = "Номенклатура"
-    
     def batch_number(self, obj):
         return obj.product_batch.batch_number
     batch_number.short_description = "Номер партии"
-    
-    def expiration_date(self, obj):
-        return obj.product_batch.expiration_date
-    expiration_date.short_description = "Срок годности"
\ No newline at end of file
+
+    @admin.action(description="Списать просроченные из выбранных")
+    def write_off_expired(self, request, queryset):
+        from .stock import write_off_expired
+        count = write_off_expired(live_batch_ids=list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f"Списано просроченных партий: {count}")
+
+from .models import ExportJob
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('started_at', 'finished_at', 'file_path', 'error')
+
+
+from .models import OperationArchive, ArchivedPeriod, OperationPeriodSummary, OperationReasonSummary
+
+@admin.register(OperationArchive)
+class OperationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'operation_type', 'nomenclature', 'batch', 'quantity', 'operation_date', 'period')
+    list_filter = ('operation_type', 'period')
+    search_fields = ('batch__batch_number', 'nomenclature__name', 'document')
+
+
+@admin.register(ArchivedPeriod)
+class ArchivedPeriodAdmin(admin.ModelAdmin):
+    list_display = ('period', 'operations_count', 'archived_at')
+
+
+@admin.register(OperationPeriodSummary)
+class OperationPeriodSummaryAdmin(admin.ModelAdmin):
+    list_display = ('period', 'nomenclature', 'received', 'deducted')
+    list_filter = ('period',)
+    search_fields = ('nomenclature__name', 'nomenclature__code')
+
+
+@admin.register(OperationReasonSummary)
+class OperationReasonSummaryAdmin(admin.ModelAdmin):
+    list_display = ('period', 'nomenclature', 'reason', 'deducted')
+    list_filter = ('period', 'reason')
+    search_fields = ('nomenclature__name', 'nomenclature__code')
+
+
+from .models import IdempotencyKey
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'scope', 'created_at', 'result')
+    list_filter = ('scope',)
+    search_fields = ('key',)
+
+
+from .models import StockAlert
+
+@admin.register(StockAlert)
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = ('nomenclature', 'level', 'quantity', 'threshold', 'created_at', 'resolved_at')
+    list_filter = ('level', ('resolved_at', admin.EmptyFieldListFilter))
+    list_select_related = ('nomenclature',)
+    search_fields = ('nomenclature__name', 'nomenclature__code')
+
+
+from .models import StorageLocation, LocationStock
+
+@admin.register(StorageLocation)
+class StorageLocationAdmin(admin.ModelAdmin):
+    list_display = ('code', 'site', 'zone', 'bin', 'is_active')
+    list_filter = ('site', 'is_active')
+    search_fields = ('code', 'site', 'zone', 'bin')
+
+
+@admin.register(LocationStock)
+class LocationStockAdmin(admin.ModelAdmin):
+    list_display = ('location', 'nomenclature', 'current_quantity')
+    list_filter = ('location',)
+    search_fields = ('nomenclature__name', 'nomenclature__code', 'location__code')
+    list_select_related = ('location', 'nomenclature')
+
+
+from .models import StocktakeSession, StocktakeLine
+
+@admin.register(StocktakeSession)
+class StocktakeSessionAdmin(admin.ModelAdmin):
+    list_display = ('document', 'location', 'status', 'created_by', 'created_at', 'posted_at')
+    list_filter = ('status', 'location')
+    search_fields = ('document',)
+    filter_horizontal = ('nomenclatures',)
+
+
+@admin.register(StocktakeLine)
+class StocktakeLineAdmin(admin.ModelAdmin):
+    list_display = ('session', 'product_batch', 'location', 'expected_quantity', 'counted_quantity', 'variance')
+    list_filter = ('session__status',)
+    search_fields = ('session__document', 'product_batch__batch_number')
+    list_select_related = ('session', 'product_batch', 'location')
+
+
+from .models import ChangeLog
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ('seq', 'entity', 'object_id', 'deleted', 'created_at')
+    list_filter = ('entity', 'deleted')
+    readonly_fields = ('seq', 'entity', 'object_id', 'deleted', 'created_at')
+
+
+from .models import ExportWatermark
+
+@admin.register(ExportWatermark)
+class ExportWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('consumer', 'last_operation_id', 'updated_at')
+    search_fields = ('consumer',)
+
+
+from .models import WarehouseBalanceShard
+
+@admin.register(WarehouseBalanceShard)
+class WarehouseBalanceShardAdmin(admin.ModelAdmin):
+    list_display = ('nomenclature', 'shard', 'delta')
+    search_fields = ('nomenclature__code', 'nomenclature__name')
+    list_select_related = ('nomenclature',)
@@ -0,0 +1,83 @@
+"""
+Оповещения об остатках: точка заказа и минимальный остаток.
+
+После каждой приёмки и списания (после фиксации транзакции) проверяются
+только затронутые номенклатуры. Команда check_stock_levels проверяет все
+номенклатуры с заданными порогами одним запросом.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .balances import balance_expression
+from .models import Nomenclature, StockAlert
+
+logger = logging.getLogger(__name__)
+
+
+def alert_level(quantity, min_stock, reorder_point):
+    """Уровень оповещения для остатка: (уровень, порог) или (None, None)"""
+    if min_stock is not None and quantity < min_stock:
+        return "critical", min_stock
+    if reorder_point is not None and quantity <= reorder_point:
+        return "reorder", reorder_point
+    return None, None
+
+
+def evaluate_stock_levels(nomenclature_ids=None):
+    """
+    Сверяет остатки с порогами и обновляет открытые оповещения.
+    nomenclature_ids — какие номенклатуры проверять (None — все).
+    Возвращает (создано оповещений, снято оповещений).
+    """
+    items = Nomenclature.objects.filter(Q(min_stock__isnull=False) | Q(reorder_point__isnull=False))
+    open_alerts = StockAlert.objects.filter(resolved_at__isnull=True)
+    if nomenclature_ids is not None:
+        items = items.filter(id__in=nomenclature_ids)
+        open_alerts = open_alerts.filter(nomenclature_id__in=nomenclature_ids)
+
+    # Остатки и пороги — одним запросом с присоединением склада
+    levels = items.annotate(
+        quantity=Coalesce(balance_expression('warehouse_item__current_quantity', 'id'), 0.0)
+    ).values_list('id', 'quantity', 'min_stock', 'reorder_point')
+    open_alerts = {alert.nomenclature_id: alert for alert in open_alerts}
+
+    now = timezone.now()
+    to_create = []
+    for nomenclature_id, quantity, min_stock, reorder_point in levels:
+        level, threshold = alert_level(quantity, min_stock, reorder_point)
+        alert = open_alerts.get(nomenclature_id)
+        if alert is not None and alert.level == level:
+            open_alerts.pop(nomenclature_id)  # оповещение остаётся открытым
+            continue
+        if level is not None:
+            to_create.append(StockAlert(
+                nomenclature_id=nomenclature_id,
+                level=level,
+                quantity=quantity,
+                threshold=threshold,
+                created_at=now
+            ))
+
+    # Оставшиеся открытые оповещения устарели: остаток восстановлен,
+    # уровень изменился или пороги сняты
+    resolved = StockAlert.objects.filter(id__in=[a.id for a in open_alerts.values()]).update(resolved_at=now)
+    StockAlert.objects.bulk_create(to_create)
+    return len(to_create), resolved
+
+
+def _evaluate_safely(nomenclature_ids):
+    try:
+        evaluate_stock_levels(nomenclature_ids)
+    except Exception:
+        # Проводка уже зафиксирована; оповещения догонит check_stock_levels
+        logger.exception("Ошибка проверки остатков %s", nomenclature_ids)
+
+
+def schedule_stock_check(nomenclature_ids):
+    """Проверяет остатки указанных номенклатур после фиксации текущей транзакции"""
+    nomenclature_ids = list(nomenclature_ids)
+    transaction.on_commit(lambda: _evaluate_safely(nomenclature_ids))
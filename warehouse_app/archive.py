@@ -0,0 +1,184 @@
+"""
+Архивация журнала операций по закрытым периодам.
+
+Операции месяцев, целиком лежащих до даты отсечения, переносятся из Operation
+в OperationArchive, а по каждому месяцу и номенклатуре сохраняются итоги
+(OperationPeriodSummary) и списания по причинам (OperationReasonSummary). Оперативная таблица остаётся небольшой, а журнал
+(operation_list) сам выбирает, откуда читать, по запрошенному периоду.
+"""
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedPeriod, Operation, OperationArchive, OperationPeriodSummary, OperationReasonSummary
+
+# Поля журнала в порядке модели: одинаковы у Operation и OperationArchive
+JOURNAL_FIELDS = [
+    'id', 'batch', 'nomenclature', 'operation_type', 'operation_date',
+    'quantity', 'reason', 'document', 'note', 'location',
+]
+
+# По каким полям можно сортировать объединённый (оперативный + архив) журнал
+UNION_ORDERING = {'operation_type', 'operation_date', 'quantity'}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timezone.timedelta(days=4)).replace(day=1)
+
+
+def _aware(day):
+    """Начало дня в текущем часовом поясе"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def archive_boundary():
+    """Момент, до которого операции перенесены в архив (None — архива нет)"""
+    last = ArchivedPeriod.objects.order_by('-period').first()
+    return _aware(next_month(last.period)) if last else None
+
+
+async def aarchive_boundary():
+    last = await ArchivedPeriod.objects.order_by('-period').afirst()
+    return _aware(next_month(last.period)) if last else None
+
+
+def journal_queryset(filters, start, end, boundary, order_by):
+    """
+    Выбирает источник журнала по запрошенному периоду:
+    после границы архива — оперативная таблица, до границы — архив,
+    период через границу (в том числе без начальной даты) — объединение обеих таблиц.
+    Без дат журнал показывает только оперативную таблицу.
+    Возвращает (queryset, признак объединения).
+    """
+    hot = Operation.objects.filter(filters)
+    if boundary is None or (start is None and end is None) or (start is not None and start >= boundary):
+        return hot.order_by(order_by), False
+
+    archived = OperationArchive.objects.filter(filters)
+    if end and end < boundary:
+        return archived.order_by(order_by), False
+
+    # union() не допускает сортировку по связанным полям
+    if order_by.lstrip('-') not in UNION_ORDERING:
+        order_by = '-operation_date'
+    combined = hot.only(*JOURNAL_FIELDS).order_by().union(
+        archived.only(*JOURNAL_FIELDS).order_by(),
+        all=True
+    )
+    return combined.order_by(order_by), True
+
+
+def _add_to_summaries(period, operations):
+    """Добавляет операции пачки к итогам периода по номенклатуре и по причинам списания"""
+    totals = defaultdict(lambda: {'received': 0, 'deducted': 0})
+    by_reason = defaultdict(float)
+    for op in operations:
+        nomenclature_id = op.nomenclature_id
+        if nomenclature_id is None:
+            continue
+        if op.operation_type == "reception":
+            totals[nomenclature_id]['received'] += op.quantity
+        elif op.operation_type == "deduction":
+            totals[nomenclature_id]['deducted'] += op.quantity
+            if op.reason:
+                by_reason[(nomenclature_id, op.reason)] += op.quantity
+
+    existing = {
+        s.nomenclature_id: s
+        for s in OperationPeriodSummary.objects.filter(period=period, nomenclature_id__in=totals)
+    }
+    to_create = []
+    for nomenclature_id, values in totals.items():
+        summary = existing.get(nomenclature_id)
+        if summary is None:
+            to_create.append(OperationPeriodSummary(period=period, nomenclature_id=nomenclature_id, **values))
+        else:
+            summary.received += values['received']
+            summary.deducted += values['deducted']
+    OperationPeriodSummary.objects.bulk_create(to_create)
+    OperationPeriodSummary.objects.bulk_update(existing.values(), ['received', 'deducted'])
+
+    existing = {
+        (s.nomenclature_id, s.reason): s
+        for s in OperationReasonSummary.objects.filter(
+            period=period, nomenclature_id__in={nomenclature_id for nomenclature_id, _ in by_reason}
+        )
+    }
+    to_create = []
+    for (nomenclature_id, reason), deducted in by_reason.items():
+        summary = existing.get((nomenclature_id, reason))
+        if summary is None:
+            to_create.append(OperationReasonSummary(
+                period=period, nomenclature_id=nomenclature_id, reason=reason, deducted=deducted
+            ))
+        else:
+            summary.deducted += deducted
+    OperationReasonSummary.objects.bulk_create(to_create)
+    OperationReasonSummary.objects.bulk_update(existing.values(), ['deducted'])
+
+
+def archive_operations(cutoff, chunk_size=5000, log=None):
+    """
+    Переносит в архив операции всех месяцев до месяца даты cutoff.
+    Каждая пачка переносится в своей транзакции вместе с итогами периода,
+    поэтому прерванную архивацию можно просто запустить повторно.
+    Возвращает количество перенесённых операций.
+    """
+    border_month = month_start(cutoff)
+    first = Operation.objects.filter(operation_date__lt=_aware(border_month)).order_by('operation_date').first()
+    if first is None:
+        return 0
+
+    moved_total = 0
+    period = month_start(timezone.localtime(first.operation_date).date())
+    while period < border_month:
+        month_ops = Operation.objects.filter(
+            operation_date__gte=_aware(period),
+            operation_date__lt=_aware(next_month(period))
+        ).order_by('id')
+
+        moved = 0
+        while True:
+            with transaction.atomic():
+                chunk = list(month_ops[:chunk_size])
+                if not chunk:
+                    break
+                OperationArchive.objects.bulk_create([
+                    OperationArchive(
+                        id=op.id,
+                        batch_id=op.batch_id,
+                        nomenclature_id=op.nomenclature_id,
+                        operation_type=op.operation_type,
+                        operation_date=op.operation_date,
+                        quantity=op.quantity,
+                        reason=op.reason,
+                        document=op.document,
+                        note=op.note,
+                        period=period,
+                        location_id=op.location_id,
+                    )
+                    for op in chunk
+                ])
+                _add_to_summaries(period, chunk)
+                Operation.objects.filter(id__in=[op.id for op in chunk]).delete()
+
+                archived_period, _ = ArchivedPeriod.objects.get_or_create(period=period)
+                archived_period.operations_count += len(chunk)
+                archived_period.archived_at = timezone.now()
+                archived_period.save()
+            moved += len(chunk)
+
+        # Пустой месяц тоже считается закрытым, чтобы граница архива была точной
+        ArchivedPeriod.objects.get_or_create(period=period)
+        if moved and log:
+            log(f"  {period:%m.%Y}: перенесено операций {moved}")
+        moved_total += moved
+        period = next_month(period)
+
+    return moved_total
@@ -0,0 +1,45 @@
+"""
+Чтение сводного остатка с учётом частей (WarehouseBalanceShard).
+
+При WAREHOUSE_BALANCE_SHARDS = 0 (по умолчанию) остаток — это
+Warehouse.current_quantity. При N > 0 проводки пишут изменения в N частей
+номенклатуры, и остаток = Warehouse.current_quantity + сумма частей; сумма
+считается подзапросом по уникальному индексу (номенклатура, часть).
+
+Перед отключением частей (N -> 0) выполните manage.py compact_balance_shards,
+иначе не перенесённые изменения перестанут учитываться.
+"""
+from django.conf import settings
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import WarehouseBalanceShard
+
+
+def shards_enabled():
+    return settings.WAREHOUSE_BALANCE_SHARDS > 0
+
+
+def balance_expression(quantity='current_quantity', nomenclature='nomenclature_id'):
+    """
+    Выражение остатка для запроса: quantity — путь к Warehouse.current_quantity,
+    nomenclature — путь к id номенклатуры (от Nomenclature: 'warehouse_item__current_quantity', 'id')
+    """
+    if not shards_enabled():
+        return F(quantity)
+    shard_sum = (
+        WarehouseBalanceShard.objects
+        .filter(nomenclature_id=OuterRef(nomenclature))
+        .order_by()
+        .values('nomenclature_id')
+        .annotate(total=Sum('delta'))
+        .values('total')
+    )
+    return Coalesce(F(quantity), Value(0.0)) + Coalesce(
+        Subquery(shard_sum, output_field=FloatField()), Value(0.0)
+    )
+
+
+def with_balance(queryset):
+    """Warehouse queryset с аннотацией balance — актуальным сводным остатком"""
+    return queryset.annotate(balance=balance_expression())
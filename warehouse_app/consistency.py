@@ -0,0 +1,191 @@
+"""
+Сверка остатков: Warehouse, LiveBatch и журнал операций.
+
+Остаток номенклатуры хранится в трёх местах: сводный Warehouse.current_quantity,
+сумма остатков активных партий LiveBatch и сальдо журнала операций (с учётом
+итогов архивных периодов). Каждая сумма считается одним сгруппированным запросом.
+Остатки по местам хранения (LocationStock) сверяются с партиями этих мест.
+"""
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .balances import with_balance
+from .models import (
+    LiveBatch, LocationStock, Nomenclature, Operation, OperationPeriodSummary, Warehouse, WarehouseBalanceShard,
+)
+from .reports import net_quantity
+from .sync import record_changes
+
+# Допустимое расхождение из-за округления чисел с плавающей точкой
+TOLERANCE = 1e-6
+
+
+def live_batch_totals(nomenclature_ids=None):
+    live = LiveBatch.objects.all()
+    if nomenclature_ids is not None:
+        live = live.filter(nomenclature_id__in=nomenclature_ids)
+    return dict(
+        live.values('nomenclature_id')
+        .annotate(total=Sum('current_quantity'))
+        .order_by()
+        .values_list('nomenclature_id', 'total')
+    )
+
+
+def journal_totals():
+    """Сальдо журнала по номенклатуре: оперативная таблица + итоги архивных периодов"""
+    totals = dict(
+        Operation.objects
+        .values('nomenclature_id')
+        .annotate(total=Sum(net_quantity()))
+        .order_by()
+        .values_list('nomenclature_id', 'total')
+    )
+    archived = (
+        OperationPeriodSummary.objects
+        .values('nomenclature_id')
+        .annotate(total=Sum(F('received') - F('deducted')))
+        .order_by()
+        .values_list('nomenclature_id', 'total')
+    )
+    for nomenclature_id, total in archived:
+        totals[nomenclature_id] = totals.get(nomenclature_id, 0) + total
+    return totals
+
+
+def find_mismatches():
+    """
+    Возвращает список расхождений: словари с id номенклатуры и тремя остатками
+    (warehouse, live, journal). Номенклатура без строки склада считается с нулём.
+    """
+    warehouse = dict(with_balance(Warehouse.objects).values_list('nomenclature_id', 'balance'))
+    live = live_batch_totals()
+    journal = journal_totals()
+
+    mismatches = []
+    for nomenclature_id in sorted(set(warehouse) | set(live) | set(journal)):
+        values = {
+            'warehouse': warehouse.get(nomenclature_id, 0),
+            'live': live.get(nomenclature_id, 0),
+            'journal': journal.get(nomenclature_id, 0),
+        }
+        if (abs(values['warehouse'] - values['live']) > TOLERANCE
+                or abs(values['live'] - values['journal']) > TOLERANCE):
+            mismatches.append({'nomenclature_id': nomenclature_id, **values})
+    return mismatches
+
+
+def touch_nomenclatures(nomenclature_ids):
+    """
+    Исправление остатка не создаёт операцию, поэтому версию данных (versions.py)
+    сдвигаем, обновив отметку изменения номенклатуры, и передаём остатки на ТСД
+    """
+    if nomenclature_ids:
+        Nomenclature.objects.filter(id__in=nomenclature_ids).update(updated_at=timezone.now())
+        record_changes("stock", nomenclature_ids)
+
+
+def repair_warehouse(nomenclature_ids):
+    """
+    Приводит сводный остаток к сумме остатков активных партий.
+    Части остатка и строки склада блокируются, суммы партий пересчитываются
+    внутри транзакции, поэтому параллельные проводки не теряются.
+    Возвращает число исправленных строк.
+    """
+    with transaction.atomic():
+        shards = {}
+        for nomenclature_id, delta in (
+            WarehouseBalanceShard.objects.select_for_update()
+            .filter(nomenclature_id__in=nomenclature_ids).exclude(delta=0)
+            .order_by('nomenclature_id', 'shard').values_list('nomenclature_id', 'delta')
+        ):
+            shards[nomenclature_id] = shards.get(nomenclature_id, 0) + delta
+        rows = {
+            w.nomenclature_id: w
+            for w in Warehouse.objects.select_for_update().filter(nomenclature_id__in=nomenclature_ids)
+        }
+        live = live_batch_totals(nomenclature_ids)
+
+        to_update = []
+        for nomenclature_id, row in rows.items():
+            total = live.get(nomenclature_id, 0)
+            if abs(row.current_quantity + shards.get(nomenclature_id, 0) - total) > TOLERANCE:
+                # Части исправленной номенклатуры обнуляются ниже
+                row.current_quantity = total
+                to_update.append(row)
+        to_create = [
+            Warehouse(nomenclature_id=nomenclature_id, current_quantity=total)
+            for nomenclature_id, total in live.items()
+            if nomenclature_id not in rows
+        ]
+        Warehouse.objects.bulk_update(to_update, ['current_quantity'], batch_size=1000)
+        Warehouse.objects.bulk_create(to_create, batch_size=1000)
+        WarehouseBalanceShard.objects.filter(
+            nomenclature_id__in=[row.nomenclature_id for row in to_update + to_create]
+        ).update(delta=0)
+        touch_nomenclatures([row.nomenclature_id for row in to_update + to_create])
+    return len(to_update) + len(to_create)
+
+
+def find_location_mismatches():
+    """Расхождения LocationStock с суммой партий места: [(место, номенклатура, остаток, партии)]"""
+    stock = {
+        (location_id, nomenclature_id): quantity
+        for location_id, nomenclature_id, quantity
+        in LocationStock.objects.values_list('location_id', 'nomenclature_id', 'current_quantity')
+    }
+    live = {
+        (location_id, nomenclature_id): total
+        for location_id, nomenclature_id, total in (
+            LiveBatch.objects
+            .values('location_id', 'nomenclature_id')
+            .annotate(total=Sum('current_quantity'))
+            .order_by()
+            .values_list('location_id', 'nomenclature_id', 'total')
+        )
+    }
+    mismatches = []
+    for location_id, nomenclature_id in sorted(set(stock) | set(live)):
+        key = (location_id, nomenclature_id)
+        if abs(stock.get(key, 0) - live.get(key, 0)) > TOLERANCE:
+            mismatches.append((location_id, nomenclature_id, stock.get(key, 0), live.get(key, 0)))
+    return mismatches
+
+
+def repair_location_stock(mismatches):
+    """Приводит LocationStock к сумме остатков партий места; возвращает число исправленных строк"""
+    with transaction.atomic():
+        keys = {(location_id, nomenclature_id) for location_id, nomenclature_id, _, _ in mismatches}
+        nomenclature_ids = {nomenclature_id for _, nomenclature_id in keys}
+        rows = {
+            (row.location_id, row.nomenclature_id): row
+            for row in LocationStock.objects.select_for_update().filter(nomenclature_id__in=nomenclature_ids)
+            if (row.location_id, row.nomenclature_id) in keys
+        }
+        live = dict(
+            ((location_id, nomenclature_id), total)
+            for location_id, nomenclature_id, total in (
+                LiveBatch.objects
+                .filter(nomenclature_id__in=nomenclature_ids)
+                .values('location_id', 'nomenclature_id')
+                .annotate(total=Sum('current_quantity'))
+                .order_by()
+                .values_list('location_id', 'nomenclature_id', 'total')
+            )
+        )
+
+        to_update = []
+        to_create = []
+        for key in keys:
+            total = live.get(key, 0)
+            row = rows.get(key)
+            if row is None:
+                to_create.append(LocationStock(location_id=key[0], nomenclature_id=key[1], current_quantity=total))
+            elif abs(row.current_quantity - total) > TOLERANCE:
+                row.current_quantity = total
+                to_update.append(row)
+        LocationStock.objects.bulk_update(to_update, ['current_quantity'], batch_size=1000)
+        LocationStock.objects.bulk_create(to_create, batch_size=1000)
+        touch_nomenclatures({row.nomenclature_id for row in to_update + to_create})
+    return len(to_update) + len(to_create)
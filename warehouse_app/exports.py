@@ -0,0 +1,241 @@
+"""
+Фоновые выгрузки данных.
+
+Представление export_data только ставит задание ExportJob в очередь,
+а файл формирует воркер (manage.py run_export_worker) вне потока запроса.
+openpyxl и pyarrow импортируются внутри функций построения файлов, чтобы их
+загрузка не замедляла запуск веб-процессов и команд, которые ничего не выгружают.
+Если подключена реплика (routers.py) и на ней уже есть данные версии задания,
+файл строится по реплике.
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .balances import with_balance
+from .models import ExportJob, Operation, Warehouse
+from .routers import reading_replica, replica_reads
+from .versions import data_version
+
+logger = logging.getLogger(__name__)
+
+
+def export_root():
+    """Каталог для готовых файлов выгрузки"""
+    root = Path(settings.EXPORT_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+OPERATIONS_HEADER = [
+    "ID", "Тип операции", "Номер партии", "Продукция",
+    "Дата операции", "Количество", "Причина", "Документ", "Примечание"
+]
+
+
+def write_operations_xlsx(path, operations, title="Журнал операций"):
+    """Записывает операции из queryset в xlsx-файл; возвращает число строк"""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(OPERATIONS_HEADER)
+    count = 0
+    operations = operations.select_related('batch', 'nomenclature').order_by('id')
+    for op in operations.iterator(chunk_size=2000):
+        batch_number = op.batch.batch_number if op.batch else "—"
+        product_name = op.nomenclature.name if op.nomenclature else "—"
+        ws.append([
+            op.id,
+            op.get_operation_type_display(),
+            batch_number,
+            product_name,
+            op.operation_date.strftime("%Y-%m-%d %H:%M:%S"),
+            op.quantity,
+            op.reason or '',
+            op.document or '',
+            op.note or ''
+        ])
+        count += 1
+    wb.save(path)
+    return count
+
+
+def build_operations_xlsx(path, params):
+    """Журнал операций в xlsx"""
+    write_operations_xlsx(path, Operation.objects.all())
+
+
+def build_operations_incremental_xlsx(path, params):
+    """Операции после отметки получателя (диапазон id задан при постановке в очередь)"""
+    from .incremental import increment_queryset
+    write_operations_xlsx(
+        path,
+        increment_queryset(params['from_id'], params['to_id']),
+        title="Новые операции"
+    )
+
+
+def build_warehouse_xlsx(path, params, using=None):
+    """Складские остатки в xlsx; using — база для чтения (из дочерних процессов выгрузки)"""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Складские остатки")
+    ws.append(["Код продукции", "Наименование", "Текущий остаток"])
+    warehouses = with_balance(Warehouse.objects.using(using).select_related('nomenclature')).order_by('nomenclature__code')
+    for w in warehouses.iterator(chunk_size=2000):
+        ws.append([w.nomenclature.code, w.nomenclature.name, w.balance])
+    wb.save(path)
+
+
+def build_movement_xlsx(path, params):
+    """Отчёт о движении продукции за период в xlsx"""
+    import openpyxl
+    from .reports import movement_report
+
+    start = parse_date(params['start_date'])
+    end = parse_date(params['end_date'])
+    reasons, rows = movement_report(start, end)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Движение продукции")
+    ws.append([f"Период: {start:%d.%m.%Y} — {end:%d.%m.%Y}"])
+    ws.append(
+        ["Код продукции", "Наименование", "Ед. изм.", "Начальный остаток", "Приход", "Расход"]
+        + [f"Расход: {reason}" for reason in reasons]
+        + ["Расход: прочее", "Конечный остаток", "Оборачиваемость, дн."]
+    )
+    for row in rows:
+        ws.append(
+            [row['code'], row['name'], row['unit'], row['opening'], row['received'], row['deducted']]
+            + row['by_reason']
+            + [row['other_reasons'], row['closing'], row['turnover_days']]
+        )
+    wb.save(path)
+
+
+def build_everything_zip(path, params):
+    """Полная выгрузка: журнал по частям в пуле процессов + остатки, в одном zip"""
+    from .parallel_export import build_everything_archive
+    build_everything_archive(path, workers=params.get('workers'))
+
+
+def build_parquet_zip(path, params):
+    """Журнал операций, партии и остатки в Parquet для аналитики, в одном zip"""
+    from .parquet_export import build_parquet_archive
+    build_parquet_archive(path)
+
+
+# Тип выгрузки -> (функция построения, расширение файла)
+EXPORT_BUILDERS = {
+    "operations": (build_operations_xlsx, "xlsx"),
+    "warehouse": (build_warehouse_xlsx, "xlsx"),
+    "everything": (build_everything_zip, "zip"),
+    "movement": (build_movement_xlsx, "xlsx"),
+    "parquet": (build_parquet_zip, "zip"),
+    "operations_incremental": (build_operations_incremental_xlsx, "xlsx"),
+}
+
+# Выгрузка -> части версии данных (versions.py), от которых зависит её файл
+EXPORT_VERSION_PARTS = {
+    "operations": ('operations', 'nomenclature', 'batches'),
+    "warehouse": ('operations', 'nomenclature', 'warehouse'),
+    "everything": ('operations', 'nomenclature', 'batches', 'warehouse'),
+    "movement": ('operations', 'archive', 'nomenclature'),
+    "parquet": ('operations', 'nomenclature', 'batches', 'warehouse'),
+    "operations_incremental": ('operations', 'nomenclature', 'batches'),
+}
+
+# Инкрементальная выгрузка сдвигает отметку получателя и читает только основную базу
+REPLICA_EXPORT_KINDS = {"operations", "warehouse", "everything", "movement", "parquet"}
+
+
+def enqueue_export(kind, user=None, params=None):
+    """Ставит выгрузку в очередь и возвращает задание"""
+    job = ExportJob.objects.create(kind=kind, params=params or {}, created_by=user)
+    if getattr(settings, 'EXPORT_JOBS_RUN_INLINE', False):
+        # Режим разработки: выполняем задание в фоновом потоке текущего процесса
+        threading.Thread(target=run_pending_jobs, daemon=True).start()
+    return job
+
+
+def claim_next_job():
+    """
+    Забирает самое старое задание из очереди.
+    Захват выполняется условным UPDATE, поэтому несколько воркеров
+    не возьмут одно и то же задание.
+    """
+    pending = ExportJob.objects.filter(status="pending").order_by('created_at')
+    for job_id in pending.values_list('id', flat=True)[:10]:
+        claimed = ExportJob.objects.filter(pk=job_id, status="pending").update(
+            status="running",
+            started_at=timezone.now()
+        )
+        if claimed:
+            return ExportJob.objects.get(pk=job_id)
+    return None
+
+
+def requeue_stale_jobs(timeout):
+    """Возвращает в очередь задания, «зависшие» после падения воркера"""
+    border = timezone.now() - timezone.timedelta(seconds=timeout)
+    return ExportJob.objects.filter(status="running", started_at__lt=border).update(
+        status="pending",
+        started_at=None
+    )
+
+
+def replica_has_version(job):
+    """
+    Реплика уже содержит данные той версии, под которой задание поставлено в очередь.
+    Иначе файл, построенный с отстающей реплики, выдавался бы повторно как актуальный.
+    """
+    if job.kind not in REPLICA_EXPORT_KINDS or 'version' not in job.params:
+        return False
+    with replica_reads():
+        return reading_replica() and data_version(*EXPORT_VERSION_PARTS[job.kind]) == job.params['version']
+
+
+def run_job(job):
+    """Формирует файл выгрузки для задания и фиксирует результат"""
+    builder, extension = EXPORT_BUILDERS[job.kind]
+    path = export_root() / f"{job.kind}_{job.pk}.{extension}"
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    try:
+        with replica_reads(replica_has_version(job)):
+            builder(tmp_path, job.params)
+        os.replace(tmp_path, path)
+    except Exception as exc:
+        logger.exception("Ошибка выгрузки %s", job)
+        if tmp_path.exists():
+            tmp_path.unlink()
+        job.status = "failed"
+        job.error = str(exc)
+    else:
+        job.status = "done"
+        job.file_path = str(path)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'file_path', 'finished_at'])
+    return job
+
+
+def run_pending_jobs():
+    """Выполняет все задания из очереди; возвращает количество выполненных"""
+    processed = 0
+    try:
+        while True:
+            job = claim_next_job()
+            if job is None:
+                return processed
+            run_job(job)
+            processed += 1
+    finally:
+        close_old_connections()
@@ -0,0 +1,114 @@
+"""
+Прогноз расхода продукции для планирования закупок.
+
+История списаний за последние FORECAST_HISTORY_DAYS дней выбирается одним
+сгруппированным запросом (номенклатура, день) и раскладывается в матрицу
+NumPy «номенклатура × день». Скользящее среднее, экспоненциальное
+сглаживание и запас в днях считаются сразу для всех номенклатур.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .balances import balance_expression
+from .models import Nomenclature, Operation
+from .reports import period_bounds
+
+
+def daily_deductions(start, end):
+    """Списания по номенклатурам и дням: [(id номенклатуры, дата, количество)]"""
+    start_dt, end_dt = period_bounds(start, end)
+    return (
+        Operation.objects
+        .filter(operation_type="deduction", operation_date__gte=start_dt, operation_date__lt=end_dt)
+        .annotate(day=TruncDate('operation_date'))
+        .values('nomenclature_id', 'day')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+        .values_list('nomenclature_id', 'day', 'total')
+    )
+
+
+def ewma_weights(days, alpha):
+    """
+    Веса экспоненциального сглаживания s_t = a*x_t + (1-a)*s_(t-1), s_0 = x_0:
+    итоговое значение s_(n-1) равно скалярному произведению ряда на эти веса.
+    """
+    import numpy as np
+
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=float)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return weights
+
+
+def compute_forecast(end=None, history_days=None, window=None, alpha=None, horizon=None):
+    """
+    Прогноз суточного расхода по всем номенклатурам.
+    Возвращает список строк с остатком, средним расходом, сглаженным прогнозом,
+    запасом в днях и рекомендуемым объёмом закупки на горизонт планирования.
+    """
+    import numpy as np
+
+    end = end or timezone.localdate()
+    history_days = history_days or settings.FORECAST_HISTORY_DAYS
+    window = min(window or settings.FORECAST_SMA_WINDOW, history_days)
+    alpha = alpha or settings.FORECAST_EWMA_ALPHA
+    horizon = horizon or settings.FORECAST_HORIZON_DAYS
+    start = end - timezone.timedelta(days=history_days - 1)
+
+    items = list(
+        Nomenclature.objects
+        .annotate(stock=Coalesce(balance_expression('warehouse_item__current_quantity', 'id'), 0.0))
+        .order_by('id')
+        .values_list('id', 'code', 'name', 'unit', 'stock')
+    )
+    if not items:
+        return []
+
+    # Матрица «номенклатура × день»: строка — по позиции id в отсортированном списке
+    ids = np.fromiter((item[0] for item in items), dtype=np.int64, count=len(items))
+    history = list(daily_deductions(start, end))
+    matrix = np.zeros((len(items), history_days))
+    if history:
+        nomenclature_ids, days, totals = zip(*history)
+        rows = np.searchsorted(ids, np.asarray(nomenclature_ids, dtype=np.int64))
+        cols = np.fromiter(((day - start).days for day in days), dtype=np.int64, count=len(days))
+        np.add.at(matrix, (rows, cols), np.asarray(totals, dtype=float))
+
+    stock = np.fromiter((item[4] for item in items), dtype=float, count=len(items))
+    sma = matrix[:, -window:].mean(axis=1)
+    ewma = matrix @ ewma_weights(history_days, alpha)
+
+    # Запас в днях при сглаженном расходе; без расхода запас не ограничен
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(ewma > 0, stock / ewma, np.inf)
+    to_order = np.maximum(ewma * horizon - stock, 0)
+
+    return [
+        {
+            'id': item[0],
+            'code': item[1],
+            'name': item[2],
+            'unit': item[3],
+            'stock': item[4],
+            'sma': float(sma[n]),
+            'ewma': float(ewma[n]),
+            'days_of_cover': float(cover[n]) if np.isfinite(cover[n]) else None,
+            'to_order': float(to_order[n]),
+        }
+        for n, item in enumerate(items)
+    ]
+
+
+def cached_forecast(end=None):
+    """Прогноз из кэша; ключ меняется с каждой новой операцией"""
+    end = end or timezone.localdate()
+    last_id = Operation.objects.aggregate(last_id=Max('id'))['last_id']
+    cache_key = f"forecast:{end}:{settings.FORECAST_HISTORY_DAYS}:{last_id}"
+    rows = cache.get(cache_key)
+    if rows is None:
+        rows = compute_forecast(end)
+        cache.set(cache_key, rows, settings.REPORT_CACHE_TIMEOUT)
+    return rows
@@ -6,12 +6,14 @@ import json
 class NomenclatureForm(forms.ModelForm):
     class Meta:
         model = Nomenclature
-        fields = ['code', 'name', 'unit', 'shelf_life_days']
+        fields = ['code', 'name', 'unit', 'shelf_life_days', 'min_stock', 'reorder_point']
         widgets = {
             'code': forms.TextInput(attrs={'class': 'form-control'}),
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'unit': forms.TextInput(attrs={'class': 'form-control'}),
             'shelf_life_days': forms.NumberInput(attrs={'class': 'form-control'}),
+            'min_stock': forms.NumberInput(attrs={'class': 'form-control'}),
+            'reorder_point': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
 from .models import ProductBatch, Nomenclature
@@ -114,4 +116,6 @@ class WarehouseDeductionForm(forms.Form):
             'rows': 3,
             'placeholder': 'Дополнительная информация'
         })
-    )
\ No newline at end of file
+    )
+    # Ключ идемпотентности: повторная отправка той же формы не списывает повторно
+    idempotency_key = forms.CharField(required=False, max_length=100, widget=forms.HiddenInput)
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Инкрементальная выгрузка журнала операций для внешних получателей (ERP).
+
+Для каждого получателя хранится отметка ExportWatermark — id последней операции,
+получение которой подтверждено. Выгружается диапазон (отметка, граница] по
+первичному ключу: это диапазонное чтение по индексу, а не просмотр всего журнала.
+Граница — последняя видимая операция. Проводки вставляют операции последней
+записью под блокировкой порядка фиксации (stock.apply_stock_changes,
+sync.lock_commit_order), поэтому id растут в порядке фиксации: операция
+незафиксированной транзакции получит id больше границы и не окажется позади отметки.
+
+Отметка сдвигается только после успешной доставки и условным UPDATE
+(compare-and-set): если её уже сдвинула другая доставка, подтверждение
+отклоняется и один диапазон не засчитывается дважды.
+"""
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ExportWatermark, Operation
+
+
+def plan_increment(consumer):
+    """Диапазон следующей выгрузки получателя: (после id, до id включительно)"""
+    watermark, _ = ExportWatermark.objects.get_or_create(consumer=consumer)
+    from_id = watermark.last_operation_id
+    to_id = Operation.objects.filter(id__gt=from_id).aggregate(last_id=Max('id'))['last_id']
+    return from_id, to_id or from_id
+
+
+def increment_queryset(from_id, to_id):
+    return Operation.objects.filter(id__gt=from_id, id__lte=to_id)
+
+
+def commit_watermark(consumer, from_id, to_id):
+    """
+    Сдвигает отметку получателя с from_id на to_id, только если она не менялась.
+    Возвращает False, если диапазон уже подтверждён или отметку сдвинули раньше.
+    """
+    return ExportWatermark.objects.filter(
+        consumer=consumer,
+        last_operation_id=from_id
+    ).update(last_operation_id=to_id, updated_at=timezone.now()) == 1
+
+
+def is_committed(consumer, to_id):
+    return ExportWatermark.objects.filter(consumer=consumer, last_operation_id__gte=to_id).exists()
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from warehouse_app.archive import archive_operations, month_start
+
+
+class Command(BaseCommand):
+    help = 'Переносит операции закрытых периодов (месяцев) в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            help='Дата отсечения ГГГГ-ММ-ДД: архивируются месяцы до месяца этой даты '
+                 '(по умолчанию — сегодня минус OPERATION_ARCHIVE_AFTER_DAYS)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Количество операций, переносимых в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        if options['before']:
+            cutoff = parse_date(options['before'])
+            if cutoff is None:
+                raise CommandError("Некорректная дата: ожидается ГГГГ-ММ-ДД")
+        else:
+            cutoff = timezone.localdate() - timezone.timedelta(days=settings.OPERATION_ARCHIVE_AFTER_DAYS)
+
+        self.stdout.write(f"Архивация операций до {month_start(cutoff):%d.%m.%Y}...")
+        moved = archive_operations(cutoff, chunk_size=options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Перенесено в архив операций: {moved}"))
@@ -0,0 +1,109 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+
+from warehouse_app.models import Warehouse, WarehouseBalanceShard
+from warehouse_app.stock import update_balances
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер конкуренции за сводный остаток одной номенклатуры: параллельные писатели '
+        'проводят изменения в одну строку Warehouse и в части (WarehouseBalanceShard). '
+        'Транзакции откатываются, остатки не меняются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=32, help='Параллельных писателей (по умолчанию 32)')
+        parser.add_argument('--ops', type=int, default=50, help='Проводок на писателя (по умолчанию 50)')
+        parser.add_argument('--shards', type=int, default=16, help='Число частей во втором замере (по умолчанию 16)')
+        parser.add_argument(
+            '--hold-ms', type=float, default=5,
+            help='Сколько транзакция работает после изменения остатка, мс (по умолчанию 5)'
+        )
+        parser.add_argument('--code', help='Код номенклатуры (по умолчанию — первая со строкой на складе)')
+
+    def _writer(self, nomenclature_id, ops, hold, start, timings, errors):
+        start.wait()
+        try:
+            for _ in range(ops):
+                began = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        update_balances({(nomenclature_id,): 1.0})
+                        time.sleep(hold)
+                        transaction.set_rollback(True)
+                except Exception:
+                    errors.append(1)
+                    continue
+                timings.append((time.perf_counter() - began) * 1000)
+        finally:
+            connection.close()
+
+    def _run(self, shards, nomenclature_id, options):
+        timings, errors = [], []
+        start = threading.Barrier(options['writers'] + 1)
+        with override_settings(WAREHOUSE_BALANCE_SHARDS=shards):
+            threads = [
+                threading.Thread(target=self._writer, args=(
+                    nomenclature_id, options['ops'], options['hold_ms'] / 1000, start, timings, errors
+                ))
+                for _ in range(options['writers'])
+            ]
+            for thread in threads:
+                thread.start()
+            start.wait()
+            began = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+        return elapsed, timings, errors
+
+    def handle(self, *args, **options):
+        warehouses = Warehouse.objects.select_related('nomenclature').order_by('nomenclature__code')
+        if options['code']:
+            warehouses = warehouses.filter(nomenclature__code=options['code'])
+        warehouse = warehouses.first()
+        if warehouse is None:
+            raise CommandError("Нет номенклатуры со строкой на складе")
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                "SQLite блокирует базу целиком: части не помогут, замер имеет смысл на PostgreSQL"
+            ))
+
+        # Части создаются заранее: замер касается очереди на UPDATE, а не вставки строк
+        nomenclature_id = warehouse.nomenclature_id
+        existing = set(
+            WarehouseBalanceShard.objects.filter(nomenclature_id=nomenclature_id).values_list('shard', flat=True)
+        )
+        created = WarehouseBalanceShard.objects.bulk_create([
+            WarehouseBalanceShard(nomenclature_id=nomenclature_id, shard=shard)
+            for shard in range(options['shards']) if shard not in existing
+        ])
+
+        self.stdout.write(
+            f"{warehouse.nomenclature.code}: писателей {options['writers']}, "
+            f"проводок на писателя {options['ops']}, транзакция {options['hold_ms']} мс после изменения"
+        )
+        try:
+            baseline = None
+            for title, shards in (('Одна строка', 0), (f"Частей: {options['shards']}", options['shards'])):
+                elapsed, timings, errors = self._run(shards, nomenclature_id, options)
+                throughput = len(timings) / elapsed
+                baseline = baseline or throughput
+                ratio = throughput / baseline if baseline else 0
+                line = f"  {title:<12} {throughput:8.1f} проводок/с  x{ratio:.1f}"
+                if timings:
+                    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+                    line += f"  медиана {statistics.median(timings):7.1f} мс  p95 {p95:7.1f} мс"
+                if errors:
+                    line += f"  ошибок {len(errors)}"
+                self.stdout.write(line)
+        finally:
+            WarehouseBalanceShard.objects.filter(
+                nomenclature_id=nomenclature_id, shard__in=[s.shard for s in created], delta=0
+            ).delete()
@@ -0,0 +1,104 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template import Engine, RequestContext, engines
+from django.test import RequestFactory
+from django.utils import timezone
+
+from warehouse_app.models import Nomenclature, ProductBatch, Warehouse
+
+# Загрузчики без кэша: шаблон и base.html читаются и разбираются заново при каждой отрисовке
+UNCACHED_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер отрисовки страниц списков (склад, поступления) на синтетических строках: '
+        'без кэша шаблонов, с кэшем шаблонов и с кэшем строк таблиц ({% cache %})'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Строк на странице (по умолчанию 100)')
+        parser.add_argument('--repeat', type=int, default=50, help='Отрисовок на замер (по умолчанию 50)')
+
+    def _pages(self, rows):
+        """Контексты страниц: строки создаются в памяти, база не нужна"""
+        now = timezone.now()
+        today = timezone.localdate()
+        nomenclatures = [
+            Nomenclature(id=n, code=f"NOM{n:05d}", name=f"Продукция {n}", unit="кг",
+                         shelf_life_days=30, updated_at=now)
+            for n in range(1, rows + 1)
+        ]
+        warehouses = [
+            Warehouse(id=nom.id, nomenclature=nom, current_quantity=nom.id * 1.5)
+            for nom in nomenclatures
+        ]
+        for w in warehouses:
+            w.balance = w.current_quantity
+        batches = [
+            ProductBatch(
+                id=nom.id, nomenclature=nom, batch_number=f"B-{nom.id:06d}", quantity=nom.id * 2.0,
+                production_date=today - timedelta(days=10), expiration_date=today + timedelta(days=20),
+                reception_date=now if nom.id % 2 else None, updated_at=now
+            )
+            for nom in nomenclatures
+        ]
+        return [
+            ('warehouse_app/warehouse_list.html', '/warehouse/', {
+                'warehouses': Paginator(warehouses, rows).page(1),
+                'query': '', 'location': None, 'location_code': '', 'locations': [],
+                'sort': 'nomenclature__code', 'direction': 'asc',
+            }),
+            ('warehouse_app/productbatch_list.html', '/productbatch/', {
+                'batches': Paginator(batches, rows).page(1),
+                'query': '', 'sort': 'production_date', 'direction': 'asc',
+            }),
+        ]
+
+    def _measure(self, engine, name, path, context, repeat, cold_fragments):
+        request = RequestFactory().get(path)
+        request.user = AnonymousUser()
+        fragments = caches['fragments']
+        timings = []
+        for _ in range(repeat + 1):
+            if cold_fragments:
+                fragments.clear()
+            start = time.perf_counter()
+            engine.get_template(name).render(RequestContext(request, context))
+            timings.append((time.perf_counter() - start) * 1000)
+        # Первая отрисовка прогревает кэши и в медиану не входит
+        return statistics.median(timings[1:])
+
+    def handle(self, *args, **options):
+        configured = engines['django'].engine
+        uncached = Engine(
+            dirs=configured.dirs,
+            context_processors=configured.context_processors,
+            debug=configured.debug,
+            loaders=UNCACHED_LOADERS,
+            libraries=configured.libraries,
+        )
+        modes = [
+            ('Без кэша шаблонов', uncached, True),
+            ('Кэш шаблонов', configured, True),
+            ('Кэш шаблонов и строк', configured, False),
+        ]
+
+        self.stdout.write(f"Строк на странице: {options['rows']}, отрисовок: {options['repeat']}")
+        for name, path, context in self._pages(options['rows']):
+            self.stdout.write(name)
+            baseline = None
+            for title, engine, cold_fragments in modes:
+                median = self._measure(engine, name, path, context, options['repeat'], cold_fragments)
+                baseline = baseline or median
+                self.stdout.write(f"  {title:<22} медиана {median:8.2f} мс  x{baseline / median:.1f}")
+        caches['fragments'].clear()
@@ -0,0 +1,89 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Библиотеки, которые должны загружаться только по требованию (выгрузки, прогноз)
+HEAVY_MODULES = ('openpyxl', 'numpy', 'pyarrow')
+
+# Выполняется в отдельном процессе, чтобы замер был «холодным»
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+t1 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t2 = time.perf_counter()
+from django.test import Client
+t3 = time.perf_counter()
+response = Client(HTTP_HOST=sys.argv[2]).get(sys.argv[1])
+t4 = time.perf_counter()
+print(json.dumps({
+    "setup": (t1 - t0) * 1000,
+    "urlconf": (t2 - t1) * 1000,
+    "first_request": (t4 - t3) * 1000,
+    "status": response.status_code,
+    "heavy": [name for name in sys.argv[3].split(",") if name in sys.modules],
+    "modules": len(sys.modules),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер холодного запуска: django.setup(), загрузка URLconf и первый запрос '
+        'в новом процессе. Завершается с ошибкой, если при запуске загружены тяжёлые '
+        'библиотеки или превышен порог времени'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Количество запусков (по умолчанию 5)')
+        parser.add_argument('--url', default='/', help='Адрес первого запроса (по умолчанию /)')
+        parser.add_argument(
+            '--max-ms', type=float,
+            help='Порог медианы полного времени запуска, мс'
+        )
+        parser.add_argument(
+            '--allow-heavy', action='store_true',
+            help=f'Не считать ошибкой загрузку {", ".join(HEAVY_MODULES)} при запуске'
+        )
+
+    def _probe(self, url):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'warehouse.settings'))
+        hosts = [h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*']
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, url, hosts[0] if hosts else 'localhost', ','.join(HEAVY_MODULES)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Процесс замера завершился с ошибкой:\n{result.stderr[-2000:]}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        runs = [self._probe(options['url']) for _ in range(options['runs'])]
+
+        self.stdout.write(f"Запусков: {len(runs)}, ответ на {options['url']}: {runs[0]['status']}, "
+                          f"модулей загружено: {runs[0]['modules']}")
+        for key, title in (('setup', 'django.setup()'), ('urlconf', 'Загрузка URLconf'),
+                           ('first_request', 'Первый запрос')):
+            values = [run[key] for run in runs]
+            self.stdout.write(
+                f"  {title:<20} медиана {statistics.median(values):8.1f} мс, "
+                f"мин {min(values):8.1f} мс"
+            )
+        totals = [run['setup'] + run['urlconf'] + run['first_request'] for run in runs]
+        total = statistics.median(totals)
+        self.stdout.write(f"  {'Итого':<20} медиана {total:8.1f} мс")
+
+        heavy = sorted({name for run in runs for name in run['heavy']})
+        if heavy and not options['allow_heavy']:
+            raise CommandError(f"При запуске загружены тяжёлые библиотеки: {', '.join(heavy)}")
+        if options['max_ms'] is not None and total > options['max_ms']:
+            raise CommandError(f"Запуск медленнее порога: {total:.1f} мс > {options['max_ms']:.1f} мс")
+        self.stdout.write(self.style.SUCCESS("Запуск в норме"))
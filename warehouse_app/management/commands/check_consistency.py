@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+
+from warehouse_app.consistency import (
+    TOLERANCE, find_location_mismatches, find_mismatches, repair_location_stock, repair_warehouse,
+)
+from warehouse_app.models import Nomenclature, StorageLocation
+
+
+class Command(BaseCommand):
+    help = 'Сверяет остатки склада и мест хранения с активными партиями и журналом операций'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='Исправить остатки склада и мест хранения по сумме остатков активных партий'
+        )
+
+    def handle(self, *args, **options):
+        mismatches = find_mismatches()
+        location_mismatches = find_location_mismatches()
+        if not mismatches and not location_mismatches:
+            self.stdout.write(self.style.SUCCESS("Расхождений не найдено"))
+            return
+
+        codes = dict(
+            Nomenclature.objects
+            .filter(id__in=[m['nomenclature_id'] for m in mismatches] + [m[1] for m in location_mismatches])
+            .values_list('id', 'code')
+        )
+
+        if mismatches:
+            self.stdout.write(f"{'Код':<15}{'Склад':>15}{'Партии':>15}{'Журнал':>15}")
+            for m in mismatches:
+                self.stdout.write(
+                    f"{codes.get(m['nomenclature_id'], m['nomenclature_id']):<15}"
+                    f"{m['warehouse']:>15.3f}{m['live']:>15.3f}{m['journal']:>15.3f}"
+                )
+            self.stdout.write(self.style.WARNING(f"Номенклатур с расхождениями: {len(mismatches)}"))
+
+        if location_mismatches:
+            locations = dict(StorageLocation.objects.values_list('id', 'code'))
+            self.stdout.write(f"{'Место':<15}{'Код':<15}{'Остаток':>15}{'Партии':>15}")
+            for location_id, nomenclature_id, quantity, live in location_mismatches:
+                self.stdout.write(
+                    f"{locations.get(location_id, location_id):<15}"
+                    f"{codes.get(nomenclature_id, nomenclature_id):<15}"
+                    f"{quantity:>15.3f}{live:>15.3f}"
+                )
+            self.stdout.write(self.style.WARNING(
+                f"Остатков мест хранения с расхождениями: {len(location_mismatches)}"
+            ))
+
+        if options['repair']:
+            if location_mismatches:
+                repaired = repair_location_stock(location_mismatches)
+                self.stdout.write(self.style.SUCCESS(f"Исправлено остатков мест хранения: {repaired}"))
+            if mismatches:
+                repaired = repair_warehouse([m['nomenclature_id'] for m in mismatches])
+                self.stdout.write(self.style.SUCCESS(f"Исправлено строк склада: {repaired}"))
+            # Расхождение партий с журналом исправлением склада не устраняется
+            unresolved = sum(1 for m in mismatches if abs(m['live'] - m['journal']) > TOLERANCE)
+            if unresolved:
+                self.stdout.write(self.style.WARNING(
+                    f"Партии не совпадают с журналом у {unresolved} номенклатур — требуется ручная проверка"
+                ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from warehouse_app.alerts import evaluate_stock_levels
+from warehouse_app.models import StockAlert
+
+
+class Command(BaseCommand):
+    help = 'Проверяет остатки всех номенклатур по точке заказа и минимальному остатку'
+
+    def handle(self, *args, **options):
+        created, resolved = evaluate_stock_levels()
+        opened = StockAlert.objects.filter(resolved_at__isnull=True).count()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Новых оповещений: {created}, снято: {resolved}, открыто всего: {opened}"
+            )
+        )
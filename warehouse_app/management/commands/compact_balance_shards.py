@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from warehouse_app.stock import compact_balance_shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит изменения, накопленные в частях сводного остатка (WarehouseBalanceShard), '
+        'в Warehouse.current_quantity. Запускается по расписанию при WAREHOUSE_BALANCE_SHARDS > 0 '
+        'и обязательно перед отключением частей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Количество номенклатур, обрабатываемых в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.WAREHOUSE_BALANCE_SHARDS:
+            self.stdout.write("Части остатка отключены (WAREHOUSE_BALANCE_SHARDS = 0), переносятся остатки прежних частей")
+        compacted = compact_balance_shards(chunk_size=options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Перенесено номенклатур: {compacted}"))
@@ -0,0 +1,50 @@
+import os
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from warehouse_app.exports import export_root, write_operations_xlsx
+from warehouse_app.incremental import commit_watermark, increment_queryset, plan_increment
+
+
+class Command(BaseCommand):
+    help = (
+        'Инкрементальная выгрузка журнала операций для получателя (ERP): только операции '
+        'после его отметки. Отметка сдвигается после того, как файл полностью записан'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', required=True, help='Получатель выгрузки, например erp')
+        parser.add_argument(
+            '--output-dir',
+            help='Каталог для файла (по умолчанию EXPORT_ROOT)'
+        )
+
+    def handle(self, *args, **options):
+        consumer = options['consumer']
+        from_id, to_id = plan_increment(consumer)
+        if to_id == from_id:
+            self.stdout.write(f"Новых операций для «{consumer}» нет (отметка #{from_id})")
+            return
+
+        output_dir = Path(options['output_dir']) if options['output_dir'] else export_root()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"operations_{consumer}_{from_id + 1}-{to_id}_{timezone.now():%Y%m%d%H%M%S}.xlsx"
+        tmp_path = path.with_name(path.name + ".tmp")
+
+        try:
+            count = write_operations_xlsx(tmp_path, increment_queryset(from_id, to_id), title="Новые операции")
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        # Файл доставлен — фиксируем отметку; параллельный запуск мог успеть раньше
+        if not commit_watermark(consumer, from_id, to_id):
+            path.unlink(missing_ok=True)
+            raise CommandError(
+                f"Отметка «{consumer}» изменилась во время выгрузки (параллельный запуск?), файл удалён"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Выгружено операций: {count} (#{from_id + 1}—#{to_id}) в {path}"
+        ))
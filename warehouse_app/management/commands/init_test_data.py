@@ -34,13 +34,16 @@ class Command(BaseCommand):
             prod_date = timezone.now().date()
             exp_date = prod_date + timezone.timedelta(days=nom.shelf_life_days)
             
-            batch = ProductBatch.objects.create(
-                nomenclature=nom,
+            # Номер партии уникален, поэтому при повторном запуске берём существующую
+            batch, created = ProductBatch.objects.get_or_create(
                 batch_number=f"TEST-{nom.code}-001",
-                quantity=100.0,  
-                production_date=prod_date,
-                reception_date=None,
-                expiration_date=exp_date
+                defaults={
+                    'nomenclature': nom,
+                    'quantity': 100.0,
+                    'production_date': prod_date,
+                    'reception_date': None,
+                    'expiration_date': exp_date
+                }
             )
             batches.append(batch)
             self.stdout.write(f"  Создана партия: {batch.batch_number} - {batch.quantity} {nom.unit}")
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from warehouse_app.exports import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновых выгрузок: выполняет задания ExportJob из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить задания из очереди и завершиться'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Пауза между опросами очереди, сек (по умолчанию 2)'
+        )
+        parser.add_argument(
+            '--stale-timeout', type=int, default=3600,
+            help='Через сколько секунд задание «Выполняется» считается зависшим'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Воркер выгрузок запущен")
+
+        while True:
+            requeued = requeue_stale_jobs(options['stale_timeout'])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"Возвращено в очередь зависших заданий: {requeued}"))
+
+            job = claim_next_job()
+            if job is not None:
+                self.stdout.write(f"  Выполняется: {job}")
+                run_job(job)
+                style = self.style.SUCCESS if job.status == "done" else self.style.ERROR
+                self.stdout.write(style(f"  Завершено: {job}"))
+                continue
+
+            if options['once']:
+                break
+
+            # Между опросами не держим соединение с базой
+            close_old_connections()
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS("Очередь выгрузок пуста"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from warehouse_app.stock import write_off_expired
+
+
+class Command(BaseCommand):
+    help = 'Списывает партии с истёкшим сроком годности (запускать по расписанию, например раз в сутки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Дата ГГГГ-ММ-ДД: списываются партии со сроком годности до неё (по умолчанию — сегодня)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Количество партий, списываемых в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError("Некорректная дата: ожидается ГГГГ-ММ-ДД")
+
+        self.stdout.write(f"Списание партий со сроком годности до {today:%d.%m.%Y}...")
+        count = write_off_expired(today, chunk_size=options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Списано просроченных партий: {count}"))
@@ -0,0 +1,66 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0009_alter_exportjob_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(unique=True, verbose_name='Период')),
+                ('operations_count', models.PositiveIntegerField(default=0, verbose_name='Операций в архиве')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+            ],
+            options={
+                'verbose_name': 'Архивный период',
+                'verbose_name_plural': 'Архивные периоды',
+                'ordering': ['-period'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OperationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation_type', models.CharField(choices=[('reception', 'Приёмка'), ('deduction', 'Списание')], max_length=50, verbose_name='Тип операции')),
+                ('operation_date', models.DateTimeField(verbose_name='Дата операции')),
+                ('quantity', models.FloatField(verbose_name='Количество')),
+                ('reason', models.CharField(blank=True, max_length=200, null=True, verbose_name='Причина списания')),
+                ('document', models.CharField(blank=True, max_length=100, null=True, verbose_name='Документ')),
+                ('note', models.CharField(blank=True, max_length=500, null=True, verbose_name='Примечание')),
+                ('period', models.DateField(verbose_name='Период')),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_operations', to='warehouse_app.productbatch', verbose_name='Партия')),
+                ('nomenclature', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_operations', to='warehouse_app.nomenclature', verbose_name='Номенклатура')),
+            ],
+            options={
+                'verbose_name': 'Архивная операция',
+                'verbose_name_plural': 'Архив операций',
+                'ordering': ['-operation_date'],
+                'indexes': [models.Index(fields=['operation_date'], name='warehouse_a_operati_0a13de_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OperationPeriodSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(verbose_name='Период')),
+                ('received', models.FloatField(default=0, verbose_name='Принято')),
+                ('deducted', models.FloatField(default=0, verbose_name='Списано')),
+                ('nomenclature', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='period_summaries', to='warehouse_app.nomenclature', verbose_name='Номенклатура')),
+            ],
+            options={
+                'verbose_name': 'Итоги периода',
+                'verbose_name_plural': 'Итоги периодов',
+                'ordering': ['-period'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'nomenclature'), name='unique_period_summary')],
+            },
+        ),
+    ]
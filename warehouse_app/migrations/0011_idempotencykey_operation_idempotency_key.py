@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0010_archivedperiod_operationarchive_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Ключ')),
+                ('scope', models.CharField(max_length=50, verbose_name='Операция')),
+                ('result', models.CharField(blank=True, max_length=1000, verbose_name='Результат')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создан')),
+            ],
+            options={
+                'verbose_name': 'Ключ идемпотентности',
+                'verbose_name_plural': 'Ключи идемпотентности',
+            },
+        ),
+        migrations.AddField(
+            model_name='operation',
+            name='idempotency_key',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='operations', to='warehouse_app.idempotencykey', verbose_name='Ключ идемпотентности'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+def rename_duplicate_batch_numbers(apps, schema_editor):
+    """Перед добавлением уникального индекса делаем номера партий уникальными"""
+    ProductBatch = apps.get_model('warehouse_app', 'ProductBatch')
+    duplicates = (
+        ProductBatch.objects.values('batch_number')
+        .annotate(count=models.Count('id'))
+        .filter(count__gt=1)
+        .values_list('batch_number', flat=True)
+    )
+    for batch_number in list(duplicates):
+        # Первая партия сохраняет номер, остальным добавляется id
+        for batch in ProductBatch.objects.filter(batch_number=batch_number).order_by('id')[1:]:
+            batch.batch_number = f"{batch_number}-{batch.id}"
+            batch.save(update_fields=['batch_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0011_idempotencykey_operation_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='operation',
+            name='document',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='Документ'),
+        ),
+        migrations.RunPython(rename_duplicate_batch_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productbatch',
+            name='batch_number',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Номер партии'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_nomenclature(apps, schema_editor):
+    """Заполняет номенклатуру операций и копии полей партии в LiveBatch"""
+    ProductBatch = apps.get_model('warehouse_app', 'ProductBatch')
+    batch = ProductBatch.objects.filter(pk=models.OuterRef('batch_id'))
+
+    for model_name in ('Operation', 'OperationArchive'):
+        model = apps.get_model('warehouse_app', model_name)
+        model.objects.filter(nomenclature__isnull=True, batch__isnull=False).update(
+            nomenclature_id=models.Subquery(batch.values('nomenclature_id')[:1])
+        )
+
+    LiveBatch = apps.get_model('warehouse_app', 'LiveBatch')
+    product_batch = ProductBatch.objects.filter(pk=models.OuterRef('product_batch_id'))
+    LiveBatch.objects.update(
+        nomenclature_id=models.Subquery(product_batch.values('nomenclature_id')[:1]),
+        expiration_date=models.Subquery(product_batch.values('expiration_date')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+    # Без общей транзакции: в PostgreSQL нельзя менять таблицу в той же транзакции,
+    # где её строки обновлялись с отложенной проверкой внешних ключей, поэтому
+    # заполнение фиксируется до ALTER
+    atomic = False
+
+    dependencies = [
+        ('warehouse_app', '0012_productbatch_unique_batch_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livebatch',
+            name='nomenclature',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='live_batches', to='warehouse_app.nomenclature', verbose_name='Номенклатура'),
+        ),
+        migrations.AddField(
+            model_name='livebatch',
+            name='expiration_date',
+            field=models.DateField(null=True, verbose_name='Срок годности'),
+        ),
+        migrations.RunPython(backfill_nomenclature, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='livebatch',
+            name='nomenclature',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='live_batches', to='warehouse_app.nomenclature', verbose_name='Номенклатура'),
+        ),
+        migrations.AlterField(
+            model_name='livebatch',
+            name='expiration_date',
+            field=models.DateField(verbose_name='Срок годности'),
+        ),
+        migrations.AddIndex(
+            model_name='livebatch',
+            index=models.Index(fields=['nomenclature', 'expiration_date'], name='warehouse_a_nomencl_1c0ca0_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0013_denormalize_nomenclature'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('operations', 'Журнал операций'), ('warehouse', 'Складские остатки'), ('everything', 'Полная выгрузка (архив)'), ('movement', 'Движение продукции')], max_length=50, verbose_name='Тип выгрузки'),
+        ),
+    ]
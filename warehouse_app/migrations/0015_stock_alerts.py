@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0014_alter_exportjob_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nomenclature',
+            name='min_stock',
+            field=models.FloatField(blank=True, null=True, verbose_name='Минимальный остаток'),
+        ),
+        migrations.AddField(
+            model_name='nomenclature',
+            name='reorder_point',
+            field=models.FloatField(blank=True, null=True, verbose_name='Точка заказа'),
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('reorder', 'Достигнута точка заказа'), ('critical', 'Ниже минимального остатка')], max_length=20, verbose_name='Уровень')),
+                ('quantity', models.FloatField(verbose_name='Остаток')),
+                ('threshold', models.FloatField(verbose_name='Порог')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создано')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='Снято')),
+                ('nomenclature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='warehouse_app.nomenclature', verbose_name='Номенклатура')),
+            ],
+            options={
+                'verbose_name': 'Оповещение об остатке',
+                'verbose_name_plural': 'Оповещения об остатках',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['nomenclature', 'resolved_at'], name='warehouse_a_nomencl_776e08_idx')],
+            },
+        ),
+    ]
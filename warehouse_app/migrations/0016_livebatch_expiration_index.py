@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0015_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='livebatch',
+            index=models.Index(fields=['expiration_date'], name='warehouse_a_expirat_208992_idx'),
+        ),
+    ]
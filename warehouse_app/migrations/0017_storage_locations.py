@@ -0,0 +1,99 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_locations(apps, schema_editor):
+    """
+    Всё, что уже лежит на складе, относим к месту хранения по умолчанию
+    и заполняем остатки по местам из активных партий.
+    """
+    StorageLocation = apps.get_model('warehouse_app', 'StorageLocation')
+    LiveBatch = apps.get_model('warehouse_app', 'LiveBatch')
+    LocationStock = apps.get_model('warehouse_app', 'LocationStock')
+    Operation = apps.get_model('warehouse_app', 'Operation')
+
+    location, _ = StorageLocation.objects.get_or_create(
+        code=settings.DEFAULT_STORAGE_LOCATION,
+        defaults={'site': "Основной склад"}
+    )
+    LiveBatch.objects.update(location=location)
+    Operation.objects.update(location=location)
+
+    totals = (
+        LiveBatch.objects
+        .values('nomenclature_id')
+        .annotate(total=Sum('current_quantity'))
+        .order_by()
+        .values_list('nomenclature_id', 'total')
+    )
+    LocationStock.objects.bulk_create(
+        [
+            LocationStock(location=location, nomenclature_id=nomenclature_id, current_quantity=total)
+            for nomenclature_id, total in totals
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0016_livebatch_expiration_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, unique=True, verbose_name='Код')),
+                ('site', models.CharField(max_length=100, verbose_name='Площадка')),
+                ('zone', models.CharField(blank=True, max_length=100, verbose_name='Зона')),
+                ('bin', models.CharField(blank=True, max_length=100, verbose_name='Ячейка')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Используется')),
+            ],
+            options={
+                'verbose_name': 'Место хранения',
+                'verbose_name_plural': 'Места хранения',
+                'ordering': ['code'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='livebatch',
+            name='product_batch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='live_batches', to='warehouse_app.productbatch'),
+        ),
+        migrations.CreateModel(
+            name='LocationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current_quantity', models.FloatField(default=0, verbose_name='Текущий остаток')),
+                ('nomenclature', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='location_stock', to='warehouse_app.nomenclature', verbose_name='Номенклатура')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock', to='warehouse_app.storagelocation', verbose_name='Место хранения')),
+            ],
+            options={
+                'verbose_name': 'Остаток в месте хранения',
+                'verbose_name_plural': 'Остатки по местам хранения',
+            },
+        ),
+        migrations.AddField(
+            model_name='livebatch',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='live_batches', to='warehouse_app.storagelocation', verbose_name='Место хранения'),
+        ),
+        migrations.AddField(
+            model_name='operation',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='operations', to='warehouse_app.storagelocation', verbose_name='Место хранения'),
+        ),
+        migrations.AddField(
+            model_name='operationarchive',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_operations', to='warehouse_app.storagelocation', verbose_name='Место хранения'),
+        ),
+        migrations.RunPython(fill_locations, migrations.RunPython.noop),
+    ]
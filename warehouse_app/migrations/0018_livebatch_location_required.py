@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Отдельная миграция: в PostgreSQL нельзя менять таблицу в той же транзакции,
+# где её строки обновлялись с отложенной проверкой внешних ключей
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0017_storage_locations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='livebatch',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='live_batches', to='warehouse_app.storagelocation', verbose_name='Место хранения'),
+        ),
+        migrations.AddIndex(
+            model_name='livebatch',
+            index=models.Index(fields=['location', 'nomenclature', 'expiration_date'], name='warehouse_a_locatio_5d5cc1_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='livebatch',
+            constraint=models.UniqueConstraint(fields=('product_batch', 'location'), name='unique_live_batch_location'),
+        ),
+        migrations.AddConstraint(
+            model_name='locationstock',
+            constraint=models.UniqueConstraint(fields=('location', 'nomenclature'), name='unique_location_stock'),
+        ),
+    ]
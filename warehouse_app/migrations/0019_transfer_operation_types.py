@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0018_livebatch_location_required'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='operation',
+            name='operation_type',
+            field=models.CharField(choices=[('reception', 'Приёмка'), ('deduction', 'Списание'), ('transfer_out', 'Перемещение (расход)'), ('transfer_in', 'Перемещение (приход)')], default='reception', max_length=50, verbose_name='Тип операции'),
+        ),
+        migrations.AlterField(
+            model_name='operationarchive',
+            name='operation_type',
+            field=models.CharField(choices=[('reception', 'Приёмка'), ('deduction', 'Списание'), ('transfer_out', 'Перемещение (расход)'), ('transfer_in', 'Перемещение (приход)')], max_length=50, verbose_name='Тип операции'),
+        ),
+    ]
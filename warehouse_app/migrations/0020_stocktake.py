@@ -0,0 +1,61 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0019_transfer_operation_types'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StocktakeSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document', models.CharField(max_length=100, unique=True, verbose_name='Документ')),
+                ('status', models.CharField(choices=[('open', 'Идёт пересчёт'), ('posted', 'Проведена'), ('cancelled', 'Отменена')], default='open', max_length=20, verbose_name='Статус')),
+                ('note', models.CharField(blank=True, max_length=500, verbose_name='Примечание')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создана')),
+                ('posted_at', models.DateTimeField(blank=True, null=True, verbose_name='Проведена')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Создал')),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='stocktakes', to='warehouse_app.storagelocation', verbose_name='Место хранения')),
+                ('nomenclatures', models.ManyToManyField(related_name='stocktakes', to='warehouse_app.nomenclature', verbose_name='Номенклатура')),
+            ],
+            options={
+                'verbose_name': 'Инвентаризация',
+                'verbose_name_plural': 'Инвентаризации',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StocktakeLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_quantity', models.FloatField(default=0, verbose_name='Учётный остаток')),
+                ('counted_quantity', models.FloatField(blank=True, null=True, verbose_name='Фактический остаток')),
+                ('variance', models.FloatField(blank=True, null=True, verbose_name='Расхождение')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stocktake_lines', to='warehouse_app.storagelocation', verbose_name='Место хранения')),
+                ('nomenclature', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stocktake_lines', to='warehouse_app.nomenclature', verbose_name='Номенклатура')),
+                ('product_batch', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stocktake_lines', to='warehouse_app.productbatch', verbose_name='Партия')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='warehouse_app.stocktakesession', verbose_name='Инвентаризация')),
+            ],
+            options={
+                'verbose_name': 'Строка инвентаризации',
+                'verbose_name_plural': 'Строки инвентаризации',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stocktakesession',
+            index=models.Index(fields=['status'], name='warehouse_a_status_451e73_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocktakeline',
+            constraint=models.UniqueConstraint(fields=('session', 'product_batch', 'location'), name='unique_stocktake_line'),
+        ),
+    ]
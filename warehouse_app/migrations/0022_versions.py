@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0021_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storagelocation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Изменено'),
+        ),
+        migrations.AlterField(
+            model_name='nomenclature',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Изменено'),
+        ),
+        migrations.AlterField(
+            model_name='productbatch',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Изменено'),
+        ),
+    ]
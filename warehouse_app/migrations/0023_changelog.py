@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0022_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Номер изменения')),
+                ('entity', models.CharField(choices=[('nomenclature', 'Номенклатура'), ('stock', 'Остатки')], max_length=20, verbose_name='Данные')),
+                ('object_id', models.BigIntegerField(verbose_name='ID номенклатуры')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удалено')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Изменение для синхронизации',
+                'verbose_name_plural': 'Журнал изменений для синхронизации',
+                'ordering': ['seq'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0024_parquet_export_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(max_length=100, unique=True, verbose_name='Получатель')),
+                ('last_operation_id', models.BigIntegerField(default=0, verbose_name='Последняя выгруженная операция')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'Отметка инкрементальной выгрузки',
+                'verbose_name_plural': 'Отметки инкрементальной выгрузки',
+            },
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('operations', 'Журнал операций'), ('warehouse', 'Складские остатки'), ('everything', 'Полная выгрузка (архив)'), ('movement', 'Движение продукции'), ('parquet', 'Аналитическая выгрузка (Parquet)'), ('operations_incremental', 'Новые операции (инкрементальная)')], max_length=50, verbose_name='Тип выгрузки'),
+        ),
+    ]
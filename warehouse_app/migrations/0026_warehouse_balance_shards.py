@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 20:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0025_export_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WarehouseBalanceShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='Номер части')),
+                ('delta', models.FloatField(default=0, verbose_name='Изменение остатка')),
+                ('nomenclature', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='balance_shards', to='warehouse_app.nomenclature', verbose_name='Номенклатура')),
+            ],
+            options={
+                'verbose_name': 'Часть сводного остатка',
+                'verbose_name_plural': 'Части сводного остатка',
+                'constraints': [models.UniqueConstraint(fields=('nomenclature', 'shard'), name='unique_balance_shard')],
+            },
+        ),
+    ]
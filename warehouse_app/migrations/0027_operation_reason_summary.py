@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-19 21:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_reason_summaries(apps, schema_editor):
+    """Списания по причинам для уже заархивированных месяцев — из архива операций"""
+    OperationArchive = apps.get_model('warehouse_app', 'OperationArchive')
+    OperationReasonSummary = apps.get_model('warehouse_app', 'OperationReasonSummary')
+    totals = (
+        OperationArchive.objects
+        .filter(operation_type="deduction", nomenclature__isnull=False)
+        .exclude(reason__isnull=True).exclude(reason='')
+        .values('period', 'nomenclature_id', 'reason')
+        .annotate(total=models.Sum('quantity'))
+        .order_by()
+    )
+    OperationReasonSummary.objects.bulk_create(
+        (OperationReasonSummary(
+            period=row['period'], nomenclature_id=row['nomenclature_id'],
+            reason=row['reason'], deducted=row['total']
+        ) for row in totals.iterator(chunk_size=2000)),
+        batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0026_warehouse_balance_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperationReasonSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(verbose_name='Период')),
+                ('reason', models.CharField(max_length=200, verbose_name='Причина списания')),
+                ('deducted', models.FloatField(default=0, verbose_name='Списано')),
+                ('nomenclature', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reason_summaries', to='warehouse_app.nomenclature', verbose_name='Номенклатура')),
+            ],
+            options={
+                'verbose_name': 'Итоги списаний по причине',
+                'verbose_name_plural': 'Итоги списаний по причинам',
+                'ordering': ['-period'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'nomenclature', 'reason'), name='unique_reason_summary')],
+            },
+        ),
+        migrations.RunPython(backfill_reason_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 22:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_app', '0027_operation_reason_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommitLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Блокировка порядка фиксации',
+                'verbose_name_plural': 'Блокировка порядка фиксации',
+            },
+        ),
+    ]
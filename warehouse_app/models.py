@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -10,6 +11,11 @@ class Nomenclature(models.Model):
     name = models.CharField("Наименование", max_length=200)
     unit = models.CharField("Единица измерения", max_length=20)
     shelf_life_days = models.PositiveIntegerField("Срок годности (дни)")
+    # Пороги остатка для оповещений (пустое значение — не контролируется)
+    min_stock = models.FloatField("Минимальный остаток", blank=True, null=True)
+    reorder_point = models.FloatField("Точка заказа", blank=True, null=True)
+    # Версия записи: входит в ключ кэша строк таблиц и в ETag страниц (versions.py)
+    updated_at = models.DateTimeField("Изменено", auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = _("Номенклатура")
@@ -17,6 +23,12 @@ class Nomenclature(models.Model):
 
     def __str__(self):
         return f"{self.code} - {self.name}"
+
+    def save(self, *args, **kwargs):
+        from warehouse_app.sync import record_changes
+
+        super().save(*args, **kwargs)
+        record_changes("nomenclature", [self.pk])
     
     def delete(self, *args, **kwargs):
         """
@@ -48,7 +60,11 @@ class Nomenclature(models.Model):
             )
         
         # Если связанных записей нет - удаляем
+        from warehouse_app.sync import record_changes
+
+        nomenclature_id = self.pk
         super().delete(*args, **kwargs)
+        record_changes("nomenclature", [nomenclature_id], deleted=True)
 
 
 # Партия продукции
@@ -58,11 +74,13 @@ class ProductBatch(models.Model):
         on_delete=models.PROTECT,  # Изменено с CASCADE на PROTECT
         related_name="batches"
     )
-    batch_number = models.CharField("Номер партии", max_length=100)
+    batch_number = models.CharField("Номер партии", max_length=100, unique=True)
     quantity = models.FloatField("Количество")
     production_date = models.DateField("Дата производства")
     reception_date = models.DateTimeField("Дата приёмки", default=None, blank=True, null=True)
     expiration_date = models.DateField("Срок годности")
+    # Версия записи: входит в ключ кэша строк таблиц и в ETag страниц (versions.py)
+    updated_at = models.DateTimeField("Изменено", auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = _("Партия товара")
@@ -71,53 +89,109 @@ class ProductBatch(models.Model):
     def __str__(self):
         return f"{self.nomenclature.code} - {self.nomenclature.name} | {self.batch_number}"
 
-    def receive(self, note="Приёмка через интерфейс/скрипт"):
+    def receive(self, note="Приёмка через интерфейс/скрипт", idempotency_key=None, location=None):
         """
         Метод приёмки партии: создаёт операцию и увеличивает склад.
+        location — место хранения (по умолчанию — DEFAULT_STORAGE_LOCATION).
         Не выполняется, если партия уже принята.
+        Отметка о приёмке ставится условным UPDATE в той же транзакции,
+        поэтому параллельная повторная приёмка не создаст дублей.
         """
         if self.reception_date is not None:
             return f"Партия {self.batch_number} уже принята {self.reception_date}"
 
-        from warehouse_app.models import Operation, Warehouse  # импорт внутри, чтобы избежать циклов
+        from django.db import transaction
+        from warehouse_app.models import Operation  # импорт внутри, чтобы избежать циклов
+        from warehouse_app.stock import apply_stock_changes, check_not_frozen
 
-        # создаём операцию приёмки
-        Operation.objects.create(
-            batch=self,
-            operation_type="reception",
-            quantity=self.quantity,
-            note=note
-        )
+        location = location or StorageLocation.get_default()
 
-        # обновляем склад
-        warehouse, created = Warehouse.objects.get_or_create(
-            nomenclature=self.nomenclature,
-            defaults={'current_quantity': 0}
-        )
-        warehouse.current_quantity += self.quantity
-        warehouse.save()
+        with transaction.atomic():
+            # на время инвентаризации номенклатуры приёмка запрещена (StockError)
+            check_not_frozen([self.nomenclature_id])
 
-        # создаём запись LiveBatch для новой активной партии
-        LiveBatch.objects.create(
-            product_batch=self,
-            current_quantity=self.quantity)
+            # помечаем партию как принятую, только если её ещё никто не принял
+            reception_date = timezone.now()
+            claimed = ProductBatch.objects.filter(
+                pk=self.pk,
+                reception_date__isnull=True
+            ).update(reception_date=reception_date, updated_at=reception_date)
+            if not claimed:
+                self.refresh_from_db(fields=['reception_date'])
+                return f"Партия {self.batch_number} уже принята {self.reception_date}"
+            self.reception_date = reception_date
 
-        # помечаем партию как принятую
-        self.reception_date = timezone.now()
-        self.save(update_fields=['reception_date'])
+            # операция приёмки сохраняется вместе с остатками (apply_stock_changes)
+            operation = Operation(
+                batch=self,
+                nomenclature_id=self.nomenclature_id,
+                operation_type="reception",
+                quantity=self.quantity,
+                note=note,
+                idempotency_key=idempotency_key,
+                location=location
+            )
+
+            # создаём запись LiveBatch для новой активной партии
+            LiveBatch.objects.create(
+                product_batch=self,
+                nomenclature_id=self.nomenclature_id,
+                location=location,
+                expiration_date=self.expiration_date,
+                current_quantity=self.quantity)
+
+            # обновляем остаток места хранения и сводный остаток склада
+            apply_stock_changes({(location.pk, self.nomenclature_id): self.quantity}, [operation])
+
+            # после фиксации транзакции проверяем порог остатка по номенклатуре
+            from warehouse_app.alerts import schedule_stock_check
+            schedule_stock_check([self.nomenclature_id])
 
         return f"Партия {self.batch_number} принята, склад обновлён"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Срок годности скопирован в LiveBatch — поддерживаем копию актуальной
+        if self.reception_date is not None:
+            updated = LiveBatch.objects.filter(product_batch=self).exclude(
+                expiration_date=self.expiration_date
+            ).update(expiration_date=self.expiration_date)
+            if updated:
+                from warehouse_app.sync import record_changes
+                record_changes("stock", [self.nomenclature_id])
+
     @property
     def status(self):
         """Возвращает статус партии на основе reception_date"""
         return "Принята" if self.reception_date else "Оформлена"
 
 
+class IdempotencyKey(models.Model):
+    """
+    Ключ идемпотентности складской проводки.
+    Повторная отправка формы с тем же ключом (двойной клик, повтор запроса
+    при плохой связи) не выполняет проводку заново, а возвращает её результат.
+    """
+    key = models.CharField("Ключ", max_length=100, unique=True)
+    scope = models.CharField("Операция", max_length=50)
+    result = models.CharField("Результат", max_length=1000, blank=True)
+    created_at = models.DateTimeField("Создан", default=timezone.now)
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+
+    def __str__(self):
+        return f"{self.scope} | {self.key}"
+
+
 class Operation(models.Model):
     OPERATION_CHOICES = [
         ("reception", "Приёмка"),
         ("deduction", "Списание"),
+        # Перемещение между местами хранения: пара операций с одним документом
+        ("transfer_out", "Перемещение (расход)"),
+        ("transfer_in", "Перемещение (приход)"),
     ]
 
     class Meta:
@@ -133,7 +207,8 @@ class Operation(models.Model):
         null=True,
         verbose_name="Партия"
     )
-    # Добавляем прямую связь с номенклатурой для списаний
+    # Прямая связь с номенклатурой заполняется для всех операций,
+    # чтобы журнал и выгрузки не соединялись с партиями
     nomenclature = models.ForeignKey(
         Nomenclature,
         on_delete=models.PROTECT,  # Защищаем удаление номенклатуры
@@ -154,23 +229,184 @@ class Operation(models.Model):
     )
     quantity = models.FloatField("Количество")
     reason = models.CharField("Причина списания", max_length=200, blank=True, null=True)
-    document = models.CharField("Документ", max_length=100, blank=True, null=True)
+    document = models.CharField("Документ", max_length=100, blank=True, null=True, db_index=True)
     note = models.CharField("Примечание", max_length=500, blank=True, null=True)
+    # Запрос, которым создана операция (для защиты от повторной отправки)
+    idempotency_key = models.ForeignKey(
+        IdempotencyKey,
+        on_delete=models.SET_NULL,
+        related_name="operations",
+        blank=True,
+        null=True,
+        verbose_name="Ключ идемпотентности"
+    )
+    location = models.ForeignKey(
+        "StorageLocation",
+        on_delete=models.PROTECT,
+        related_name="operations",
+        blank=True,
+        null=True,
+        verbose_name="Место хранения"
+    )
 
     def __str__(self):
         type_display = self.get_operation_type_display()
         batch_number = self.batch.batch_number if self.batch else "—"
-        nomenclature_name = self.nomenclature.name if self.nomenclature else (self.batch.nomenclature.name if self.batch else "—")
+        nomenclature_name = self.nomenclature.name if self.nomenclature else "—"
         return f"{type_display} | {nomenclature_name} | {batch_number} | {self.quantity} кг"
     
     def save(self, *args, **kwargs):
-        """Автоматически заполняем nomenclature для операций списания"""
-        if self.operation_type == "deduction" and not self.nomenclature:
+        """Автоматически заполняем nomenclature по партии"""
+        if self.nomenclature_id is None and self.batch_id is not None:
+            self.nomenclature_id = self.batch.nomenclature_id
+        if self.operation_type == "deduction" and not self.nomenclature_id:
             raise ValueError("Для операций списания необходимо указать номенклатуру")
         super().save(*args, **kwargs)
 
 
+class OperationArchive(models.Model):
+    """
+    Архив операций закрытых периодов.
+    Поля повторяют Operation (в том же порядке), id сохраняется исходный,
+    поэтому архив можно объединять с оперативным журналом через union().
+    """
+    id = models.BigIntegerField("ID", primary_key=True)
+    batch = models.ForeignKey(
+        ProductBatch,
+        on_delete=models.SET_NULL,
+        related_name="archived_operations",
+        blank=True,
+        null=True,
+        verbose_name="Партия"
+    )
+    nomenclature = models.ForeignKey(
+        Nomenclature,
+        on_delete=models.PROTECT,
+        related_name="archived_operations",
+        blank=True,
+        null=True,
+        verbose_name="Номенклатура"
+    )
+    operation_type = models.CharField("Тип операции", max_length=50, choices=Operation.OPERATION_CHOICES)
+    operation_date = models.DateTimeField("Дата операции")
+    quantity = models.FloatField("Количество")
+    reason = models.CharField("Причина списания", max_length=200, blank=True, null=True)
+    document = models.CharField("Документ", max_length=100, blank=True, null=True)
+    note = models.CharField("Примечание", max_length=500, blank=True, null=True)
+    period = models.DateField("Период")
+    location = models.ForeignKey(
+        "StorageLocation",
+        on_delete=models.PROTECT,
+        related_name="archived_operations",
+        blank=True,
+        null=True,
+        verbose_name="Место хранения"
+    )
+
+    class Meta:
+        verbose_name = "Архивная операция"
+        verbose_name_plural = "Архив операций"
+        ordering = ['-operation_date']
+        indexes = [
+            models.Index(fields=['operation_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_operation_type_display()} | {self.operation_date:%Y-%m-%d} | {self.quantity}"
+
+
+class ArchivedPeriod(models.Model):
+    """Закрытый период (месяц), операции которого перенесены в архив"""
+    period = models.DateField("Период", unique=True)
+    operations_count = models.PositiveIntegerField("Операций в архиве", default=0)
+    archived_at = models.DateTimeField("Дата архивации", default=timezone.now)
+
+    class Meta:
+        verbose_name = "Архивный период"
+        verbose_name_plural = "Архивные периоды"
+        ordering = ['-period']
+
+    def __str__(self):
+        return f"{self.period:%m.%Y} | {self.operations_count} операций"
+
+
+class OperationPeriodSummary(models.Model):
+    """Итоги архивного периода по номенклатуре — для расчёта остатков без чтения архива"""
+    period = models.DateField("Период")
+    nomenclature = models.ForeignKey(
+        Nomenclature,
+        on_delete=models.PROTECT,
+        related_name="period_summaries",
+        verbose_name="Номенклатура"
+    )
+    received = models.FloatField("Принято", default=0)
+    deducted = models.FloatField("Списано", default=0)
+
+    class Meta:
+        verbose_name = "Итоги периода"
+        verbose_name_plural = "Итоги периодов"
+        ordering = ['-period']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'nomenclature'], name='unique_period_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.period:%m.%Y} | {self.nomenclature.name} | +{self.received} / -{self.deducted}"
+
+
+class OperationReasonSummary(models.Model):
+    """Списания архивного периода по номенклатуре и причине — колонки причин в отчёте о движении"""
+    period = models.DateField("Период")
+    nomenclature = models.ForeignKey(
+        Nomenclature,
+        on_delete=models.PROTECT,
+        related_name="reason_summaries",
+        verbose_name="Номенклатура"
+    )
+    reason = models.CharField("Причина списания", max_length=200)
+    deducted = models.FloatField("Списано", default=0)
+
+    class Meta:
+        verbose_name = "Итоги списаний по причине"
+        verbose_name_plural = "Итоги списаний по причинам"
+        ordering = ['-period']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'nomenclature', 'reason'], name='unique_reason_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.period:%m.%Y} | {self.nomenclature.name} | {self.reason} | -{self.deducted}"
+
+
+class StorageLocation(models.Model):
+    """Место хранения: площадка, зона и ячейка"""
+    code = models.CharField("Код", max_length=50, unique=True)
+    site = models.CharField("Площадка", max_length=100)
+    zone = models.CharField("Зона", max_length=100, blank=True)
+    bin = models.CharField("Ячейка", max_length=100, blank=True)
+    is_active = models.BooleanField("Используется", default=True)
+    updated_at = models.DateTimeField("Изменено", auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Место хранения"
+        verbose_name_plural = "Места хранения"
+        ordering = ['code']
+
+    def __str__(self):
+        return " / ".join(part for part in (self.site, self.zone, self.bin) if part) or self.code
+
+    @classmethod
+    def get_default(cls):
+        """Место хранения по умолчанию (создаётся миграцией)"""
+        location, _ = cls.objects.get_or_create(
+            code=settings.DEFAULT_STORAGE_LOCATION,
+            defaults={'site': "Основной склад"}
+        )
+        return location
+
+
 class Warehouse(models.Model):
+    """Сводный остаток номенклатуры по всем местам хранения"""
     nomenclature = models.OneToOneField(
         Nomenclature,
         on_delete=models.PROTECT,  # Изменено с CASCADE на PROTECT
@@ -185,15 +421,88 @@ class Warehouse(models.Model):
     def __str__(self):
         return f"{self.nomenclature.name} | {self.current_quantity} кг"
 
+
+class WarehouseBalanceShard(models.Model):
+    """
+    Часть изменений сводного остатка (при WAREHOUSE_BALANCE_SHARDS > 0).
+    Проводка прибавляет изменение к случайной из N частей номенклатуры, а не
+    к одной строке Warehouse, поэтому параллельные проводки популярной позиции
+    не ждут друг друга. Остаток = Warehouse.current_quantity + сумма частей
+    (balances.py); команда compact_balance_shards переносит части в Warehouse.
+    """
+    nomenclature = models.ForeignKey(
+        Nomenclature,
+        on_delete=models.PROTECT,
+        related_name="balance_shards",
+        verbose_name="Номенклатура"
+    )
+    shard = models.PositiveSmallIntegerField("Номер части")
+    delta = models.FloatField("Изменение остатка", default=0)
+
+    class Meta:
+        verbose_name = "Часть сводного остатка"
+        verbose_name_plural = "Части сводного остатка"
+        constraints = [
+            models.UniqueConstraint(fields=['nomenclature', 'shard'], name='unique_balance_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.nomenclature.name} | #{self.shard} | {self.delta:+}"
+
+
+class LocationStock(models.Model):
+    """
+    Остаток номенклатуры в месте хранения.
+    Проводки по разным местам обновляют разные строки и не ждут друг друга.
+    """
+    location = models.ForeignKey(
+        StorageLocation,
+        on_delete=models.PROTECT,
+        related_name="stock",
+        verbose_name="Место хранения"
+    )
+    nomenclature = models.ForeignKey(
+        Nomenclature,
+        on_delete=models.PROTECT,
+        related_name="location_stock",
+        verbose_name="Номенклатура"
+    )
+    current_quantity = models.FloatField("Текущий остаток", default=0)
+
+    class Meta:
+        verbose_name = "Остаток в месте хранения"
+        verbose_name_plural = "Остатки по местам хранения"
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'nomenclature'], name='unique_location_stock'),
+        ]
+
+    def __str__(self):
+        return f"{self.location.code} | {self.nomenclature.name} | {self.current_quantity}"
+
     
 from django.core.validators import MinValueValidator
 class LiveBatch(models.Model):
     """Оперативный индекс активных партий с ненулевым остатком"""
-    product_batch = models.OneToOneField(
+    product_batch = models.ForeignKey(
         ProductBatch, 
         on_delete=models.CASCADE,
-        related_name="live_batch"
+        related_name="live_batches"
+    )
+    # Партия может лежать в нескольких местах хранения — по строке на место
+    location = models.ForeignKey(
+        StorageLocation,
+        on_delete=models.PROTECT,
+        related_name="live_batches",
+        verbose_name="Место хранения"
+    )
+    # Копии полей партии: подбор партий для списания идёт по одной таблице
+    nomenclature = models.ForeignKey(
+        Nomenclature,
+        on_delete=models.PROTECT,
+        related_name="live_batches",
+        verbose_name="Номенклатура"
     )
+    expiration_date = models.DateField("Срок годности")
     current_quantity = models.FloatField(
         "Текущий остаток", 
         default=0,
@@ -203,6 +512,251 @@ class LiveBatch(models.Model):
     class Meta:
         verbose_name = "Активная партия"
         verbose_name_plural = "Активные партии"
+        indexes = [
+            # Партии номенклатуры в порядке FEFO
+            models.Index(fields=['nomenclature', 'expiration_date']),
+            # Поиск просроченных партий
+            models.Index(fields=['expiration_date']),
+            # Партии номенклатуры в месте хранения в порядке FEFO
+            models.Index(fields=['location', 'nomenclature', 'expiration_date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['product_batch', 'location'], name='unique_live_batch_location'),
+        ]
     
     def __str__(self):
-        return f"{self.product_batch.batch_number} | {self.current_quantity} {self.product_batch.nomenclature.unit}"
\ No newline at end of file
+        return f"{self.product_batch.batch_number} | {self.current_quantity} {self.nomenclature.unit}"
+
+class StockAlert(models.Model):
+    """Оповещение о снижении остатка до точки заказа или ниже минимального"""
+    LEVEL_CHOICES = [
+        ("reorder", "Достигнута точка заказа"),
+        ("critical", "Ниже минимального остатка"),
+    ]
+
+    nomenclature = models.ForeignKey(
+        Nomenclature,
+        on_delete=models.CASCADE,
+        related_name="stock_alerts",
+        verbose_name="Номенклатура"
+    )
+    level = models.CharField("Уровень", max_length=20, choices=LEVEL_CHOICES)
+    quantity = models.FloatField("Остаток")
+    threshold = models.FloatField("Порог")
+    created_at = models.DateTimeField("Создано", default=timezone.now)
+    resolved_at = models.DateTimeField("Снято", blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Оповещение об остатке"
+        verbose_name_plural = "Оповещения об остатках"
+        ordering = ['-created_at']
+        indexes = [
+            # Открытые оповещения по номенклатуре
+            models.Index(fields=['nomenclature', 'resolved_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.nomenclature.name} | {self.get_level_display()} | {self.quantity}"
+
+
+class ExportJob(models.Model):
+    """Фоновое задание на выгрузку данных (выполняется воркером run_export_worker)"""
+    STATUS_CHOICES = [
+        ("pending", "В очереди"),
+        ("running", "Выполняется"),
+        ("done", "Готово"),
+        ("failed", "Ошибка"),
+    ]
+    KIND_CHOICES = [
+        ("operations", "Журнал операций"),
+        ("warehouse", "Складские остатки"),
+        ("everything", "Полная выгрузка (архив)"),
+        ("movement", "Движение продукции"),
+        ("parquet", "Аналитическая выгрузка (Parquet)"),
+        ("operations_incremental", "Новые операции (инкрементальная)"),
+    ]
+
+    kind = models.CharField("Тип выгрузки", max_length=50, choices=KIND_CHOICES)
+    params = models.JSONField("Параметры", default=dict, blank=True)
+    status = models.CharField("Статус", max_length=20, choices=STATUS_CHOICES, default="pending")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="export_jobs",
+        blank=True,
+        null=True,
+        verbose_name="Пользователь"
+    )
+    created_at = models.DateTimeField("Создано", default=timezone.now)
+    started_at = models.DateTimeField("Начато", blank=True, null=True)
+    finished_at = models.DateTimeField("Завершено", blank=True, null=True)
+    file_path = models.CharField("Файл", max_length=500, blank=True)
+    error = models.TextField("Ошибка", blank=True)
+
+    class Meta:
+        verbose_name = "Задание выгрузки"
+        verbose_name_plural = "Задания выгрузки"
+        ordering = ['-created_at']
+        indexes = [
+            # Воркер выбирает задания по статусу в порядке постановки в очередь
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} | {self.get_status_display()}"
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "failed")
+
+
+class ExportWatermark(models.Model):
+    """
+    Отметка инкрементальной выгрузки журнала для внешнего получателя (ERP):
+    id последней операции, получение которой подтверждено.
+    """
+    consumer = models.CharField("Получатель", max_length=100, unique=True)
+    last_operation_id = models.BigIntegerField("Последняя выгруженная операция", default=0)
+    updated_at = models.DateTimeField("Изменено", auto_now=True)
+
+    class Meta:
+        verbose_name = "Отметка инкрементальной выгрузки"
+        verbose_name_plural = "Отметки инкрементальной выгрузки"
+
+    def __str__(self):
+        return f"{self.consumer} | до операции #{self.last_operation_id}"
+
+
+class StocktakeSession(models.Model):
+    """
+    Инвентаризация: пересчёт фактических остатков.
+    Пока сессия открыта, проводки по её номенклатурам запрещены
+    («заморозка»), остальные номенклатуры склада работают как обычно.
+    """
+    STATUS_CHOICES = [
+        ("open", "Идёт пересчёт"),
+        ("posted", "Проведена"),
+        ("cancelled", "Отменена"),
+    ]
+
+    document = models.CharField("Документ", max_length=100, unique=True)
+    location = models.ForeignKey(
+        StorageLocation,
+        on_delete=models.PROTECT,
+        related_name="stocktakes",
+        blank=True,
+        null=True,
+        verbose_name="Место хранения"
+    )
+    nomenclatures = models.ManyToManyField(
+        Nomenclature,
+        related_name="stocktakes",
+        verbose_name="Номенклатура"
+    )
+    status = models.CharField("Статус", max_length=20, choices=STATUS_CHOICES, default="open")
+    note = models.CharField("Примечание", max_length=500, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        verbose_name="Создал"
+    )
+    created_at = models.DateTimeField("Создана", default=timezone.now)
+    posted_at = models.DateTimeField("Проведена", blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Инвентаризация"
+        verbose_name_plural = "Инвентаризации"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status']),
+        ]
+
+    def __str__(self):
+        return f"{self.document} | {self.get_status_display()}"
+
+
+class StocktakeLine(models.Model):
+    """Строка инвентаризации: учётный и фактический остаток партии в месте хранения"""
+    session = models.ForeignKey(
+        StocktakeSession,
+        on_delete=models.CASCADE,
+        related_name="lines",
+        verbose_name="Инвентаризация"
+    )
+    product_batch = models.ForeignKey(
+        ProductBatch,
+        on_delete=models.PROTECT,
+        related_name="stocktake_lines",
+        verbose_name="Партия"
+    )
+    location = models.ForeignKey(
+        StorageLocation,
+        on_delete=models.PROTECT,
+        related_name="stocktake_lines",
+        verbose_name="Место хранения"
+    )
+    nomenclature = models.ForeignKey(
+        Nomenclature,
+        on_delete=models.PROTECT,
+        related_name="stocktake_lines",
+        verbose_name="Номенклатура"
+    )
+    # Учётный остаток на момент начала инвентаризации
+    expected_quantity = models.FloatField("Учётный остаток", default=0)
+    # Пусто — партия ещё не пересчитана
+    counted_quantity = models.FloatField("Фактический остаток", blank=True, null=True)
+    variance = models.FloatField("Расхождение", blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Строка инвентаризации"
+        verbose_name_plural = "Строки инвентаризации"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session', 'product_batch', 'location'],
+                name='unique_stocktake_line'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.session.document} | {self.product_batch.batch_number} | {self.counted_quantity}"
+
+
+class ChangeLog(models.Model):
+    """
+    Журнал изменений для синхронизации ТСД (sync.py).
+    Номер seq растёт монотонно: клиент запоминает последний полученный номер
+    и запрашивает только изменения после него.
+    """
+    ENTITY_CHOICES = [
+        ("nomenclature", "Номенклатура"),
+        # Остатки номенклатуры: сводный остаток и все её активные партии
+        ("stock", "Остатки"),
+    ]
+
+    seq = models.BigAutoField("Номер изменения", primary_key=True)
+    entity = models.CharField("Данные", max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField("ID номенклатуры")
+    deleted = models.BooleanField("Удалено", default=False)
+    created_at = models.DateTimeField("Создано", default=timezone.now)
+
+    class Meta:
+        verbose_name = "Изменение для синхронизации"
+        verbose_name_plural = "Журнал изменений для синхронизации"
+        ordering = ['seq']
+
+    def __str__(self):
+        return f"#{self.seq} | {self.get_entity_display()} | {self.object_id}"
+
+
+class CommitLock(models.Model):
+    """
+    Единственная строка-блокировка (sync.lock_commit_order): транзакция блокирует
+    её перед последней записью и держит до фиксации, поэтому номера, выданные
+    под блокировкой, растут в порядке фиксации транзакций.
+    """
+
+    class Meta:
+        verbose_name = "Блокировка порядка фиксации"
+        verbose_name_plural = "Блокировка порядка фиксации"
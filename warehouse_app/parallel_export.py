@@ -0,0 +1,99 @@
+"""
+Полная выгрузка журнала операций в пуле процессов.
+
+Таблица Operation делится на диапазоны id, каждый диапазон формируется
+отдельным процессом в свой xlsx-файл, затем файлы собираются в один zip.
+Дочерние процессы не наследуют выбор базы для чтения (routers.py), поэтому
+база, на которой посчитаны границы, передаётся в каждую задачу явно.
+
+Модуль не импортирует модели на верхнем уровне: при запуске пула через
+spawn (Windows, macOS) дочерний процесс импортирует его до django.setup().
+"""
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+
+def partition_ranges(min_id, max_id, size):
+    """Разбивает [min_id, max_id] на диапазоны не длиннее size"""
+    if min_id is None or max_id is None:
+        return []
+    return [(lo, min(lo + size - 1, max_id)) for lo in range(min_id, max_id + 1, size)]
+
+
+def _init_worker(settings_module):
+    """Инициализация дочернего процесса пула"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+    # Каждый процесс пула открывает собственные соединения с базой
+    from django.db import connections
+    connections.close_all()
+
+
+def render_operations_partition(lo, hi, path, using):
+    """Формирует xlsx с операциями lo <= id <= hi из базы using"""
+    from .exports import write_operations_xlsx
+    from .models import Operation
+
+    count = write_operations_xlsx(
+        path,
+        Operation.objects.using(using).filter(id__range=(lo, hi)),
+        title=f"Операции {lo}-{hi}"
+    )
+    return path, count
+
+
+def render_warehouse(path, using):
+    from .exports import build_warehouse_xlsx
+
+    build_warehouse_xlsx(path, {}, using=using)
+    return path
+
+
+def build_everything_archive(path, workers=None):
+    """
+    Собирает zip с журналом операций (по файлу на диапазон id) и остатками.
+    Количество процессов — workers, EXPORT_PARALLEL_WORKERS или число ядер.
+    """
+    from django.db import connections, router
+    from django.db.models import Max, Min
+    from .models import Operation
+
+    # Основная база или реплика, выбранная для этой выгрузки
+    using = router.db_for_read(Operation)
+    bounds = Operation.objects.using(using).aggregate(min_id=Min('id'), max_id=Max('id'))
+    ranges = partition_ranges(bounds['min_id'], bounds['max_id'], settings.EXPORT_PARTITION_ROWS)
+    workers = workers or settings.EXPORT_PARALLEL_WORKERS or os.cpu_count()
+
+    # Перед запуском пула закрываем соединения, чтобы дочерние процессы их не унаследовали
+    connections.close_all()
+
+    with tempfile.TemporaryDirectory(dir=Path(path).parent) as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'warehouse.settings'),)
+        ) as pool:
+            warehouse_future = pool.submit(render_warehouse, tmp_dir / "warehouse.xlsx", using)
+            partition_futures = [
+                pool.submit(render_operations_partition, lo, hi, tmp_dir / f"operations_{n:04d}.xlsx", using)
+                for n, (lo, hi) in enumerate(ranges, start=1)
+            ]
+
+            files = [warehouse_future.result()]
+            for future in partition_futures:
+                part_path, count = future.result()
+                if count:
+                    files.append(part_path)
+
+        # xlsx уже сжат, поэтому файлы кладём в архив без повторного сжатия
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for file in files:
+                archive.write(file, arcname=file.name)
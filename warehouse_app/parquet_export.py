@@ -0,0 +1,118 @@
+"""
+Колоночная выгрузка для аналитики: журнал операций, партии и остатки в Parquet.
+
+Строки читаются через values_list().iterator() без создания моделей и пишутся
+группами строк (row group) по EXPORT_PARQUET_ROW_GROUP, поэтому память не растёт
+с размером журнала. Колонки типизированы: даты и моменты времени, количества —
+float64, повторяющиеся строки (тип операции, код номенклатуры, причина) —
+словарные (в pandas читаются как category). Файлы сжимаются zstd.
+
+pyarrow импортируется внутри функций: веб-процессам он не нужен.
+"""
+import zipfile
+
+from django.conf import settings
+
+# (поле values_list, колонка в файле, тип колонки)
+OPERATION_COLUMNS = [
+    ('id', 'id', 'int'),
+    ('operation_type', 'operation_type', 'category'),
+    ('operation_date', 'operation_date', 'timestamp'),
+    ('quantity', 'quantity', 'float'),
+    ('nomenclature_id', 'nomenclature_id', 'int'),
+    ('nomenclature__code', 'nomenclature_code', 'category'),
+    ('batch__batch_number', 'batch_number', 'string'),
+    ('location__code', 'location_code', 'category'),
+    ('reason', 'reason', 'category'),
+    ('document', 'document', 'string'),
+]
+
+BATCH_COLUMNS = [
+    ('id', 'id', 'int'),
+    ('batch_number', 'batch_number', 'string'),
+    ('nomenclature_id', 'nomenclature_id', 'int'),
+    ('nomenclature__code', 'nomenclature_code', 'category'),
+    ('quantity', 'quantity', 'float'),
+    ('production_date', 'production_date', 'date'),
+    ('reception_date', 'reception_date', 'timestamp'),
+    ('expiration_date', 'expiration_date', 'date'),
+]
+
+WAREHOUSE_COLUMNS = [
+    ('nomenclature_id', 'nomenclature_id', 'int'),
+    ('nomenclature__code', 'nomenclature_code', 'string'),
+    ('nomenclature__name', 'nomenclature_name', 'string'),
+    ('nomenclature__unit', 'unit', 'category'),
+    ('balance', 'current_quantity', 'float'),
+]
+
+
+def _arrow_types(pa):
+    return {
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'string': pa.string(),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'date': pa.date32(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+    }
+
+
+def write_parquet(path, queryset, columns, row_group_size=None):
+    """Записывает queryset в Parquet группами строк; возвращает число строк"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    row_group_size = row_group_size or settings.EXPORT_PARQUET_ROW_GROUP
+    types = _arrow_types(pa)
+    schema = pa.schema([(name, types[kind]) for _, name, kind in columns])
+    fields = [field for field, _, _ in columns]
+
+    def write(writer, rows):
+        arrays = []
+        for (_, _, kind), values in zip(columns, zip(*rows)):
+            if kind == 'category':
+                arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, types[kind]))
+        writer.write_batch(pa.record_batch(arrays, schema=schema), row_group_size=row_group_size)
+
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        rows = []
+        for row in queryset.values_list(*fields).iterator(chunk_size=min(row_group_size, 10000)):
+            rows.append(row)
+            if len(rows) == row_group_size:
+                write(writer, rows)
+                count += len(rows)
+                rows = []
+        if rows:
+            write(writer, rows)
+            count += len(rows)
+    return count
+
+
+def build_parquet_archive(path):
+    """zip с operations.parquet, batches.parquet и warehouse.parquet"""
+    from .balances import with_balance
+    from .models import Operation, ProductBatch, Warehouse
+
+    parts = [
+        ('operations.parquet', Operation.objects.order_by('id'), OPERATION_COLUMNS),
+        ('batches.parquet', ProductBatch.objects.order_by('id'), BATCH_COLUMNS),
+        ('warehouse.parquet', with_balance(Warehouse.objects).order_by('nomenclature_id'), WAREHOUSE_COLUMNS),
+    ]
+    files = []
+    for name, queryset, columns in parts:
+        part_path = path.with_name(f"{path.name}.{name}")
+        write_parquet(part_path, queryset, columns)
+        files.append((part_path, name))
+
+    try:
+        # Parquet уже сжат, поэтому файлы кладём в архив без повторного сжатия
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for part_path, name in files:
+                archive.write(part_path, arcname=name)
+    finally:
+        for part_path, _ in files:
+            part_path.unlink(missing_ok=True)
@@ -0,0 +1,263 @@
+"""
+Профилирование отдельных запросов по требованию.
+
+Middleware profiling_middleware запускает cProfile для запроса, если:
+- запрос пришёл от персонала с заголовком PROFILE_HEADER (X-Profile: 1), или
+- запрос попал в случайную выборку с долей PROFILE_SAMPLE_RATE (0 — выключено).
+
+Для каждого профилированного запроса в PROFILE_ROOT сохраняются два файла:
+<id>.prof — статистика cProfile (открывается pstats, snakeviz и т. п.) и
+<id>.json — адрес, представление, статус, время и журнал SQL-запросов.
+Хранятся последние PROFILE_KEEP запросов. Страница /profiles/ (только для
+персонала) показывает самые медленные из них.
+
+SQL-запросы собираются обёрткой выполнения, которая ставится на каждое
+подключение к базе; список запросов текущего профилируемого запроса лежит
+в ContextVar, поэтому запросы async-представлений из sync_to_async тоже
+попадают в журнал. Одновременно профилируется не больше одного запроса:
+два активных cProfile в одном процессе несовместимы, остальные запросы
+в это время выполняются без профилирования.
+
+cProfile видит только поток, в котором включён. Под ASGI синхронное
+представление выполняется в потоке asgiref, поэтому для него профилирование
+включается в потоке синхронного кода, и представление выполняется там же.
+Async-представление профилируется в потоке цикла событий: в его профиль
+попадают и другие корутины, выполнявшиеся в это время, а ORM из sync_to_async
+не попадает. Такие профили помечены (mode = async) на странице профилей.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+# Наибольшее число SQL-запросов, сохраняемых с одним профилем
+MAX_LOGGED_QUERIES = 200
+
+# Журнал SQL текущего профилируемого запроса (None — запрос не профилируется)
+_queries = ContextVar('profiled_queries', default=None)
+
+# Занят, пока профилируется какой-либо запрос (захватывается в _Capture)
+_busy = threading.Lock()
+
+
+def _record_query(execute, sql, params, many, context):
+    queries = _queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.append({
+            'sql': sql,
+            'ms': round((time.perf_counter() - start) * 1000, 3),
+            'alias': context['connection'].alias,
+        })
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_wrapper, dispatch_uid='warehouse_app.profiling')
+
+
+def profile_root():
+    """Каталог для сохранённых профилей"""
+    root = Path(settings.PROFILE_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def _header_requested(request):
+    return bool(request.headers.get(settings.PROFILE_HEADER))
+
+
+def _sampled():
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def _prune(root):
+    """Оставляет только последние PROFILE_KEEP профилей"""
+    stale = sorted(root.glob('*.json'), key=lambda path: path.stat().st_mtime)[:-settings.PROFILE_KEEP]
+    for path in stale:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def save_profile(request, response, profiler, queries, elapsed, reason, username='', mode='sync'):
+    """Записывает .prof и .json профиля; возвращает id профиля"""
+    root = profile_root()
+    profile_id = f"{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(root / f"{profile_id}.prof")
+
+    match = request.resolver_match
+    info = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': match.view_name if match else '',
+        'status': response.status_code,
+        'ms': round(elapsed * 1000, 1),
+        'reason': reason,
+        'mode': mode,
+        'user': username,
+        'created_at': timezone.now().isoformat(),
+        'query_count': len(queries),
+        'query_ms': round(sum(q['ms'] for q in queries), 1),
+        'queries': queries[:MAX_LOGGED_QUERIES],
+    }
+    (root / f"{profile_id}.json").write_text(json.dumps(info, ensure_ascii=False), encoding='utf-8')
+    _prune(root)
+    logger.info("Профиль %s: %s %s, %.1f мс, SQL %d", profile_id, request.method, info['path'], info['ms'], len(queries))
+    return profile_id
+
+
+def load_profiles():
+    """Сводки сохранённых профилей, самые медленные первыми"""
+    profiles = []
+    for path in profile_root().glob('*.json'):
+        try:
+            info = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        info.pop('queries', None)
+        profiles.append(info)
+    return sorted(profiles, key=lambda info: info['ms'], reverse=True)
+
+
+def load_profile(profile_id, limit=40):
+    """Сводка профиля с журналом SQL и текстом pstats (limit функций по совокупному времени)"""
+    root = profile_root()
+    info_path = root / f"{profile_id}.json"
+    # id профиля берётся из адреса: имя не должно выводить за пределы каталога
+    if info_path.parent != root:
+        return None
+    # Файлы могли удалить при очистке старых профилей
+    try:
+        info = json.loads(info_path.read_text(encoding='utf-8'))
+        stats = pstats.Stats(str(info_path.with_suffix('.prof')), stream=io.StringIO())
+    except (OSError, ValueError):
+        return None
+    stream = stats.stream
+    stats.sort_stats('cumulative').print_stats(limit)
+    info['stats'] = stream.getvalue()
+    return info
+
+
+class _Capture:
+    """
+    Профилирование одного запроса: cProfile и журнал SQL.
+    Если профилируется другой запрос, блок выполняется без профилирования (active = False)
+    """
+
+    def __init__(self, reason, mode='sync'):
+        self.reason = reason
+        self.mode = mode
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.active = False
+
+    def __enter__(self):
+        self.active = _busy.acquire(blocking=False)
+        if not self.active:
+            return self
+        self.token = _queries.set(self.queries)
+        try:
+            self.start = time.perf_counter()
+            self.profiler.enable()
+        except BaseException:
+            _queries.reset(self.token)
+            self.active = False
+            _busy.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.active:
+            return
+        try:
+            self.profiler.disable()
+            self.elapsed = time.perf_counter() - self.start
+            _queries.reset(self.token)
+        finally:
+            _busy.release()
+
+    def save(self, request, response, username):
+        if not self.active:
+            return
+        try:
+            save_profile(
+                request, response, self.profiler, self.queries, self.elapsed, self.reason, username, self.mode
+            )
+        except OSError:
+            # Профиль — вспомогательные данные: ошибка записи не должна ломать ответ
+            logger.exception("Не удалось сохранить профиль %s", request.path)
+
+
+def _async_view(request):
+    """Представление запроса асинхронное (404 — считаем синхронным)"""
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return False
+    return iscoroutinefunction(match.func)
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    """Профилирует запросы персонала с заголовком PROFILE_HEADER и выборку PROFILE_SAMPLE_RATE"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            reason = None
+            if _header_requested(request) and (await request.auser()).is_staff:
+                reason = 'header'
+            elif _sampled():
+                reason = 'sample'
+            if reason is None or _busy.locked():
+                return await get_response(request)
+            if _async_view(request):
+                with _Capture(reason, mode='async') as capture:
+                    response = await get_response(request)
+            else:
+                # Профиль включается в потоке синхронного кода; sync_to_async
+                # представления внутри async_to_sync выполняется в этом же потоке
+                def profiled(request):
+                    with _Capture(reason) as capture:
+                        return capture, async_to_sync(get_response)(request)
+                capture, response = await sync_to_async(profiled)(request)
+            username = (await request.auser()).get_username()
+            await sync_to_async(capture.save)(request, response, username)
+            return response
+    else:
+        def middleware(request):
+            reason = None
+            if _header_requested(request) and request.user.is_staff:
+                reason = 'header'
+            elif _sampled():
+                reason = 'sample'
+            if reason is None or _busy.locked():
+                return get_response(request)
+            with _Capture(reason) as capture:
+                response = get_response(request)
+            capture.save(request, response, request.user.get_username())
+            return response
+    return middleware
@@ -0,0 +1,202 @@
+"""
+Отчёт о движении продукции за период.
+
+Начальный остаток, приход, расход (в том числе по причинам списания) и конечный
+остаток по каждой номенклатуре считаются одним сгруппированным запросом
+с условной агрегацией по журналу операций. Для архивных месяцев используются
+итоги периодов (OperationPeriodSummary) и списания по причинам (OperationReasonSummary).
+
+Итоги есть только за архивный месяц целиком, поэтому период, начало или конец
+которого приходится на середину архивного месяца, отчёт не строит
+(archive_cut_message): пользователь получает ближайший период из целых месяцев.
+"""
+from datetime import datetime, time
+
+from django.db.models import Case, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .archive import archive_boundary, next_month
+from .models import Nomenclature, Operation, OperationPeriodSummary, OperationReasonSummary
+
+# Сколько причин списания выводится отдельными колонками; остальные — в «прочих»
+MAX_REASON_COLUMNS = 8
+
+
+def net_quantity(prefix=''):
+    """Количество со знаком: приёмка увеличивает остаток, списание уменьшает"""
+    return Case(
+        When(**{f'{prefix}operation_type': "reception"}, then=F(f'{prefix}quantity')),
+        When(**{f'{prefix}operation_type': "deduction"}, then=-F(f'{prefix}quantity')),
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+
+
+def period_bounds(start, end):
+    """Границы периода [начало дня start, начало дня после end)"""
+    start_dt = timezone.make_aware(datetime.combine(start, time.min))
+    end_dt = timezone.make_aware(datetime.combine(end + timezone.timedelta(days=1), time.min))
+    return start_dt, end_dt
+
+
+def archive_cut_message(start, end, boundary):
+    """
+    Сообщение для пользователя, если начало или конец периода делит архивный месяц
+    (boundary — граница архива, archive.archive_boundary); иначе None
+    """
+    if boundary is None:
+        return None
+    archived_until = timezone.localtime(boundary).date()
+    cut_start = start < archived_until and start.day != 1
+    cut_end = end < archived_until and (end + timezone.timedelta(days=1)).day != 1
+    if not (cut_start or cut_end):
+        return None
+    whole_start = start.replace(day=1) if cut_start else start
+    whole_end = next_month(end) - timezone.timedelta(days=1) if cut_end else end
+    return (
+        f"Операции до {archived_until:%d.%m.%Y} перенесены в архив, и по ним хранятся только "
+        f"итоги за месяц целиком. Период, начинающийся или заканчивающийся внутри архивного "
+        f"месяца, посчитать нельзя — выберите период с {whole_start:%d.%m.%Y} по {whole_end:%d.%m.%Y}."
+    )
+
+
+def reasons_queryset(start, end):
+    """Расход по причинам списания за период в оперативном журнале: (причина, количество)"""
+    start_dt, end_dt = period_bounds(start, end)
+    return (
+        Operation.objects
+        .filter(operation_type="deduction", operation_date__gte=start_dt, operation_date__lt=end_dt)
+        .exclude(reason__isnull=True).exclude(reason='')
+        .values('reason')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+        .values_list('reason', 'total')
+    )
+
+
+def archived_reasons_queryset(start, end):
+    """Расход по причинам списания за архивные месяцы периода: (причина, количество)"""
+    return (
+        OperationReasonSummary.objects
+        .filter(period__gte=start.replace(day=1), period__lte=end)
+        .values('reason')
+        .annotate(total=Sum('deducted'))
+        .order_by()
+        .values_list('reason', 'total')
+    )
+
+
+def top_reasons(*totals):
+    """Самые частые причины списания (для колонок отчёта) по спискам (причина, количество)"""
+    merged = {}
+    for reason, total in (row for rows in totals for row in rows):
+        merged[reason] = merged.get(reason, 0.0) + total
+    return sorted(merged, key=lambda reason: (-merged[reason], reason))[:MAX_REASON_COLUMNS]
+
+
+def movement_queryset(start, end, reasons):
+    """Один сгруппированный запрос: все показатели отчёта по номенклатуре"""
+    start_dt, end_dt = period_bounds(start, end)
+    in_period = Q(operations__operation_date__gte=start_dt, operations__operation_date__lt=end_dt)
+    deduction = in_period & Q(operations__operation_type="deduction")
+
+    reason_columns = {
+        f'reason_{n}': Coalesce(
+            Sum('operations__quantity', filter=deduction & Q(operations__reason=reason)),
+            0.0
+        )
+        for n, reason in enumerate(reasons)
+    }
+    return (
+        Nomenclature.objects
+        .values('id', 'code', 'name', 'unit')
+        .annotate(
+            opening=Coalesce(
+                Sum(net_quantity('operations__'), filter=Q(operations__operation_date__lt=start_dt)),
+                0.0
+            ),
+            received=Coalesce(
+                Sum('operations__quantity', filter=in_period & Q(operations__operation_type="reception")),
+                0.0
+            ),
+            deducted=Coalesce(Sum('operations__quantity', filter=deduction), 0.0),
+            **reason_columns
+        )
+        .order_by('code')
+    )
+
+
+def summaries_queryset(nomenclature_ids, start, end):
+    """Итоги архивных месяцев по номенклатурам: до периода и внутри периода"""
+    month = start.replace(day=1)
+    return (
+        OperationPeriodSummary.objects
+        .filter(nomenclature_id__in=nomenclature_ids, period__lte=end)
+        .values('nomenclature_id')
+        .annotate(
+            opening=Coalesce(Sum(F('received') - F('deducted'), filter=Q(period__lt=month)), 0.0),
+            received=Coalesce(Sum('received', filter=Q(period__gte=month)), 0.0),
+            deducted=Coalesce(Sum('deducted', filter=Q(period__gte=month)), 0.0),
+        )
+    )
+
+
+def reason_summaries_queryset(nomenclature_ids, start, end, reasons):
+    """Списания архивных месяцев периода по причинам — колонки reason_N, как в movement_queryset"""
+    return (
+        OperationReasonSummary.objects
+        .filter(nomenclature_id__in=nomenclature_ids, period__gte=start.replace(day=1), period__lte=end)
+        .values('nomenclature_id')
+        .annotate(**{
+            f'reason_{n}': Coalesce(Sum('deducted', filter=Q(reason=reason)), 0.0)
+            for n, reason in enumerate(reasons)
+        })
+        .order_by()
+    )
+
+
+def finish_rows(rows, summaries, start, end, reasons, reason_summaries=()):
+    """
+    Добавляет к строкам отчёта архивные итоги, конечный остаток,
+    расход по причинам и оборачиваемость в днях.
+    """
+    summaries = {s['nomenclature_id']: s for s in summaries}
+    reason_summaries = {s['nomenclature_id']: s for s in reason_summaries}
+    days = (end - start).days + 1
+
+    for row in rows:
+        archived = summaries.get(row['id'])
+        if archived:
+            row['opening'] += archived['opening']
+            row['received'] += archived['received']
+            row['deducted'] += archived['deducted']
+        archived_reasons = reason_summaries.get(row['id'])
+        if archived_reasons:
+            for n in range(len(reasons)):
+                row[f'reason_{n}'] += archived_reasons[f'reason_{n}']
+
+        row['closing'] = row['opening'] + row['received'] - row['deducted']
+        row['by_reason'] = [row.pop(f'reason_{n}') for n in range(len(reasons))]
+        row['other_reasons'] = row['deducted'] - sum(row['by_reason'])
+
+        # Оборачиваемость: за сколько дней расходуется средний остаток
+        average_stock = (row['opening'] + row['closing']) / 2
+        row['turnover_days'] = average_stock * days / row['deducted'] if row['deducted'] > 0 else None
+    return rows
+
+
+def movement_report(start, end):
+    """
+    Полный отчёт (для выгрузки): причины списания и все строки.
+    ValueError — период делит архивный месяц.
+    """
+    message = archive_cut_message(start, end, archive_boundary())
+    if message:
+        raise ValueError(message)
+    reasons = top_reasons(reasons_queryset(start, end), archived_reasons_queryset(start, end))
+    rows = list(movement_queryset(start, end, reasons))
+    nomenclature_ids = [row['id'] for row in rows]
+    summaries = summaries_queryset(nomenclature_ids, start, end)
+    reason_summaries = reason_summaries_queryset(nomenclature_ids, start, end, reasons)
+    return reasons, finish_rows(rows, summaries, start, end, reasons, reason_summaries)
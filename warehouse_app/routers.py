@@ -0,0 +1,155 @@
+"""
+Чтение с реплики для отчётов, журнала и выгрузок.
+
+Реплика (DATABASES['replica']) подключается переменной окружения
+WAREHOUSE_REPLICA_DB. Запись всегда идёт в основную базу. Чтение уходит на
+реплику только внутри представлений с декоратором use_replica и в выгрузках
+(exports.run_job); остальной код читает основную базу как раньше.
+
+Отставание реплики учитывается двумя способами:
+- после POST (проводка, списание, постановка выгрузки) браузер получает cookie
+  на REPLICA_PIN_SECONDS, и его запросы читают основную базу — пользователь
+  сразу видит свои изменения;
+- отставание оценивается по журналу изменений (ChangeLog): если на реплике нет
+  изменений старше REPLICA_MAX_LAG_SECONDS, чтение возвращается на основную базу.
+
+Локально реплику можно проверить копией файла SQLite:
+cp db.sqlite3 replica.sqlite3 && WAREHOUSE_REPLICA_DB=replica.sqlite3 python manage.py runserver
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
+
+REPLICA = 'replica'
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+# База для чтения в текущем запросе или задании (None — основная)
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def replica_lag():
+    """
+    Отставание реплики, сек: возраст самого старого изменения журнала,
+    которого на реплике ещё нет. Результат кэшируется на REPLICA_LAG_CHECK_SECONDS.
+    """
+    lag = cache.get('replica_lag')
+    if lag is None:
+        from .models import ChangeLog
+
+        replica_seq = ChangeLog.objects.using(REPLICA).aggregate(seq=Max('seq'))['seq'] or 0
+        missing = (
+            ChangeLog.objects.using(DEFAULT_DB_ALIAS).filter(seq__gt=replica_seq)
+            .order_by('seq').values_list('created_at', flat=True).first()
+        )
+        lag = (timezone.now() - missing).total_seconds() if missing else 0
+        cache.set('replica_lag', lag, settings.REPLICA_LAG_CHECK_SECONDS)
+    return lag
+
+
+def replica_alias():
+    """Реплика, если она подключена и отстаёт не больше REPLICA_MAX_LAG_SECONDS, иначе None"""
+    if not replica_configured() or replica_lag() > settings.REPLICA_MAX_LAG_SECONDS:
+        return None
+    return REPLICA
+
+
+def reading_replica():
+    return _read_alias.get() is not None
+
+
+@contextmanager
+def _reading_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Чтение внутри блока идёт с реплики (для кода вне запросов, например выгрузок)"""
+    with _reading_from(replica_alias() if enabled and replica_configured() else None):
+        yield
+
+
+def _wants_replica(request):
+    return (
+        replica_configured()
+        and request.method in SAFE_METHODS
+        and PIN_COOKIE not in request.COOKIES
+    )
+
+
+def use_replica(view):
+    """
+    Представление читает с реплики. Запросы, изменяющие данные, и запросы
+    браузера, недавно выполнившего POST, читают основную базу.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            alias = await sync_to_async(replica_alias)() if _wants_replica(request) else None
+            with _reading_from(alias):
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with _reading_from(replica_alias() if _wants_replica(request) else None):
+                return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _pin(request, response):
+    if replica_configured() and request.method not in SAFE_METHODS:
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+        )
+    return response
+
+
+@sync_and_async_middleware
+def replica_pin_middleware(get_response):
+    """После изменяющего запроса браузер на время читает основную базу"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return _pin(request, await get_response(request))
+    else:
+        def middleware(request):
+            return _pin(request, get_response(request))
+    return middleware
+
+
+class ReplicaRouter:
+    """Чтение — с базы текущего контекста (use_replica, replica_reads), запись — в основную"""
+
+    def db_for_read(self, model, **hints):
+        # Сессии и пользователи — всегда с основной базы: только что созданной
+        # сессии на реплике может не быть, и пользователь оказался бы разлогинен
+        if model._meta.app_label != 'warehouse_app':
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Явно: иначе объект, прочитанный с реплики, сохранялся бы туда же
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплику переносит репликация (или копия файла SQLite)
+        return False if db == REPLICA else None
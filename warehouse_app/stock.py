@@ -0,0 +1,448 @@
+"""
+Складские проводки: списание по партиям, списание просроченных партий,
+перемещение между местами хранения, обновление сводного остатка
+(напрямую или через части WarehouseBalanceShard) и защита от повторной отправки.
+
+Функции вызываются внутри transaction.atomic(); при ошибке выбрасывается
+StockError, транзакция откатывается целиком и частичных списаний не остаётся.
+"""
+import math
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from .alerts import schedule_stock_check
+from .models import (
+    IdempotencyKey, LiveBatch, LocationStock, Operation, StocktakeSession, Warehouse, WarehouseBalanceShard,
+)
+from .sync import lock_commit_order, record_changes
+
+
+class StockError(Exception):
+    """Ошибка складской проводки; текст показывается пользователю"""
+
+
+def next_document_number(prefix='SALE'):
+    """Следующий номер документа за сегодня: SALE-ГГГГММДД-001, -002, ..."""
+    today = timezone.now().strftime('%Y%m%d')
+    prefix = f'{prefix}-{today}-'
+
+    last_operation = Operation.objects.filter(
+        document__startswith=prefix
+    ).order_by('document').last()
+
+    if last_operation:
+        try:
+            last_num = int(last_operation.document.split('-')[-1])
+            next_num = f'{last_num + 1:03d}'
+        except (ValueError, IndexError):
+            next_num = '001'
+    else:
+        next_num = '001'
+
+    return f'{prefix}{next_num}'
+
+
+def check_not_frozen(nomenclature_ids):
+    """Запрещает проводки по номенклатурам, которые сейчас на инвентаризации"""
+    document = StocktakeSession.objects.filter(
+        status="open",
+        nomenclatures__in=nomenclature_ids
+    ).values_list('document', flat=True).first()
+    if document:
+        raise StockError(f"Номенклатура на инвентаризации ({document}), проводки временно запрещены")
+
+
+# Ключей в одном SELECT/UPDATE по набору строк: условие OR и CASE растут
+# с числом ключей, а SQLite ограничивает глубину выражения (1000)
+KEYS_PER_STATEMENT = 200
+
+
+def _key_chunks(keys):
+    """Ключи по возрастанию (порядок блокировок), пачками по KEYS_PER_STATEMENT"""
+    keys = sorted(keys)
+    for start in range(0, len(keys), KEYS_PER_STATEMENT):
+        yield keys[start:start + KEYS_PER_STATEMENT]
+
+
+def _rows(key_fields, keys):
+    """Условие Q, выбирающее строки ключей keys"""
+    if len(key_fields) == 1:
+        return models.Q(**{f'{key_fields[0]}__in': [key for key, in keys]})
+    rows = models.Q()
+    for key in keys:
+        rows |= models.Q(**dict(zip(key_fields, key)))
+    return rows
+
+
+def create_missing(model, key_fields, keys, defaults=None):
+    """
+    Создаёт недостающие строки model для ключей keys (без блокировки существующих);
+    defaults — {ключ: значения остальных полей новой строки}.
+    """
+    defaults = defaults or {}
+    for chunk in _key_chunks(keys):
+        existing = set(model.objects.filter(_rows(key_fields, chunk)).values_list(*key_fields))
+        missing = [
+            model(**dict(zip(key_fields, key)), **defaults.get(key, {})) for key in chunk if key not in existing
+        ]
+        if missing:
+            model.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def add_quantities(model, key_fields, changes, defaults=None, field='current_quantity'):
+    """
+    Прибавляет к полю field строк model изменения {ключ: величина}
+    UPDATE с CASE на каждые KEYS_PER_STATEMENT ключей; недостающие строки
+    предварительно создаются с нулём (defaults — {ключ: значения остальных полей новой строки}).
+    """
+    create_missing(model, key_fields, changes, defaults)
+    for chunk in _key_chunks(changes):
+        model.objects.filter(_rows(key_fields, chunk)).update(**{
+            field: models.F(field) + models.Case(
+                *[models.When(**dict(zip(key_fields, key)), then=models.Value(changes[key])) for key in chunk],
+                output_field=models.FloatField()
+            )
+        })
+
+
+def update_balances(totals):
+    """
+    Изменяет сводный остаток: totals — {(id номенклатуры,): изменение}.
+    При WAREHOUSE_BALANCE_SHARDS = N > 0 изменение прибавляется к случайной
+    из N частей (WarehouseBalanceShard), а строка Warehouse не блокируется:
+    параллельные проводки одной номенклатуры обычно попадают в разные части.
+    """
+    shards = settings.WAREHOUSE_BALANCE_SHARDS
+    if not shards:
+        add_quantities(Warehouse, ('nomenclature_id',), totals)
+        return
+
+    # Строка склада нужна списку остатков; существующие строки не трогаем
+    create_missing(Warehouse, ('nomenclature_id',), totals)
+    shard = random.randrange(shards)
+    add_quantities(
+        WarehouseBalanceShard, ('nomenclature_id', 'shard'),
+        {(nomenclature_id, shard): delta for (nomenclature_id,), delta in totals.items()},
+        field='delta'
+    )
+
+
+def compact_balance_shards(chunk_size=500, log=None):
+    """
+    Переносит накопленные в частях изменения в Warehouse.current_quantity
+    и обнуляет части. Номенклатуры обрабатываются пачками по chunk_size,
+    каждая пачка — в своей транзакции. Возвращает число номенклатур.
+    """
+    compacted = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            nomenclature_ids = list(
+                WarehouseBalanceShard.objects.filter(nomenclature_id__gt=last_id).exclude(delta=0)
+                .order_by('nomenclature_id').values_list('nomenclature_id', flat=True).distinct()[:chunk_size]
+            )
+            if not nomenclature_ids:
+                break
+
+            # Части блокируются раньше строк склада — в том же порядке, что и у сверки
+            shards = list(
+                WarehouseBalanceShard.objects.select_for_update()
+                .filter(nomenclature_id__in=nomenclature_ids).exclude(delta=0)
+                .order_by('nomenclature_id', 'shard').values_list('id', 'nomenclature_id', 'delta')
+            )
+            totals = {}
+            for _, nomenclature_id, delta in shards:
+                totals[(nomenclature_id,)] = totals.get((nomenclature_id,), 0) + delta
+            add_quantities(Warehouse, ('nomenclature_id',), totals)
+            WarehouseBalanceShard.objects.filter(id__in=[shard_id for shard_id, _, _ in shards]).update(delta=0)
+
+        compacted += len(nomenclature_ids)
+        last_id = nomenclature_ids[-1]
+        if log:
+            log(f"  перенесено номенклатур: {compacted}")
+    return compacted
+
+
+def apply_stock_changes(changes, operations=()):
+    """
+    Изменяет остатки по местам хранения и сводный остаток склада и сохраняет
+    операции проводки. changes — {(id места хранения, id номенклатуры): изменение количества},
+    operations — несохранённые Operation.
+    Сводный Warehouse обновляется последним из остатков: строку популярной
+    номенклатуры транзакция держит заблокированной как можно меньше.
+    Операции и журнал изменений для синхронизации ТСД пишутся в конце, под
+    блокировкой порядка фиксации (sync.lock_commit_order): id операций и номера
+    журнала растут в порядке фиксации (incremental.py, sync.py). После вызова
+    проводка пишет только в уже заблокированные ею строки.
+    """
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes and not operations:
+        return
+
+    add_quantities(LocationStock, ('location_id', 'nomenclature_id'), changes)
+
+    totals = {}
+    for (_, nomenclature_id), delta in changes.items():
+        totals[(nomenclature_id,)] = totals.get((nomenclature_id,), 0) + delta
+    # Перемещение не меняет сводный остаток — строку склада не трогаем
+    totals = {key: delta for key, delta in totals.items() if delta}
+    if totals:
+        update_balances(totals)
+
+    lock_commit_order()
+    Operation.objects.bulk_create(operations)
+    record_changes("stock", {nomenclature_id for _, nomenclature_id in changes})
+
+
+def deduct(warehouse, quantities, reason, document, note='', idempotency_key=None):
+    """
+    Списание со склада по партиям.
+    quantities — {id LiveBatch: количество}. Возвращает (итого списано, [описания партий]).
+    """
+    check_not_frozen([warehouse.nomenclature_id])
+    live_batches = LiveBatch.objects.select_for_update().filter(
+        id__in=quantities,
+        nomenclature_id=warehouse.nomenclature_id
+    ).select_related('product_batch').order_by('expiration_date')
+
+    total_deducted = 0
+    batches_processed = []
+    operations = []
+    changes = {}
+    for lb in live_batches:
+        qty = quantities[lb.id]
+        if not math.isfinite(qty) or qty <= 0:
+            raise StockError("Количество должно быть больше нуля")
+        if qty > lb.current_quantity:
+            raise StockError(
+                f"Недостаточно в партии {lb.product_batch.batch_number}. "
+                f"Доступно: {lb.current_quantity:.2f}, запрошено: {qty:.2f}"
+            )
+
+        operations.append(Operation(
+            batch=lb.product_batch,
+            nomenclature=warehouse.nomenclature,
+            operation_type="deduction",
+            quantity=qty,
+            reason=reason,
+            document=document,
+            note=note,
+            idempotency_key=idempotency_key,
+            location_id=lb.location_id
+        ))
+
+        # Обновляем LiveBatch
+        lb.current_quantity -= qty
+        if lb.current_quantity == 0:
+            lb.delete()  # партия полностью списана
+        else:
+            lb.save(update_fields=['current_quantity'])
+
+        key = (lb.location_id, warehouse.nomenclature_id)
+        changes[key] = changes.get(key, 0) - qty
+        total_deducted += qty
+        batches_processed.append(f"{lb.product_batch.batch_number} ({qty:.2f})")
+
+    if len(batches_processed) != len(quantities):
+        raise StockError("Партия уже списана или не относится к этой номенклатуре")
+
+    # Обновляем остатки мест хранения и склада без гонки чтения-записи
+    apply_stock_changes(changes, operations)
+    schedule_stock_check([warehouse.nomenclature_id])
+    return total_deducted, batches_processed
+
+
+def deduct_fefo(warehouse, quantity, reason, document, note='', idempotency_key=None, batch=None, location=None):
+    """
+    Списание количества по принципу FEFO: сначала партии с ближайшим сроком годности.
+    Если передана партия batch — списание только из неё,
+    если место хранения location — только из этого места.
+    """
+    if not math.isfinite(quantity) or quantity <= 0:
+        raise StockError("Количество должно быть больше нуля")
+    live_batches = LiveBatch.objects.select_for_update().filter(
+        nomenclature_id=warehouse.nomenclature_id
+    ).order_by('expiration_date', 'id')
+    if batch is not None:
+        live_batches = live_batches.filter(product_batch=batch)
+    if location is not None:
+        live_batches = live_batches.filter(location=location)
+
+    quantities = {}
+    remaining = quantity
+    for lb_id, available in live_batches.values_list('id', 'current_quantity'):
+        if remaining <= 0:
+            break
+        take = min(available, remaining)
+        quantities[lb_id] = take
+        remaining -= take
+
+    # Записано отрицанием: NaN не пройдёт проверку незамеченным
+    if not remaining <= 1e-9:
+        raise StockError(
+            f"Недостаточно остатка: запрошено {quantity:.2f}, "
+            f"доступно {quantity - remaining:.2f} {warehouse.nomenclature.unit}"
+        )
+    return deduct(warehouse, quantities, reason, document, note, idempotency_key=idempotency_key)
+
+
+# Причина списания просроченных партий (в журнале и отчёте о движении)
+EXPIRED_REASON = "Истёк срок годности"
+
+
+def write_off_expired(today=None, chunk_size=1000, live_batch_ids=None, log=None):
+    """
+    Списывает все партии, срок годности которых истёк до today (по умолчанию — сегодня).
+    Партии обрабатываются пачками по chunk_size, каждая пачка — в своей транзакции:
+    операции создаются через bulk_create, остатки уменьшаются set-based UPDATE.
+    live_batch_ids ограничивает списание выбранными партиями (действие в админке).
+    Возвращает количество списанных партий.
+    """
+    today = today or timezone.localdate()
+    # Номенклатуры на инвентаризации пропускаем — их спишет следующий запуск
+    expired = LiveBatch.objects.filter(expiration_date__lt=today).exclude(
+        nomenclature__stocktakes__status="open"
+    )
+    if live_batch_ids is not None:
+        expired = expired.filter(id__in=live_batch_ids)
+    expired = expired.order_by('id')
+
+    document = next_document_number('EXPIRED')
+    written_off = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                expired.select_for_update()
+                .values_list('id', 'product_batch_id', 'nomenclature_id', 'location_id', 'current_quantity')[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            now = timezone.now()
+            operations = [
+                Operation(
+                    batch_id=batch_id,
+                    nomenclature_id=nomenclature_id,
+                    operation_type="deduction",
+                    operation_date=now,
+                    quantity=quantity,
+                    reason=EXPIRED_REASON,
+                    document=document,
+                    location_id=location_id,
+                )
+                for _, batch_id, nomenclature_id, location_id, quantity in chunk
+            ]
+            LiveBatch.objects.filter(id__in=[row[0] for row in chunk]).delete()
+
+            changes = {}
+            for _, _, nomenclature_id, location_id, quantity in chunk:
+                key = (location_id, nomenclature_id)
+                changes[key] = changes.get(key, 0) - quantity
+            apply_stock_changes(changes, operations)
+            schedule_stock_check({nomenclature_id for _, nomenclature_id in changes})
+
+        written_off += len(chunk)
+        if log:
+            log(f"  списано партий: {written_off}")
+    return written_off
+
+
+def transfer(lines, document, note='', idempotency_key=None):
+    """
+    Перемещение партий между местами хранения одной транзакцией.
+    lines — [(id LiveBatch источника, id места назначения, количество)].
+    По каждой строке создаётся пара операций transfer_out / transfer_in,
+    остатки партий и мест хранения меняются UPDATE с CASE, сводный склад не меняется.
+    Возвращает количество перемещённых строк.
+    """
+    sources = {
+        lb.id: lb
+        for lb in LiveBatch.objects.select_for_update().filter(
+            id__in={source_id for source_id, _, _ in lines}
+        ).select_related('product_batch').order_by('id')
+    }
+    check_not_frozen({lb.nomenclature_id for lb in sources.values()})
+
+    taken = {}
+    operations = []
+    source_changes = {}
+    target_changes = {}
+    target_defaults = {}
+    stock_changes = {}
+    now = timezone.now()
+    for source_id, location_id, quantity in lines:
+        lb = sources.get(source_id)
+        if lb is None:
+            raise StockError("Партия уже списана или перемещена")
+        if not math.isfinite(quantity) or quantity <= 0:
+            raise StockError("Количество должно быть больше нуля")
+        if location_id == lb.location_id:
+            raise StockError("Место назначения совпадает с местом хранения партии")
+        taken[source_id] = taken.get(source_id, 0) + quantity
+        if not taken[source_id] <= lb.current_quantity + 1e-9:
+            raise StockError(
+                f"Недостаточно в партии {lb.product_batch.batch_number}. "
+                f"Доступно: {lb.current_quantity:.2f}, запрошено: {taken[source_id]:.2f}"
+            )
+
+        common = dict(
+            batch_id=lb.product_batch_id,
+            nomenclature_id=lb.nomenclature_id,
+            operation_date=now,
+            quantity=quantity,
+            document=document,
+            note=note,
+            idempotency_key=idempotency_key,
+        )
+        operations.append(Operation(operation_type="transfer_out", location_id=lb.location_id, **common))
+        operations.append(Operation(operation_type="transfer_in", location_id=location_id, **common))
+
+        source_changes[(source_id,)] = source_changes.get((source_id,), 0) - quantity
+        target = (lb.product_batch_id, location_id)
+        target_changes[target] = target_changes.get(target, 0) + quantity
+        target_defaults[target] = {
+            'nomenclature_id': lb.nomenclature_id,
+            'expiration_date': lb.expiration_date,
+        }
+        for key, delta in (((lb.location_id, lb.nomenclature_id), -quantity),
+                           ((location_id, lb.nomenclature_id), quantity)):
+            stock_changes[key] = stock_changes.get(key, 0) + delta
+
+    add_quantities(LiveBatch, ('id',), source_changes)
+    add_quantities(LiveBatch, ('product_batch_id', 'location_id'), target_changes, defaults=target_defaults)
+    # Полностью перемещённые партии убираем из оперативного индекса
+    LiveBatch.objects.filter(id__in=sources, current_quantity__lte=1e-9).delete()
+    apply_stock_changes(stock_changes, operations)
+    return len(lines)
+
+
+def run_once(key, scope, action):
+    """
+    Выполняет проводку action(ключ) не более одного раза для ключа идемпотентности.
+    action возвращает текст результата, он сохраняется вместе с ключом.
+    Возвращает (результат, признак повтора).
+    """
+    if not key:
+        with transaction.atomic():
+            return action(None), False
+
+    # Повтор определяется одним поиском по уникальному индексу
+    previous = IdempotencyKey.objects.filter(key=key).values_list('result', flat=True).first()
+    if previous is not None:
+        return previous, True
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                idempotency_key = IdempotencyKey.objects.create(key=key, scope=scope)
+        except IntegrityError:
+            # Параллельный запрос с тем же ключом успел первым
+            return IdempotencyKey.objects.get(key=key).result, True
+
+        result = action(idempotency_key)
+        idempotency_key.result = result
+        idempotency_key.save(update_fields=['result'])
+    return result, False
@@ -0,0 +1,267 @@
+"""
+Инвентаризация (пересчёт фактических остатков).
+
+При открытии сессии учётные остатки активных партий выбранных номенклатур
+копируются в строки инвентаризации, а сами номенклатуры «замораживаются»:
+проводки по ним запрещены до проведения или отмены сессии (остальной склад
+работает). Фактические количества загружаются пакетно — со сканера или из
+файла. Расхождения считаются одним запросом строк с присоединённым LiveBatch,
+корректировки проводятся через bulk_create и set-based UPDATE.
+"""
+import csv
+import io
+import math
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, FilteredRelation, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .alerts import schedule_stock_check
+from .models import LiveBatch, Operation, ProductBatch, StocktakeLine, StocktakeSession, StorageLocation
+from .stock import StockError, add_quantities, apply_stock_changes
+
+SHORTAGE_REASON = "Инвентаризация: недостача"
+SURPLUS_NOTE = "Инвентаризация: излишек"
+
+
+def next_session_document():
+    """
+    Номер инвентаризации за сегодня: INV-ГГГГММДД-001, -002, ...
+    Следует за наибольшим номером дня, а не за числом сессий: после удаления
+    сессии количество меньше наибольшего номера, и номер повторился бы.
+    """
+    prefix = f"INV-{timezone.now():%Y%m%d}-"
+    numbers = [
+        int(document[len(prefix):])
+        for document in StocktakeSession.objects.filter(document__startswith=prefix).values_list('document', flat=True)
+        if document[len(prefix):].isdigit()
+    ]
+    return f"{prefix}{max(numbers, default=0) + 1:03d}"
+
+
+def create_session(attempts=5, **fields):
+    """
+    Создаёт сессию со следующим номером. Параллельная сессия могла занять
+    тот же номер — тогда уникальный индекс отклонит вставку и номер берётся заново.
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return StocktakeSession.objects.create(document=next_session_document(), **fields)
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+
+
+def start_stocktake(location=None, nomenclature_ids=None, user=None, note=''):
+    """
+    Открывает инвентаризацию по месту хранения (None — все места) и номенклатурам
+    (пусто — все, что есть в месте хранения). Учётные остатки партий
+    копируются в строки сессии одним INSERT.
+    """
+    live = LiveBatch.objects.all()
+    if location is not None:
+        live = live.filter(location=location)
+
+    with transaction.atomic():
+        if nomenclature_ids:
+            live = live.filter(nomenclature_id__in=nomenclature_ids)
+        else:
+            nomenclature_ids = set(live.values_list('nomenclature_id', flat=True).distinct())
+        if not nomenclature_ids:
+            raise StockError("Нет остатков для инвентаризации")
+
+        busy = StocktakeSession.objects.select_for_update().filter(
+            status="open",
+            nomenclatures__in=nomenclature_ids
+        ).values_list('document', flat=True).first()
+        if busy:
+            raise StockError(f"Часть номенклатуры уже на инвентаризации ({busy})")
+
+        session = create_session(location=location, note=note, created_by=user)
+        session.nomenclatures.set(nomenclature_ids)
+        StocktakeLine.objects.bulk_create(
+            [
+                StocktakeLine(
+                    session=session,
+                    product_batch_id=product_batch_id,
+                    location_id=location_id,
+                    nomenclature_id=nomenclature_id,
+                    expected_quantity=quantity
+                )
+                for product_batch_id, location_id, nomenclature_id, quantity in live.values_list(
+                    'product_batch_id', 'location_id', 'nomenclature_id', 'current_quantity'
+                ).iterator()
+            ],
+            batch_size=1000
+        )
+    return session
+
+
+def parse_counts_csv(uploaded_file):
+    """
+    Строки файла пересчёта: номер партии; код места хранения; количество.
+    Разделитель — «;», «,» или табуляция, строка заголовка допускается.
+    """
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+    except csv.Error:
+        dialect = csv.excel
+    rows = []
+    for row in csv.reader(text, dialect):
+        if len(row) < 3 or not row[0].strip():
+            continue
+        try:
+            quantity = float(row[2].replace(',', '.'))
+        except ValueError:
+            continue  # заголовок
+        rows.append((row[0].strip(), row[1].strip(), quantity))
+    return rows
+
+
+def load_counts(session, rows):
+    """
+    Сохраняет фактические количества [(номер партии, код места, количество)].
+    Повторный пересчёт партии перезаписывает прежнее значение.
+    Возвращает (загружено строк, [ошибки]).
+    """
+    if session.status != "open":
+        raise StockError("Инвентаризация уже закрыта")
+
+    batches = ProductBatch.objects.in_bulk({row[0] for row in rows}, field_name='batch_number')
+    locations = StorageLocation.objects.in_bulk({row[1] for row in rows}, field_name='code')
+    frozen = set(session.nomenclatures.values_list('id', flat=True))
+
+    lines = {}
+    errors = []
+    for n, (batch_number, location_code, quantity) in enumerate(rows, start=1):
+        batch = batches.get(batch_number)
+        location = locations.get(location_code)
+        if batch is None or location is None:
+            errors.append(f"Строка {n}: партия {batch_number} или место {location_code} не найдены")
+        elif batch.nomenclature_id not in frozen:
+            errors.append(f"Строка {n}: номенклатура партии {batch_number} не входит в инвентаризацию")
+        elif session.location_id and location.id != session.location_id:
+            errors.append(f"Строка {n}: место {location_code} не входит в инвентаризацию")
+        elif batch.reception_date is None:
+            # Излишек по такой партии создал бы LiveBatch, и её приёмка потом не прошла бы
+            errors.append(f"Строка {n}: партия {batch_number} ещё не принята")
+        elif not math.isfinite(quantity) or quantity < 0:
+            errors.append(f"Строка {n}: некорректное количество")
+        else:
+            lines[(batch.id, location.id)] = StocktakeLine(
+                session=session,
+                product_batch_id=batch.id,
+                location_id=location.id,
+                nomenclature_id=batch.nomenclature_id,
+                counted_quantity=quantity
+            )
+
+    StocktakeLine.objects.bulk_create(
+        lines.values(),
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['session', 'product_batch', 'location'],
+        update_fields=['counted_quantity']
+    )
+    return len(lines), errors
+
+
+def variance_queryset(session):
+    """
+    Строки инвентаризации с текущим учётным остатком партии в месте хранения
+    (LEFT JOIN LiveBatch) и расхождением «факт − учёт».
+    """
+    return (
+        StocktakeLine.objects
+        .filter(session=session)
+        .annotate(
+            live=FilteredRelation(
+                'product_batch__live_batches',
+                condition=Q(product_batch__live_batches__location=F('location'))
+            )
+        )
+        .annotate(book_quantity=Coalesce(F('live__current_quantity'), 0.0))
+        .annotate(difference=F('counted_quantity') - F('book_quantity'))
+    )
+
+
+def post_stocktake(session, zero_uncounted=False):
+    """
+    Проводит инвентаризацию: недостачи списываются, излишки приходуются,
+    остатки партий, мест хранения и склада корректируются, заморозка снимается.
+    zero_uncounted — считать непересчитанные партии отсутствующими.
+    Возвращает количество проведённых корректировок.
+    """
+    with transaction.atomic():
+        session = StocktakeSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != "open":
+            raise StockError("Инвентаризация уже закрыта")
+
+        nomenclature_ids = list(session.nomenclatures.values_list('id', flat=True))
+        # Блокируем активные партии замороженных номенклатур
+        list(LiveBatch.objects.select_for_update().filter(
+            nomenclature_id__in=nomenclature_ids
+        ).values_list('id', flat=True))
+
+        now = timezone.now()
+        operations = []
+        line_updates = []
+        batch_changes = {}
+        batch_defaults = {}
+        stock_changes = {}
+        for line in variance_queryset(session).select_related('product_batch'):
+            counted = line.counted_quantity
+            if counted is None:
+                if not zero_uncounted:
+                    continue
+                counted = 0.0
+            difference = counted - line.book_quantity
+            line.counted_quantity = counted
+            line.variance = difference
+            line_updates.append(line)
+            if abs(difference) <= 1e-9:
+                continue
+
+            operations.append(Operation(
+                batch_id=line.product_batch_id,
+                nomenclature_id=line.nomenclature_id,
+                location_id=line.location_id,
+                operation_type="reception" if difference > 0 else "deduction",
+                operation_date=now,
+                quantity=abs(difference),
+                reason=None if difference > 0 else SHORTAGE_REASON,
+                note=SURPLUS_NOTE if difference > 0 else session.note,
+                document=session.document,
+            ))
+            key = (line.product_batch_id, line.location_id)
+            batch_changes[key] = difference
+            batch_defaults[key] = {
+                'nomenclature_id': line.nomenclature_id,
+                'expiration_date': line.product_batch.expiration_date,
+            }
+            stock_key = (line.location_id, line.nomenclature_id)
+            stock_changes[stock_key] = stock_changes.get(stock_key, 0) + difference
+
+        if batch_changes:
+            add_quantities(LiveBatch, ('product_batch_id', 'location_id'), batch_changes, defaults=batch_defaults)
+            LiveBatch.objects.filter(nomenclature_id__in=nomenclature_ids, current_quantity__lte=1e-9).delete()
+            apply_stock_changes(stock_changes, operations)
+        StocktakeLine.objects.bulk_update(line_updates, ['counted_quantity', 'variance'], batch_size=1000)
+
+        session.status = "posted"
+        session.posted_at = now
+        session.save(update_fields=['status', 'posted_at'])
+        schedule_stock_check(nomenclature_ids)
+    return len(operations)
+
+
+def cancel_stocktake(session):
+    """Отменяет инвентаризацию без корректировок и снимает заморозку"""
+    updated = StocktakeSession.objects.filter(pk=session.pk, status="open").update(status="cancelled")
+    if not updated:
+        raise StockError("Инвентаризация уже закрыта")
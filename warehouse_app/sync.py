@@ -0,0 +1,192 @@
+"""
+Синхронизация терминалов сбора данных (ТСД), работающих без сети,
+и живое обновление страницы склада (поток Server-Sent Events).
+
+Проводки (приёмка, списание, перемещение, инвентаризация, списание просроченных)
+и правки номенклатуры добавляют строки в ChangeLog в той же транзакции: запись
+журнала фиксируется вместе с изменением или откатывается вместе с ним.
+Терминал один раз загружает полный снимок (snapshot_lines), затем запрашивает
+только изменения после последнего полученного номера (changes_since).
+
+Номер seq выдаётся при вставке, а видна строка после фиксации транзакции.
+Чтобы номер незафиксированной транзакции не оказался позади уже выданного
+клиенту, запись в журнал — последняя запись проводки и делается под блокировкой
+CommitLock, которую транзакция держит до фиксации (lock_commit_order): следующая
+транзакция получит номер только после фиксации или отката предыдущей.
+Поэтому номера видимых записей растут без пропусков в порядке фиксации,
+и клиентам можно выдавать все зафиксированные записи.
+
+Изменение остатков передаётся целиком по номенклатуре — сводный остаток и все
+её активные партии: клиент заменяет набор партий номенклатуры, поэтому
+списанные партии исчезают без отдельных удалений, а повторная доставка безвредна.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.utils.formats import localize
+
+from .balances import with_balance
+from .models import ChangeLog, CommitLock, LiveBatch, LocationStock, Nomenclature, Warehouse
+
+# Колонки данных: строки передаются списками значений в этом порядке
+NOMENCLATURE_FIELDS = ('id', 'code', 'name', 'unit')
+WAREHOUSE_FIELDS = ('nomenclature_id', 'current_quantity')
+# Остаток читается с учётом частей (balances.with_balance), колонка называется по-прежнему
+WAREHOUSE_VALUES = ('nomenclature_id', 'balance')
+LIVE_BATCH_FIELDS = (
+    'id', 'nomenclature_id', 'product_batch__batch_number', 'location__code',
+    'expiration_date', 'current_quantity',
+)
+
+
+def lock_commit_order():
+    """
+    Блокирует строку CommitLock до конца текущей транзакции.
+    После блокировки транзакция пишет только в уже заблокированные ею строки:
+    иначе она могла бы ждать транзакцию, которая сама ждёт CommitLock.
+    В SQLite блокировка строк не нужна — записывающие транзакции и так по одной.
+    """
+    CommitLock.objects.select_for_update().get_or_create(pk=1)
+
+
+def record_changes(entity, object_ids, deleted=False):
+    """
+    Добавляет изменения в журнал в текущей транзакции: откаченная проводка
+    в журнал не попадает. Вызывается последней записью транзакции
+    """
+    object_ids = sorted(set(object_ids))
+    if not object_ids:
+        return
+    lock_commit_order()
+    ChangeLog.objects.bulk_create([
+        ChangeLog(entity=entity, object_id=object_id, deleted=deleted)
+        for object_id in object_ids
+    ])
+
+
+def _table(queryset, fields, values=None):
+    return {
+        'fields': fields,
+        'rows': [list(row) for row in queryset.values_list(*(values or fields))],
+    }
+
+
+def changes_since(since, limit):
+    """
+    Изменения с номером больше since (не более limit записей журнала).
+    Несколько изменений одного объекта схлопываются в одно — передаётся
+    текущее состояние. Признак more — есть ещё изменения, запросить снова с seq.
+    """
+    log = list(
+        ChangeLog.objects.filter(seq__gt=since).order_by('seq')
+        .values_list('seq', 'entity', 'object_id', 'deleted')[:limit + 1]
+    )
+    more = len(log) > limit
+    log = log[:limit]
+
+    latest = {}
+    for _, entity, object_id, deleted in log:
+        latest[(entity, object_id)] = deleted
+    nomenclature_ids = [object_id for (entity, object_id), deleted in latest.items()
+                        if entity == "nomenclature" and not deleted]
+    deleted_ids = [object_id for (entity, object_id), deleted in latest.items()
+                   if entity == "nomenclature" and deleted]
+    stock_ids = sorted(object_id for entity, object_id in latest if entity == "stock")
+
+    return {
+        'seq': log[-1][0] if log else since,
+        'more': more,
+        'nomenclature': _table(Nomenclature.objects.filter(id__in=nomenclature_ids).order_by('id'), NOMENCLATURE_FIELDS),
+        'deleted_nomenclature': sorted(deleted_ids),
+        # Для этих номенклатур клиент заменяет остаток и набор партий целиком
+        'stock_nomenclature_ids': stock_ids,
+        'warehouse': _table(
+            with_balance(Warehouse.objects.filter(nomenclature_id__in=stock_ids)).order_by('nomenclature_id'),
+            WAREHOUSE_FIELDS, WAREHOUSE_VALUES
+        ),
+        'live_batches': _table(LiveBatch.objects.filter(nomenclature_id__in=stock_ids).order_by('id'), LIVE_BATCH_FIELDS),
+    }
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def snapshot_lines(chunk_size=2000):
+    """
+    Полный снимок в формате NDJSON. Первая строка — заголовок с номером журнала
+    и колонками, далее по строке на запись: ["n", ...] — номенклатура,
+    ["w", ...] — сводный остаток, ["b", ...] — активная партия.
+    Номер журнала берётся до чтения данных: изменения, сделанные во время
+    выгрузки, клиент получит следующим запросом changes_since
+    (повторная доставка безвредна).
+    """
+    seq = ChangeLog.objects.aggregate(seq=Max('seq'))['seq'] or 0
+    yield _dumps({
+        'seq': seq,
+        'n': NOMENCLATURE_FIELDS,
+        'w': WAREHOUSE_FIELDS,
+        'b': LIVE_BATCH_FIELDS,
+    }) + '\n'
+
+    for prefix, queryset, fields in (
+        ('n', Nomenclature.objects.order_by('id'), NOMENCLATURE_FIELDS),
+        ('w', with_balance(Warehouse.objects).order_by('nomenclature_id'), WAREHOUSE_VALUES),
+        ('b', LiveBatch.objects.order_by('id'), LIVE_BATCH_FIELDS),
+    ):
+        lines = []
+        for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+            lines.append(_dumps([prefix, *row]))
+            if len(lines) == chunk_size:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+
+async def alast_seq():
+    """Номер последней записи журнала изменений"""
+    return (await ChangeLog.objects.aaggregate(seq=Max('seq')))['seq'] or 0
+
+
+async def astock_updates(since, location_id=None, limit=1000):
+    """
+    Новые остатки номенклатур, изменившихся после номера since, для страницы склада.
+    Возвращает (номер последнего учтённого изменения, [{id, quantity, location_quantity}]);
+    количества отформатированы так же, как в шаблоне.
+    """
+    log = [
+        row async for row in ChangeLog.objects.filter(seq__gt=since, entity="stock")
+        .order_by('seq').values_list('seq', 'object_id')[:limit]
+    ]
+    if not log:
+        return since, []
+
+    nomenclature_ids = {object_id for _, object_id in log}
+    quantities = {
+        nomenclature_id: quantity
+        async for nomenclature_id, quantity in with_balance(Warehouse.objects.filter(
+            nomenclature_id__in=nomenclature_ids
+        )).values_list(*WAREHOUSE_VALUES)
+    }
+    location_quantities = {}
+    if location_id is not None:
+        location_quantities = {
+            nomenclature_id: quantity
+            async for nomenclature_id, quantity in LocationStock.objects.filter(
+                location_id=location_id, nomenclature_id__in=nomenclature_ids
+            ).values_list('nomenclature_id', 'current_quantity')
+        }
+
+    updates = [
+        {
+            'id': nomenclature_id,
+            'quantity': localize(quantities.get(nomenclature_id, 0.0)),
+            'location_quantity': (
+                localize(location_quantities.get(nomenclature_id, 0.0)) if location_id is not None else None
+            ),
+        }
+        for nomenclature_id in sorted(nomenclature_ids)
+    ]
+    return log[-1][0], updates
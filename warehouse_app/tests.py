@@ -1,3 +1,815 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import profiling
+from .archive import archive_boundary, archive_operations, journal_queryset, month_start, next_month
+from .balances import with_balance
+from .consistency import find_location_mismatches, find_mismatches, repair_location_stock, repair_warehouse
+from .exports import claim_next_job, requeue_stale_jobs
+from .forecast import compute_forecast, ewma_weights
+from .incremental import commit_watermark, increment_queryset, is_committed, plan_increment
+from .models import (
+    ChangeLog, ExportJob, IdempotencyKey, LiveBatch, LocationStock, Nomenclature, Operation, ProductBatch,
+    StockAlert, StorageLocation, Warehouse, WarehouseBalanceShard,
+)
+from .reports import archive_cut_message, movement_report
+from .routers import PIN_COOKIE, REPLICA, ReplicaRouter, _reading_from, replica_pin_middleware, use_replica
+from .parquet_export import build_parquet_archive
+from .stock import (
+    EXPIRED_REASON, StockError, compact_balance_shards, deduct, deduct_fefo, run_once, transfer, update_balances,
+    write_off_expired,
+)
+from .stocktake import cancel_stocktake, load_counts, post_stocktake, start_stocktake
+from .sync import changes_since
+from .versions import data_version
+from .views.warehouse import warehouse_events, warehouse_list
+
+
+class StockTestCase(TestCase):
+    """Номенклатура с тремя принятыми партиями по 10 на месте по умолчанию"""
+
+    def setUp(self):
+        self.nomenclature = Nomenclature.objects.create(code="T001", name="Тест", unit="кг", shelf_life_days=30)
+        today = timezone.localdate()
+        self.batches = []
+        for n in range(3):
+            batch = ProductBatch.objects.create(
+                nomenclature=self.nomenclature, batch_number=f"T001-{n}", quantity=10.0,
+                production_date=today, expiration_date=today + timezone.timedelta(days=10 + n)
+            )
+            batch.receive()
+            self.batches.append(batch)
+        self.warehouse = Warehouse.objects.get(nomenclature=self.nomenclature)
+        self.user = User.objects.create_user("tester", password="secret")
+        self.client.force_login(self.user)
+
+    def balance(self):
+        return Warehouse.objects.get(nomenclature=self.nomenclature).current_quantity
+
+    def live_total(self):
+        return sum(LiveBatch.objects.filter(nomenclature=self.nomenclature).values_list('current_quantity', flat=True))
+
+    def bulk_stock(self, count, expiration_date=None):
+        """
+        count номенклатур с одной принятой партией по 1 на месте по умолчанию —
+        строки создаются пачками, минуя проводки
+        """
+        today = timezone.localdate()
+        expiration_date = expiration_date or today + timezone.timedelta(days=30)
+        location = StorageLocation.get_default()
+        nomenclatures = Nomenclature.objects.bulk_create([
+            Nomenclature(code=f"B{n:04d}", name=f"Позиция {n}", unit="кг", shelf_life_days=30) for n in range(count)
+        ])
+        batches = ProductBatch.objects.bulk_create([
+            ProductBatch(
+                nomenclature=nomenclature, batch_number=f"{nomenclature.code}-1", quantity=1.0,
+                production_date=today, expiration_date=expiration_date, reception_date=timezone.now()
+            )
+            for nomenclature in nomenclatures
+        ])
+        LiveBatch.objects.bulk_create([
+            LiveBatch(
+                product_batch=batch, location=location, nomenclature=batch.nomenclature,
+                expiration_date=expiration_date, current_quantity=1.0
+            )
+            for batch in batches
+        ])
+        Warehouse.objects.bulk_create([Warehouse(nomenclature=n, current_quantity=1.0) for n in nomenclatures])
+        LocationStock.objects.bulk_create([
+            LocationStock(location=location, nomenclature=n, current_quantity=1.0) for n in nomenclatures
+        ])
+        return nomenclatures
+
+
+class DeductionTests(StockTestCase):
+    def test_fefo_takes_earliest_expiration_first(self):
+        with transaction.atomic():
+            total, processed = deduct_fefo(self.warehouse, 15, "Продажа", "DOC-1")
+        self.assertEqual(total, 15)
+        self.assertEqual(processed, ["T001-0 (10.00)", "T001-1 (5.00)"])
+        self.assertEqual(self.balance(), 15)
+        self.assertEqual(self.live_total(), 15)
+
+    def test_fefo_rejects_shortage(self):
+        with self.assertRaises(StockError), transaction.atomic():
+            deduct_fefo(self.warehouse, 31, "Продажа", "DOC-1")
+        self.assertEqual(self.balance(), 30)
+
+    def test_fefo_rejects_non_finite_quantity(self):
+        for quantity in (float('nan'), float('inf'), -1, 0):
+            with self.subTest(quantity=quantity):
+                with self.assertRaises(StockError), transaction.atomic():
+                    deduct_fefo(self.warehouse, quantity, "Продажа", "DOC-1")
+        self.assertEqual(self.balance(), 30)
+        self.assertEqual(self.live_total(), 30)
+
+    def test_deduct_rejects_non_finite_quantity(self):
+        live_batch = LiveBatch.objects.filter(nomenclature=self.nomenclature).first()
+        with self.assertRaises(StockError), transaction.atomic():
+            deduct(self.warehouse, {live_batch.id: float('nan')}, "Продажа", "DOC-1")
+        self.assertEqual(self.live_total(), 30)
+
+    def test_scan_pick_rejects_nan(self):
+        for quantity in ('NaN', '"nan"', 'Infinity'):
+            with self.subTest(quantity=quantity):
+                response = self.client.post(
+                    '/scan/',
+                    f'{{"code": "T001", "action": "pick", "quantity": {quantity}}}',
+                    content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.balance(), 30)
+        self.assertEqual(self.live_total(), 30)
+
+    def test_scan_pick_is_idempotent(self):
+        body = json.dumps({"code": "T001", "action": "pick", "quantity": 4})
+        for repeated in (False, True):
+            response = self.client.post('/scan/', body, content_type='application/json', HTTP_IDEMPOTENCY_KEY="k-1")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['repeated'], repeated)
+        self.assertEqual(self.balance(), 26)
+
+
+class WriteOffTests(StockTestCase):
+    def test_write_off_expired_batch(self):
+        ProductBatch.objects.filter(pk=self.batches[0].pk).update(expiration_date=timezone.localdate())
+        LiveBatch.objects.filter(product_batch=self.batches[0]).update(expiration_date=timezone.localdate())
+        self.assertEqual(write_off_expired(today=timezone.localdate() + timezone.timedelta(days=1)), 1)
+        self.assertEqual(self.balance(), 20)
+        self.assertEqual(self.live_total(), 20)
+        self.assertTrue(Operation.objects.filter(batch=self.batches[0], reason=EXPIRED_REASON).exists())
+
+    def test_write_off_chunk_wider_than_one_statement(self):
+        # Каждая партия — своя номенклатура: ключей больше, чем помещается в один UPDATE
+        count = 1000
+        nomenclatures = self.bulk_stock(count, expiration_date=timezone.localdate() - timezone.timedelta(days=1))
+        self.assertEqual(write_off_expired(chunk_size=count), count)
+        self.assertFalse(LiveBatch.objects.filter(nomenclature__in=nomenclatures).exists())
+        self.assertFalse(
+            Warehouse.objects.filter(nomenclature__in=nomenclatures).exclude(current_quantity=0).exists()
+        )
+        self.assertFalse(
+            LocationStock.objects.filter(nomenclature__in=nomenclatures).exclude(current_quantity=0).exists()
+        )
+        self.assertEqual(self.balance(), 30)
+
+
+class ScanApiTests(StockTestCase):
+    def scan(self, body, **headers):
+        return self.client.post('/scan/', json.dumps(body), content_type='application/json', **headers)
+
+    def test_receive_by_batch_number(self):
+        batch = ProductBatch.objects.create(
+            nomenclature=self.nomenclature, batch_number="T001-NEW", quantity=5.0,
+            production_date=timezone.localdate(), expiration_date=timezone.localdate() + timezone.timedelta(days=5)
+        )
+        for repeated in (False, True):
+            response = self.scan({"code": "T001-NEW", "action": "receive"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['repeated'], repeated)
+            self.assertEqual(response.json()['balance'], 35)
+        batch.refresh_from_db()
+        self.assertIsNotNone(batch.reception_date)
+        self.assertEqual(self.scan({"code": "T001", "action": "receive"}).status_code, 400)
+
+    def test_pick_from_location(self):
+        target = StorageLocation.objects.create(code="B-01", site="Основной склад")
+        with transaction.atomic():
+            transfer([(LiveBatch.objects.get(product_batch=self.batches[2]).id, target.id, 4)], "MOVE-1")
+        response = self.scan({"code": "T001", "action": "pick", "quantity": 3, "location": "B-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['balance'], 27)
+        self.assertEqual(LiveBatch.objects.get(product_batch=self.batches[2], location=target).current_quantity, 1)
+        self.assertEqual(LiveBatch.objects.get(product_batch=self.batches[0]).current_quantity, 10)
+        response = self.scan({"code": "T001", "action": "pick", "quantity": 2, "location": "B-01"})
+        self.assertEqual(response.status_code, 409)
+
+    def test_form_encoded_pick(self):
+        response = self.client.post('/scan/', {"code": "T001", "action": "pick", "quantity": "2"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.balance(), 28)
+
+    def test_errors(self):
+        self.assertEqual(self.scan({"code": "NOPE", "action": "pick", "quantity": 1}).status_code, 404)
+        self.assertEqual(self.scan({"code": "T001", "action": "pick", "quantity": 1, "location": "X"}).status_code, 404)
+        self.assertEqual(self.scan({"code": "T001", "action": "drop"}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.scan({"code": "T001", "action": "pick", "quantity": 1}).status_code, 401)
+        self.assertEqual(self.balance(), 30)
+
+    def test_malformed_bodies(self):
+        for body in ('[]', '"x"', '5', 'null', '{'):
+            with self.subTest(body=body):
+                response = self.client.post('/scan/', body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['ok'])
+        for body in ('[]', '"x"', '{"lines": 5}', '{"lines": "abc"}', '{"lines": {"batch": "T001-0"}}',
+                     '{"lines": [5]}', '{"lines": [[]]}', '{"lines": []}'):
+            with self.subTest(body=body):
+                response = self.client.post('/transfers/', body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['ok'])
+
+
+class TransferTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.target = StorageLocation.objects.create(code="B-01", site="Основной склад")
+
+    def post_transfer(self, quantity, key=None):
+        body = json.dumps({"lines": [{"batch": "T001-0", "from": "MAIN", "to": "B-01", "quantity": quantity}]})
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post('/transfers/', body, content_type='application/json', **headers)
+
+    def location_quantity(self, code):
+        return LocationStock.objects.filter(
+            location__code=code, nomenclature=self.nomenclature
+        ).values_list('current_quantity', flat=True).first() or 0
+
+    def test_transfer_moves_stock_between_locations(self):
+        for _ in range(2):
+            self.assertEqual(self.post_transfer(4, key="move-1").status_code, 200)
+        self.assertEqual(self.location_quantity("MAIN"), 26)
+        self.assertEqual(self.location_quantity("B-01"), 4)
+        self.assertEqual(self.balance(), 30)
+        self.assertEqual(LiveBatch.objects.get(product_batch=self.batches[0], location=self.target).current_quantity, 4)
+
+    def test_transfer_rejects_non_finite_and_excess_quantity(self):
+        self.assertEqual(self.post_transfer('NaN').status_code, 400)
+        self.assertEqual(self.post_transfer('Infinity').status_code, 400)
+        self.assertEqual(self.post_transfer(11).status_code, 409)
+        live_batch = LiveBatch.objects.get(product_batch=self.batches[0])
+        with self.assertRaises(StockError), transaction.atomic():
+            transfer([(live_batch.id, self.target.id, float('nan'))], "MOVE-1")
+        self.assertEqual(self.location_quantity("MAIN"), 30)
+        self.assertFalse(LiveBatch.objects.filter(location=self.target).exists())
+
+    def test_transfer_at_line_limit(self):
+        limit = settings.TRANSFER_MAX_LINES
+        nomenclatures = self.bulk_stock(limit)
+        lines = [
+            {"batch": f"{nomenclature.code}-1", "from": "MAIN", "to": "B-01", "quantity": 0.5}
+            for nomenclature in nomenclatures
+        ]
+        response = self.client.post('/transfers/', json.dumps({"lines": lines}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        moved = LocationStock.objects.filter(location=self.target, nomenclature__in=nomenclatures)
+        self.assertEqual(moved.count(), limit)
+        self.assertFalse(moved.exclude(current_quantity=0.5).exists())
+        self.assertEqual(LiveBatch.objects.filter(location=self.target).count(), limit)
+
+        lines.append(lines[0])
+        response = self.client.post('/transfers/', json.dumps({"lines": lines}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class StocktakeTests(StockTestCase):
+    def test_post_applies_shortage_and_surplus(self):
+        session = start_stocktake(nomenclature_ids=[self.nomenclature.id])
+        loaded, errors = load_counts(session, [("T001-0", "MAIN", 7), ("T001-1", "MAIN", 12)])
+        self.assertEqual((loaded, errors), (2, []))
+        with self.assertRaises(StockError), transaction.atomic():
+            deduct_fefo(self.warehouse, 1, "Продажа", "DOC-1")
+
+        self.assertEqual(post_stocktake(session), 2)
+        self.assertEqual(self.balance(), 29)
+        self.assertEqual(self.live_total(), 29)
+        self.assertEqual(LiveBatch.objects.get(product_batch=self.batches[0]).current_quantity, 7)
+
+    def test_post_whole_location_with_many_variances(self):
+        nomenclatures = self.bulk_stock(1000)
+        session = start_stocktake(location=StorageLocation.get_default())
+        rows = [(f"{n.code}-1", "MAIN", 0.0 if i % 2 else 2.0) for i, n in enumerate(nomenclatures)]
+        self.assertEqual(load_counts(session, rows), (1000, []))
+
+        self.assertEqual(post_stocktake(session), 1000)
+        self.assertEqual(
+            Warehouse.objects.filter(nomenclature__in=nomenclatures, current_quantity=2).count(), 500
+        )
+        self.assertEqual(
+            LocationStock.objects.filter(nomenclature__in=nomenclatures, current_quantity=0).count(), 500
+        )
+        self.assertEqual(LiveBatch.objects.filter(nomenclature__in=nomenclatures).count(), 500)
+        # Непересчитанные партии не меняются
+        self.assertEqual(self.balance(), 30)
+
+    def test_counts_reject_nan_and_unreceived_batches(self):
+        ProductBatch.objects.create(
+            nomenclature=self.nomenclature, batch_number="T001-NEW", quantity=5.0,
+            production_date=timezone.localdate(), expiration_date=timezone.localdate()
+        )
+        session = start_stocktake(nomenclature_ids=[self.nomenclature.id])
+        loaded, errors = load_counts(session, [
+            ("T001-0", "MAIN", float('nan')),
+            ("T001-1", "MAIN", -1),
+            ("T001-NEW", "MAIN", 5),
+        ])
+        self.assertEqual(loaded, 0)
+        self.assertEqual(len(errors), 3)
+
+    def test_document_numbers_follow_the_largest(self):
+        first = start_stocktake(nomenclature_ids=[self.nomenclature.id])
+        cancel_stocktake(first)
+        second = start_stocktake(nomenclature_ids=[self.nomenclature.id])
+        cancel_stocktake(second)
+        first.delete()
+        third = start_stocktake(nomenclature_ids=[self.nomenclature.id])
+        self.assertTrue(third.document.endswith("-003"))
+
+
+class ChangeLogTests(StockTestCase):
+    def test_rolled_back_deduction_is_not_logged(self):
+        before = ChangeLog.objects.count()
+        with self.assertRaises(StockError), transaction.atomic():
+            deduct_fefo(self.warehouse, 5, "Продажа", "DOC-1")
+            raise StockError("откат")
+        self.assertEqual(ChangeLog.objects.count(), before)
+
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 5, "Продажа", "DOC-2")
+        self.assertEqual(ChangeLog.objects.count(), before + 1)
+
+    def test_committed_changes_are_visible_at_once(self):
+        changes = changes_since(0, 100)
+        self.assertEqual(changes['seq'], ChangeLog.objects.latest('seq').seq)
+        self.assertEqual(changes['stock_nomenclature_ids'], [self.nomenclature.id])
+
+    def test_operations_and_change_log_are_last_writes_of_posting(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            deduct_fefo(self.warehouse, 5, "Продажа", "DOC-1")
+        statements = [query['sql'] for query in queries.captured_queries]
+        lock = next(n for n, sql in enumerate(statements) if '"warehouse_app_commitlock"' in sql)
+        writes = [sql for sql in statements[lock:] if sql.startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(len(writes), 2)
+        self.assertIn('"warehouse_app_operation"', writes[0])
+        self.assertIn('"warehouse_app_changelog"', writes[1])
+
+
+class ChangeLogOrderTests(TransactionTestCase):
+    # Проводка выполняется в отдельном потоке, поэтому данные должны быть зафиксированы
+    setUp = StockTestCase.setUp
+
+    def test_slow_posting_overlapping_read_is_not_skipped(self):
+        cursor = changes_since(0, 100)['seq']
+        in_posting, finish = threading.Event(), threading.Event()
+
+        def slow_balance_update(totals):
+            update_balances(totals)
+            in_posting.set()
+            finish.wait(10)
+
+        def post():
+            try:
+                with transaction.atomic():
+                    deduct_fefo(self.warehouse, 5, "Продажа", "DOC-1")
+            finally:
+                connection.close()
+
+        with mock.patch('warehouse_app.stock.update_balances', slow_balance_update):
+            worker = threading.Thread(target=post)
+            worker.start()
+            try:
+                self.assertTrue(in_posting.wait(10))
+                # Остатки уже изменены, но номер журнала ещё не выдан: клиент не сдвигает курсор
+                self.assertEqual(changes_since(cursor, 100)['seq'], cursor)
+            finally:
+                finish.set()
+                worker.join()
+
+        changes = changes_since(cursor, 100)
+        self.assertGreater(changes['seq'], cursor)
+        self.assertEqual(changes['stock_nomenclature_ids'], [self.nomenclature.id])
+
+
+class StockAlertTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        Nomenclature.objects.filter(pk=self.nomenclature.pk).update(min_stock=5, reorder_point=15)
+
+    def post_deduction(self, quantity):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            deduct_fefo(self.warehouse, quantity, "Продажа", "DOC-1")
+
+    def open_alerts(self):
+        return list(StockAlert.objects.filter(resolved_at__isnull=True).values_list('level', 'threshold'))
+
+    def test_alerts_follow_postings_after_commit(self):
+        self.post_deduction(20)
+        self.assertEqual(self.open_alerts(), [("reorder", 15)])
+        self.post_deduction(6)
+        self.assertEqual(self.open_alerts(), [("critical", 5)])
+        self.assertEqual(StockAlert.objects.filter(level="reorder", resolved_at__isnull=False).count(), 1)
+
+        batch = ProductBatch.objects.create(
+            nomenclature=self.nomenclature, batch_number="T001-3", quantity=20.0,
+            production_date=timezone.localdate(), expiration_date=timezone.localdate() + timezone.timedelta(days=20)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            batch.receive()
+        self.assertEqual(self.open_alerts(), [])
+
+    def test_rolled_back_posting_schedules_no_check(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(StockError), transaction.atomic():
+                deduct_fefo(self.warehouse, 20, "Продажа", "DOC-1")
+                raise StockError("откат")
+        self.assertEqual(callbacks, [])
+
+    def test_failed_check_does_not_affect_posting(self):
+        with mock.patch('warehouse_app.alerts.evaluate_stock_levels', side_effect=RuntimeError), \
+                self.assertLogs('warehouse_app.alerts', 'ERROR'):
+            self.post_deduction(20)
+        self.assertEqual(self.balance(), 10)
+        self.assertEqual(self.open_alerts(), [])
+
+
+class ForecastTests(StockTestCase):
+    def test_ewma_weights_match_recursive_smoothing(self):
+        series = [3.0, 0.0, 5.0, 2.0]
+        smoothed = series[0]
+        for value in series[1:]:
+            smoothed = 0.3 * value + 0.7 * smoothed
+        self.assertAlmostEqual(sum(w * x for w, x in zip(ewma_weights(4, 0.3), series)), smoothed)
+
+    def test_forecast_from_daily_deductions(self):
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 2, "Продажа", "DOC-1")
+        Operation.objects.filter(document="DOC-1").update(
+            operation_date=timezone.now() - timezone.timedelta(days=1)
+        )
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 4, "Продажа", "DOC-2")
+        [idle] = self.bulk_stock(1)
+
+        rows = {row['id']: row for row in compute_forecast(history_days=4, window=2, alpha=0.5, horizon=10)}
+        row = rows[self.nomenclature.id]
+        # История [0, 0, 2, 4]: скользящее среднее за 2 дня — 3, сглаживание — 0.5*4 + 0.5*(0.5*2) = 2.5
+        self.assertEqual(row['stock'], 24)
+        self.assertAlmostEqual(row['sma'], 3)
+        self.assertAlmostEqual(row['ewma'], 2.5)
+        self.assertAlmostEqual(row['days_of_cover'], 9.6)
+        self.assertAlmostEqual(row['to_order'], 1)
+
+        self.assertIsNone(rows[idle.id]['days_of_cover'])
+        self.assertEqual(rows[idle.id]['to_order'], 0)
+
+
+class ConsistencyTests(StockTestCase):
+    def test_postings_leave_no_mismatches(self):
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 12, "Продажа", "DOC-1")
+        self.assertEqual(find_mismatches(), [])
+        self.assertEqual(find_location_mismatches(), [])
+
+    def test_warehouse_drift_is_found_and_repaired(self):
+        Warehouse.objects.filter(pk=self.warehouse.pk).update(current_quantity=25)
+        self.assertEqual(find_mismatches(), [
+            {'nomenclature_id': self.nomenclature.id, 'warehouse': 25, 'live': 30, 'journal': 30},
+        ])
+        last_seq = ChangeLog.objects.latest('seq').seq
+
+        self.assertEqual(repair_warehouse([self.nomenclature.id]), 1)
+        self.assertEqual(self.balance(), 30)
+        self.assertEqual(find_mismatches(), [])
+        # Исправленный остаток уходит на ТСД
+        self.assertTrue(ChangeLog.objects.filter(seq__gt=last_seq, object_id=self.nomenclature.id).exists())
+
+    def test_missing_location_row_is_recreated(self):
+        location = StorageLocation.get_default()
+        LocationStock.objects.filter(nomenclature=self.nomenclature).delete()
+        mismatches = find_location_mismatches()
+        self.assertEqual(mismatches, [(location.id, self.nomenclature.id, 0, 30)])
+
+        self.assertEqual(repair_location_stock(mismatches), 1)
+        self.assertEqual(LocationStock.objects.get(nomenclature=self.nomenclature).current_quantity, 30)
+        self.assertEqual(find_location_mismatches(), [])
+
+
+class ExportJobTests(StockTestCase):
+    def test_claim_takes_oldest_pending_job_once(self):
+        now = timezone.now()
+        newer = ExportJob.objects.create(kind="warehouse", created_by=self.user, created_at=now)
+        older = ExportJob.objects.create(kind="operations", created_by=self.user,
+                                         created_at=now - timezone.timedelta(minutes=1))
+
+        job = claim_next_job()
+        self.assertEqual(job, older)
+        self.assertEqual(job.status, "running")
+        self.assertIsNotNone(job.started_at)
+        self.assertEqual(claim_next_job(), newer)
+        self.assertIsNone(claim_next_job())
+
+    def test_stale_running_job_returns_to_queue(self):
+        now = timezone.now()
+        stale = ExportJob.objects.create(kind="warehouse", status="running",
+                                         started_at=now - timezone.timedelta(hours=2))
+        fresh = ExportJob.objects.create(kind="warehouse", status="running", started_at=now)
+
+        self.assertEqual(requeue_stale_jobs(3600), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.started_at), ("pending", None))
+        self.assertEqual(fresh.status, "running")
+        self.assertEqual(claim_next_job(), stale)
+
+
+class ParquetExportTests(StockTestCase):
+    @override_settings(EXPORT_PARQUET_ROW_GROUP=2)
+    def test_archive_contains_typed_tables(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 4, "Продажа", "DOC-1")
+        with tempfile.TemporaryDirectory() as root:
+            path = Path(root) / "analytics.zip"
+            build_parquet_archive(path)
+            with zipfile.ZipFile(path) as archive:
+                self.assertEqual(sorted(archive.namelist()),
+                                 ["batches.parquet", "operations.parquet", "warehouse.parquet"])
+                files = {name: pq.ParquetFile(io.BytesIO(archive.read(name))) for name in archive.namelist()}
+            self.assertEqual(sorted(p.name for p in Path(root).iterdir()), ["analytics.zip"])
+
+        operations = files["operations.parquet"]
+        self.assertEqual(operations.metadata.num_rows, 4)
+        self.assertEqual(operations.metadata.num_row_groups, 2)
+        table = operations.read()
+        self.assertEqual(table.schema.field('operation_type').type, pa.dictionary(pa.int32(), pa.string()))
+        self.assertEqual(table.schema.field('operation_date').type, pa.timestamp('us', tz='UTC'))
+        self.assertEqual(table.column('operation_type').to_pylist(), ["reception"] * 3 + ["deduction"])
+        self.assertEqual(table.column('quantity').to_pylist(), [10.0, 10.0, 10.0, 4.0])
+        self.assertEqual(table.column('reason').to_pylist()[-1], "Продажа")
+
+        batches = files["batches.parquet"].read()
+        self.assertEqual(batches.column('batch_number').to_pylist(), ["T001-0", "T001-1", "T001-2"])
+        self.assertEqual(batches.column('expiration_date').to_pylist(), [b.expiration_date for b in self.batches])
+
+        warehouse = files["warehouse.parquet"].read().to_pylist()
+        self.assertEqual(warehouse, [{
+            'nomenclature_id': self.nomenclature.id, 'nomenclature_code': "T001",
+            'nomenclature_name': "Тест", 'unit': "кг", 'current_quantity': 26.0,
+        }])
+
+
+class IncrementalExportTests(StockTestCase):
+    def test_plan_covers_all_committed_operations(self):
+        last_id = Operation.objects.latest('id').id
+        self.assertEqual(plan_increment("erp"), (0, last_id))
+        self.assertEqual(increment_queryset(0, last_id).count(), 3)
+
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 5, "Продажа", "DOC-1")
+        self.assertEqual(plan_increment("erp"), (0, Operation.objects.latest('id').id))
+
+    def test_ack_moves_watermark_once(self):
+        from_id, to_id = plan_increment("erp")
+        self.assertFalse(is_committed("erp", to_id))
+        self.assertTrue(commit_watermark("erp", from_id, to_id))
+        self.assertTrue(is_committed("erp", to_id))
+        # Повторное подтверждение того же диапазона отклоняется
+        self.assertFalse(commit_watermark("erp", from_id, to_id))
+        self.assertEqual(plan_increment("erp"), (to_id, to_id))
+
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 5, "Продажа", "DOC-1")
+        next_from, next_to = plan_increment("erp")
+        self.assertEqual(next_from, to_id)
+        self.assertEqual(list(increment_queryset(next_from, next_to).values_list('document', flat=True)), ["DOC-1"])
+        # Отметка другого получателя независима
+        self.assertEqual(plan_increment("bi")[0], 0)
+
+
+class ArchivedReportTests(StockTestCase):
+    """Операции перенесены в архив: приёмка 30, списания 5 («Брак») и 3 («Продажа») два месяца назад"""
+
+    def setUp(self):
+        super().setUp()
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 5, "Брак", "DOC-1")
+            deduct_fefo(self.warehouse, 3, "Продажа", "DOC-2")
+        self.month = month_start(month_start(timezone.localdate()) - timezone.timedelta(days=40))
+        Operation.objects.update(operation_date=timezone.now() - (timezone.localdate() - self.month))
+        archive_operations(timezone.localdate())
+        self.month_end = next_month(self.month) - timezone.timedelta(days=1)
+
+    def test_whole_archived_month_keeps_reasons(self):
+        self.assertFalse(Operation.objects.exists())
+        reasons, rows = movement_report(self.month, self.month_end)
+        self.assertEqual(reasons, ["Брак", "Продажа"])
+        row = next(row for row in rows if row['id'] == self.nomenclature.id)
+        self.assertEqual((row['opening'], row['received'], row['deducted'], row['closing']), (0, 30, 8, 22))
+        self.assertEqual(row['by_reason'], [5, 3])
+        self.assertEqual(row['other_reasons'], 0)
+
+    def test_journal_reads_archive_hot_table_or_both(self):
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 1, "Продажа", "DOC-3")
+        boundary = archive_boundary()
+        month_dt = timezone.make_aware(timezone.datetime.combine(self.month, timezone.datetime.min.time()))
+
+        hot, is_union = journal_queryset(models.Q(), None, None, boundary, '-operation_date')
+        self.assertEqual((hot.count(), is_union), (1, False))
+        archived, is_union = journal_queryset(
+            models.Q(), month_dt, boundary - timezone.timedelta(seconds=1), boundary, '-operation_date'
+        )
+        self.assertEqual((archived.count(), is_union), (5, False))
+        combined, is_union = journal_queryset(models.Q(), month_dt, None, boundary, 'batch__batch_number')
+        self.assertEqual((len(combined), is_union), (6, True))
+        # Только конечная дата: внутри архива — архив, после границы — обе таблицы
+        archived, is_union = journal_queryset(
+            models.Q(), None, boundary - timezone.timedelta(seconds=1), boundary, '-operation_date'
+        )
+        self.assertEqual((archived.count(), is_union), (5, False))
+        combined, is_union = journal_queryset(models.Q(), None, timezone.now(), boundary, '-operation_date')
+        self.assertEqual((len(combined), is_union), (6, True))
+
+        response = self.client.get('/operation/', {'start_date': self.month.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/operation/', {'end_date': self.month_end.isoformat()})
+        self.assertContains(response, "T001-0 — Тест")
+
+    def test_period_cutting_archived_month_is_refused(self):
+        boundary = archive_boundary()
+        self.assertIsNone(archive_cut_message(self.month, self.month_end, boundary))
+        for start, end in (
+            (self.month + timezone.timedelta(days=1), self.month_end),
+            (self.month, self.month_end - timezone.timedelta(days=1)),
+        ):
+            with self.subTest(start=start, end=end):
+                self.assertIsNotNone(archive_cut_message(start, end, boundary))
+                with self.assertRaises(ValueError):
+                    movement_report(start, end)
+        response = self.client.get('/reports/movement/', {
+            'start_date': (self.month + timezone.timedelta(days=1)).isoformat(),
+            'end_date': self.month_end.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "перенесены в архив")
+
+
+class DataVersionTests(StockTestCase):
+    def test_deleting_rows_changes_version(self):
+        draft = ProductBatch.objects.create(
+            nomenclature=self.nomenclature, batch_number="T001-DRAFT", quantity=5.0,
+            production_date=timezone.localdate(), expiration_date=timezone.localdate()
+        )
+        ProductBatch.objects.create(
+            nomenclature=self.nomenclature, batch_number="T001-NEXT", quantity=5.0,
+            production_date=timezone.localdate(), expiration_date=timezone.localdate()
+        )
+        version = data_version('batches', 'live_batches')
+        draft.delete()
+        self.assertNotEqual(data_version('batches', 'live_batches'), version)
+
+        version = data_version('batches', 'live_batches')
+        LiveBatch.objects.filter(product_batch=self.batches[0]).delete()
+        self.assertNotEqual(data_version('batches', 'live_batches'), version)
+
+    def test_warehouse_list_is_not_modified_until_stock_changes(self):
+        etag = self.client.get('/warehouse/')['ETag']
+        self.assertEqual(self.client.get('/warehouse/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        LocationStock.objects.filter(nomenclature=self.nomenclature).delete()
+        self.assertEqual(self.client.get('/warehouse/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class UrlTests(SimpleTestCase):
+    def test_routes_resolve_to_section_views(self):
+        self.assertIs(resolve('/warehouse/').func, warehouse_list)
+        self.assertIs(resolve('/warehouse/events/').func, warehouse_events)
+        self.assertEqual(resolve('/warehouse/').view_name, 'warehouse_list')
+        self.assertEqual(reverse('productbatch_edit', args=[3]), '/productbatch/3/edit/')
+
+
+class ProfilingLockTests(SimpleTestCase):
+    def profiled_request(self):
+        request = RequestFactory().get('/warehouse/', HTTP_X_PROFILE='1')
+        request.user = SimpleNamespace(is_staff=True, get_username=lambda: 'staff')
+
+        async def auser():
+            return request.user
+        request.auser = auser
+        return request
+
+    def test_error_before_capture_releases_lock(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = profiling.profiling_middleware(get_response)
+        with mock.patch('warehouse_app.profiling._async_view', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                async_to_sync(middleware)(self.profiled_request())
+        self.assertFalse(profiling._busy.locked())
+
+    def test_error_entering_capture_releases_lock(self):
+        middleware = profiling.profiling_middleware(lambda request: HttpResponse())
+        with mock.patch('cProfile.Profile.enable', side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                middleware(self.profiled_request())
+        self.assertFalse(profiling._busy.locked())
+        self.assertIsNone(profiling._queries.get())
+
+    def test_busy_capture_runs_without_profiling(self):
+        with profiling._Capture('header') as outer, profiling._Capture('header') as inner:
+            self.assertTrue(outer.active)
+            self.assertFalse(inner.active)
+        self.assertFalse(profiling._busy.locked())
+
+
+class RunOnceTests(TestCase):
+    def test_action_runs_once_per_key(self):
+        calls = []
+
+        def action(idempotency_key):
+            calls.append(idempotency_key)
+            return f"проведено {len(calls)}"
+
+        self.assertEqual(run_once("k-1", "test", action), ("проведено 1", False))
+        self.assertEqual(run_once("k-1", "test", action), ("проведено 1", True))
+        self.assertEqual(run_once(None, "test", action), ("проведено 2", False))
+        self.assertEqual(len(calls), 2)
+
+    def test_failed_action_does_not_keep_key(self):
+        def failing(idempotency_key):
+            raise StockError("нет остатка")
+
+        with self.assertRaises(StockError):
+            run_once("k-2", "test", failing)
+        self.assertFalse(IdempotencyKey.objects.filter(key="k-2").exists())
+        self.assertEqual(run_once("k-2", "test", lambda key: "готово"), ("готово", False))
+
+
+@override_settings(WAREHOUSE_BALANCE_SHARDS=4)
+class ShardedBalanceTests(StockTestCase):
+    def sharded_balance(self):
+        return with_balance(Warehouse.objects).get(nomenclature=self.nomenclature).balance
+
+    def test_deduction_goes_to_shard_until_compacted(self):
+        with transaction.atomic():
+            deduct_fefo(self.warehouse, 5, "Продажа", "DOC-1")
+        # Приёмка и списание прошли через части, строка склада не менялась
+        self.assertEqual(self.balance(), 0)
+        self.assertEqual(self.sharded_balance(), 25)
+        with self.assertRaises(StockError), transaction.atomic():
+            deduct_fefo(self.warehouse, 26, "Продажа", "DOC-2")
+
+        self.assertEqual(compact_balance_shards(), 1)
+        self.assertEqual(self.balance(), 25)
+        self.assertEqual(self.sharded_balance(), 25)
+        self.assertFalse(WarehouseBalanceShard.objects.exclude(delta=0).exists())
+
+
+@mock.patch('warehouse_app.routers.replica_configured', return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    """Реплика считается подключённой; отставание берётся из кэша, без запроса к ней"""
+
+    def setUp(self):
+        cache.set('replica_lag', 0)
+        self.addCleanup(cache.delete, 'replica_lag')
+        self.router = ReplicaRouter()
+
+    def test_reads_follow_context_and_writes_go_to_primary(self, configured):
+        self.assertIsNone(self.router.db_for_read(Warehouse))
+        with _reading_from(REPLICA):
+            self.assertEqual(self.router.db_for_read(Warehouse), REPLICA)
+            self.assertIsNone(self.router.db_for_read(User))
+            self.assertEqual(self.router.db_for_write(Warehouse), 'default')
+        self.assertIsNone(self.router.db_for_read(Warehouse))
+
+    def test_use_replica_skips_writes_and_pinned_browsers(self, configured):
+        @use_replica
+        def view(request):
+            return HttpResponse(self.router.db_for_read(Warehouse) or 'default')
+
+        factory = RequestFactory()
+        self.assertEqual(view(factory.get('/')).content, REPLICA.encode())
+        self.assertEqual(view(factory.post('/')).content, b'default')
+        pinned = factory.get('/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(view(pinned).content, b'default')
+
+    def test_post_pins_browser_to_primary(self, configured):
+        middleware = replica_pin_middleware(lambda request: HttpResponse())
+        self.assertIn(PIN_COOKIE, middleware(RequestFactory().post('/')).cookies)
+        self.assertNotIn(PIN_COOKIE, middleware(RequestFactory().get('/')).cookies)
+
+    def test_lagging_replica_is_not_used(self, configured):
+        cache.set('replica_lag', settings.REPLICA_MAX_LAG_SECONDS + 1)
+        view = use_replica(lambda request: self.router.db_for_read(Warehouse))
+        self.assertIsNone(view(RequestFactory().get('/')))
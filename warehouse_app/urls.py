@@ -1,16 +1,32 @@
 from django.urls import path
-from . import views
+from .views import api, catalog, exports, journal, profiling, reports, stocktake, sync, warehouse
 
 urlpatterns = [
-    path('', views.index, name='index'),  # главная страница приложения
-    path('nomenclature/', views.nomenclature_list, name='nomenclature_list'),
-    path('nomenclature/add/', views.nomenclature_add, name='nomenclature_add'),    
-    path('productbatch/', views.productbatch_list, name='productbatch_list'),
-    path('operation/', views.operation_list, name='operation_list'),  
-    path('warehouse/', views.warehouse_list, name='warehouse_list'),  
-    path("productbatch/create/", views.productbatch_create, name="productbatch_create"),
-    path("productbatch/<int:batch_id>/edit/", views.productbatch_create, name="productbatch_edit"),
-    path("productbatch/receive/<int:batch_id>/", views.productbatch_receive, name="productbatch_receive"), 
-    path('warehouse/deduction/<int:warehouse_id>/', views.warehouse_deduction, name='warehouse_deduction'),   
-    path('export/', views.export_data, name='export_page'),      
+    path('', catalog.index, name='index'),  # главная страница приложения
+    path('nomenclature/', catalog.nomenclature_list, name='nomenclature_list'),
+    path('nomenclature/add/', catalog.nomenclature_add, name='nomenclature_add'),    
+    path('productbatch/', catalog.productbatch_list, name='productbatch_list'),
+    path('operation/', journal.operation_list, name='operation_list'),  
+    path('warehouse/', warehouse.warehouse_list, name='warehouse_list'),  
+    path('warehouse/events/', warehouse.warehouse_events, name='warehouse_events'),
+    path("productbatch/create/", catalog.productbatch_create, name="productbatch_create"),
+    path("productbatch/<int:batch_id>/edit/", catalog.productbatch_create, name="productbatch_edit"),
+    path("productbatch/receive/<int:batch_id>/", catalog.productbatch_receive, name="productbatch_receive"), 
+    path('warehouse/deduction/<int:warehouse_id>/', warehouse.warehouse_deduction, name='warehouse_deduction'),   
+    path('scan/', api.scan, name='scan'),
+    path('transfers/', api.transfer_bulk, name='transfer_bulk'),
+    path('sync/changes/', sync.sync_changes, name='sync_changes'),
+    path('sync/snapshot/', sync.sync_snapshot, name='sync_snapshot'),
+    path('stocktake/', stocktake.stocktake_list, name='stocktake_list'),
+    path('stocktake/<int:session_id>/', stocktake.stocktake_detail, name='stocktake_detail'),
+    path('stocktake/<int:session_id>/counts/', stocktake.stocktake_counts, name='stocktake_counts'),
+    path('reports/movement/', reports.movement_report, name='movement_report'),
+    path('reports/forecast/', reports.forecast_report, name='forecast_report'),
+    path('export/', exports.export_data, name='export_page'),      
+    path('export/jobs/<int:job_id>/', exports.export_job_detail, name='export_job_detail'),
+    path('export/jobs/<int:job_id>/download/', exports.export_job_download, name='export_job_download'),
+    path('export/jobs/<int:job_id>/ack/', exports.export_job_ack, name='export_job_ack'),
+    path('profiles/', profiling.profile_list, name='profile_list'),
+    path('profiles/<str:profile_id>/', profiling.profile_detail, name='profile_detail'),
+    path('profiles/<str:profile_id>/download/', profiling.profile_download, name='profile_download'),
 ]
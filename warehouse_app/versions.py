@@ -0,0 +1,55 @@
+"""
+Версии данных для условных GET-запросов (ETag) и повторного использования выгрузок.
+
+Версия складывается из нескольких дешёвых агрегатов по индексам:
+- максимальный id и число записей журнала операций — любая складская проводка
+  создаёт операцию, а число замечает удаление;
+- отметки изменения справочников (updated_at) и число их записей;
+- максимальный id и число строк остатков (Warehouse, LocationStock, LiveBatch):
+  у них нет отметки изменения, но новые и удалённые строки видны;
+- состояние архива закрытых периодов.
+Страница берёт части по всем таблицам, которые она выводит.
+Пока версия не изменилась, страница списка отвечает 304 без запроса
+списка и отрисовки шаблона, а выгрузка отдаёт уже готовый файл.
+"""
+from django.db.models import Count, Max
+
+from .models import (
+    ArchivedPeriod, LiveBatch, LocationStock, Nomenclature, Operation, ProductBatch, StorageLocation, Warehouse,
+)
+
+# Часть версии -> (queryset, агрегаты)
+VERSION_PARTS = {
+    'operations': (Operation.objects, {'count': Count('id'), 'last_id': Max('id')}),
+    'archive': (ArchivedPeriod.objects, {'count': Count('id'), 'archived_at': Max('archived_at')}),
+    'nomenclature': (Nomenclature.objects, {'count': Count('id'), 'updated_at': Max('updated_at')}),
+    'batches': (ProductBatch.objects, {'count': Count('id'), 'updated_at': Max('updated_at')}),
+    'locations': (StorageLocation.objects, {'count': Count('id'), 'updated_at': Max('updated_at')}),
+    'warehouse': (Warehouse.objects, {'count': Count('id'), 'last_id': Max('id')}),
+    'location_stock': (LocationStock.objects, {'count': Count('id'), 'last_id': Max('id')}),
+    'live_batches': (LiveBatch.objects, {'count': Count('id'), 'last_id': Max('id')}),
+}
+
+
+def _format(parts, values):
+    return ';'.join(
+        f"{part}:{','.join(str(value) for value in row.values())}"
+        for part, row in zip(parts, values)
+    )
+
+
+def data_version(*parts):
+    """Строка версии по перечисленным частям VERSION_PARTS"""
+    values = []
+    for part in parts:
+        queryset, aggregates = VERSION_PARTS[part]
+        values.append(queryset.aggregate(**aggregates))
+    return _format(parts, values)
+
+
+async def adata_version(*parts):
+    values = []
+    for part in parts:
+        queryset, aggregates = VERSION_PARTS[part]
+        values.append(await queryset.aaggregate(**aggregates))
+    return _format(parts, values)
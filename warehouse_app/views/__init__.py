@@ -0,0 +1,6 @@
+"""
+Представления приложения, по модулям разделов.
+
+Модули не импортируют тяжёлые библиотеки (openpyxl, numpy) на верхнем
+уровне: они загружаются только в коде выгрузок и прогноза.
+"""
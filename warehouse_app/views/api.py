@@ -0,0 +1,181 @@
+"""
+JSON-API для терминалов сбора данных: проводки со сканера и пакетные перемещения.
+"""
+import json
+import math
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+
+from ..balances import with_balance
+from ..models import LiveBatch, Nomenclature, ProductBatch, StorageLocation, Warehouse
+from ..stock import StockError, deduct_fefo, next_document_number, run_once, transfer
+from .common import json_error
+
+
+@require_POST
+def scan(request):
+    """
+    Быстрая проводка со сканера (ТСД): один запрос — одна операция, ответ в JSON.
+    Параметры (JSON или форма): code — номер партии или код номенклатуры,
+    action — receive (приёмка партии) или pick (списание по FEFO),
+    quantity и reason — для списания, location — код места хранения
+    (приёмка в это место или отбор только из него).
+    Повтор с тем же заголовком Idempotency-Key не проводится заново.
+    """
+    if not request.user.is_authenticated:
+        return json_error("Требуется авторизация", status=401)
+
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return json_error("Некорректный JSON")
+        if not isinstance(data, dict):
+            return json_error("Ожидается JSON-объект")
+    else:
+        data = request.POST
+
+    code = str(data.get('code', '')).strip()
+    action = data.get('action', 'receive')
+    key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+
+    # Номер партии и код номенклатуры ищутся по уникальным индексам
+    batch = ProductBatch.objects.select_related('nomenclature').filter(batch_number=code).first()
+    nomenclature = batch.nomenclature if batch else Nomenclature.objects.filter(code=code).first()
+    if nomenclature is None:
+        return json_error(f"Код {code} не найден", status=404)
+
+    location = None
+    location_code = str(data.get('location', '')).strip()
+    if location_code:
+        location = StorageLocation.objects.filter(code=location_code).first()
+        if location is None:
+            return json_error(f"Место хранения {location_code} не найдено", status=404)
+
+    if action == 'receive':
+        if batch is None:
+            return json_error("Для приёмки отсканируйте номер партии")
+        try:
+            result, repeated = run_once(
+                key or f"reception-{batch.pk}", "reception",
+                lambda idempotency_key: batch.receive(
+                    note="Приёмка со сканера", idempotency_key=idempotency_key, location=location
+                )
+            )
+        except StockError as e:
+            return json_error(str(e), status=409)
+
+    elif action == 'pick':
+        try:
+            quantity = float(data.get('quantity', 0))
+        except (TypeError, ValueError):
+            return json_error("Некорректное количество")
+        # NaN и бесконечность проходят float(), но не сравнение с нулём
+        if not math.isfinite(quantity) or quantity <= 0:
+            return json_error("Количество должно быть больше нуля")
+
+        warehouse = Warehouse.objects.filter(nomenclature=nomenclature).first()
+        if warehouse is None:
+            return json_error(f"Нет остатка по {nomenclature.name}", status=409)
+        reason = data.get('reason') or "Отбор со сканера"
+
+        def perform(idempotency_key):
+            document = next_document_number()
+            total_deducted, batches_processed = deduct_fefo(
+                warehouse, quantity, reason, document,
+                idempotency_key=idempotency_key, batch=batch, location=location
+            )
+            return (
+                f"Списано {total_deducted:.2f} {nomenclature.unit} (документ: {document}). "
+                f"Партии: {', '.join(batches_processed)}"
+            )
+
+        try:
+            result, repeated = run_once(key, "deduction", perform)
+        except StockError as e:
+            return json_error(str(e), status=409)
+
+    else:
+        return json_error(f"Неизвестное действие {action}")
+
+    balance = with_balance(Warehouse.objects.filter(nomenclature=nomenclature)).values_list('balance', flat=True).first()
+    return JsonResponse({
+        'ok': True,
+        'repeated': repeated,
+        'result': result,
+        'code': nomenclature.code,
+        'balance': balance,
+    })
+
+
+@require_POST
+def transfer_bulk(request):
+    """
+    Пакетное перемещение партий между местами хранения (волна отбора).
+    JSON: {"document": ..., "note": ..., "lines": [
+        {"batch": номер партии, "from": код места, "to": код места, "quantity": количество}, ...]}
+    Все строки проводятся одной транзакцией: при ошибке в любой строке
+    не перемещается ничего. Повтор с тем же Idempotency-Key не проводится заново.
+    """
+    if not request.user.is_authenticated:
+        return json_error("Требуется авторизация", status=401)
+
+    try:
+        data = json.loads(request.body)
+        lines = data['lines']
+    except (ValueError, KeyError, TypeError):
+        return json_error("Ожидается JSON со списком lines")
+    if not isinstance(data, dict) or not isinstance(lines, list):
+        return json_error("Ожидается JSON со списком lines")
+    if not lines or len(lines) > settings.TRANSFER_MAX_LINES:
+        return json_error(f"Количество строк должно быть от 1 до {settings.TRANSFER_MAX_LINES}")
+    try:
+        lines = [
+            (str(line['batch']), str(line['from']), str(line['to']), float(line['quantity']))
+            for line in lines
+        ]
+    except (KeyError, TypeError, ValueError):
+        return json_error("В каждой строке нужны batch, from, to и числовое quantity")
+    for n, (_, _, _, quantity) in enumerate(lines, start=1):
+        if not math.isfinite(quantity) or quantity <= 0:
+            return json_error(f"Строка {n}: количество должно быть больше нуля")
+
+    def perform(idempotency_key):
+        # Партии, места и активные партии загружаются тремя запросами на всю волну
+        batches = ProductBatch.objects.in_bulk({line[0] for line in lines}, field_name='batch_number')
+        locations = StorageLocation.objects.in_bulk(
+            {line[1] for line in lines} | {line[2] for line in lines},
+            field_name='code'
+        )
+        live_batches = {
+            (product_batch_id, location_id): lb_id
+            for lb_id, product_batch_id, location_id in LiveBatch.objects.filter(
+                product_batch_id__in=[b.id for b in batches.values()],
+                location_id__in=[loc.id for loc in locations.values()]
+            ).values_list('id', 'product_batch_id', 'location_id')
+        }
+
+        resolved = []
+        for n, (batch_number, source_code, target_code, quantity) in enumerate(lines, start=1):
+            batch = batches.get(batch_number)
+            source = locations.get(source_code)
+            target = locations.get(target_code)
+            if batch is None or source is None or target is None:
+                raise StockError(f"Строка {n}: партия или место хранения не найдены")
+            lb_id = live_batches.get((batch.id, source.id))
+            if lb_id is None:
+                raise StockError(f"Строка {n}: партии {batch.batch_number} нет в месте {source.code}")
+            resolved.append((lb_id, target.id, quantity))
+
+        document = data.get('document') or next_document_number('MOVE')
+        count = transfer(resolved, document, data.get('note') or '', idempotency_key=idempotency_key)
+        return f"Перемещено строк: {count} (документ: {document})"
+
+    try:
+        result, repeated = run_once(request.headers.get('Idempotency-Key'), "transfer", perform)
+    except StockError as e:
+        return json_error(str(e), status=409)
+
+    return JsonResponse({'ok': True, 'repeated': repeated, 'result': result})
@@ -0,0 +1,267 @@
+"""
+Справочник номенклатуры и партии продукции.
+"""
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, permission_required
+from django.db import models
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from ..forms import NomenclatureForm, ProductBatchForm
+from ..models import Nomenclature, ProductBatch
+from ..stock import StockError, run_once
+from ..versions import adata_version
+from .common import apage_etag, apaginate, arender, not_modified, with_etag
+
+
+def index(request):
+    return render(request, 'warehouse_app/index.html')
+
+
+@login_required
+async def nomenclature_list(request):
+    etag = await apage_etag(request, await adata_version('nomenclature'))
+    if response := not_modified(request, etag):
+        return response
+
+    query = request.GET.get('q', '')
+
+    sort = request.GET.get('sort', 'code')
+    direction = request.GET.get('direction', 'asc')
+    order_by = sort if direction == 'asc' else f'-{sort}'
+
+    items = Nomenclature.objects.all()
+
+    if query:
+        items = items.filter(
+            models.Q(code__icontains=query) |
+            models.Q(name__icontains=query)
+        )
+
+    items = items.order_by(order_by)
+
+    items_page = await apaginate(items, 10, request.GET.get('page'))
+
+    response = await arender(request, 'warehouse_app/nomenclature_list.html', {
+        'items': items_page,
+        'query': query,
+        'sort': sort,
+        'direction': direction,
+    })
+    return with_etag(response, etag)
+
+
+@login_required
+@permission_required('warehouse_app.add_nomenclature', raise_exception=True)
+def nomenclature_add(request):
+    if request.method == 'POST':
+        form = NomenclatureForm(request.POST)
+        if form.is_valid():
+            form.save()
+            return redirect('nomenclature_list')
+    else:
+        # Автогенерация кода номенклатуры: NOM001, NOM002, ...
+        
+        # Находим максимальный существующий номер
+        last_nomenclature = Nomenclature.objects.filter(
+            code__startswith='NOM'
+        ).order_by('code').last()
+        
+        if last_nomenclature:
+            try:
+                # Извлекаем числовую часть: NOM001 → 1
+                last_num = int(last_nomenclature.code[3:])  # Убираем 'NOM'
+                next_num = last_num + 1
+            except (ValueError, IndexError):
+                next_num = 1
+        else:
+            next_num = 1
+        
+        # Форматируем: 1 → '001', 25 → '025', 123 → '123'
+        suggested_code = f'NOM{next_num:03d}'
+        
+        # Создаем форму с предзаполненным кодом
+        form = NomenclatureForm(initial={'code': suggested_code})
+    
+    return render(request, 'warehouse_app/nomenclature_add.html', {'form': form})
+
+
+async def productbatch_list(request):
+    batches = ProductBatch.objects.select_related('nomenclature')
+    
+    # --- Поиск ---
+    query = request.GET.get('q', '')
+    if query:
+        batches = batches.filter(
+            models.Q(batch_number__icontains=query) |
+            models.Q(nomenclature__name__icontains=query)
+        )
+
+    # --- Фильтры по датам ---
+    start_production_date = request.GET.get('start_production_date', '')
+    end_production_date = request.GET.get('end_production_date', '')
+    start_reception_date = request.GET.get('start_reception_date', '')
+    end_reception_date = request.GET.get('end_reception_date', '')
+    start_expiration_date = request.GET.get('start_expiration_date', '')
+    end_expiration_date = request.GET.get('end_expiration_date', '')
+
+    if start_production_date:
+        batches = batches.filter(production_date__gte=start_production_date)
+    if end_production_date:
+        batches = batches.filter(production_date__lte=end_production_date)
+
+    if start_reception_date:
+        batches = batches.filter(reception_date__date__gte=start_reception_date)
+    if end_reception_date:
+        batches = batches.filter(reception_date__date__lte=end_reception_date)
+
+    if start_expiration_date:
+        batches = batches.filter(expiration_date__gte=start_expiration_date)
+    if end_expiration_date:
+        batches = batches.filter(expiration_date__lte=end_expiration_date)
+
+    # --- Сортировка ---
+    sort_param = request.GET.get('sort')
+    direction = request.GET.get('direction', 'asc')
+    
+    # Определяем валидные поля для сортировки
+    valid_sort_fields = [
+        'batch_number', 'nomenclature__name', 'quantity', 
+        'production_date', 'reception_date', 'expiration_date'
+    ]
+    
+    # Если sort_param пустой, None или не в списке - используем значение по умолчанию
+    if not sort_param or sort_param not in valid_sort_fields:
+        sort_param = 'production_date'
+    
+    # Применяем направление сортировки
+    if direction == 'desc':
+        sort_param = '-' + sort_param
+    
+    batches = batches.order_by(sort_param)
+
+    # --- Пагинация ---
+    page_obj = await apaginate(batches, 10, request.GET.get('page'))
+
+    # --- Контекст для шаблона ---
+    # Для шаблона получаем sort без префикса '-'
+    sort_for_template = request.GET.get('sort', 'production_date')
+    if sort_for_template.startswith('-'):
+        sort_for_template = sort_for_template[1:]
+    
+    # Убираем sort из template, если он пустой
+    if not sort_for_template:
+        sort_for_template = 'production_date'
+
+    context = {
+        'batches': page_obj,
+        'query': query,
+        'sort': sort_for_template,
+        'direction': direction,
+        'start_production_date': start_production_date,
+        'end_production_date': end_production_date,
+        'start_reception_date': start_reception_date,
+        'end_reception_date': end_reception_date,
+        'start_expiration_date': start_expiration_date,
+        'end_expiration_date': end_expiration_date,
+    }
+
+    return await arender(request, 'warehouse_app/productbatch_list.html', context)
+
+
+@login_required
+def productbatch_create(request, batch_id=None):
+    if batch_id:
+        # Режим редактирования существующей партии
+        batch = get_object_or_404(ProductBatch, pk=batch_id)
+        
+        # Вычисляем shelf_life_days для формы
+        shelf_life_days = 0
+        if batch.production_date and batch.expiration_date:
+            delta = batch.expiration_date - batch.production_date
+            shelf_life_days = delta.days
+        
+        # Передаем initial в форму
+        form = ProductBatchForm(
+            request.POST or None, 
+            instance=batch,
+            initial={
+                'shelf_life_days': shelf_life_days,
+                'production_date': batch.production_date
+            }
+        )
+    else:
+        # Режим создания новой партии
+        batch = None
+        
+        # Генерация номера партии: TEST-NOMYYYYMMDD-XXX
+        today = timezone.now().strftime('%Y%m%d')
+        prefix = f'TEST-NOM{today}-'
+        
+        # Находим последний номер на сегодня
+        last_batch = ProductBatch.objects.filter(
+            batch_number__startswith=prefix
+        ).order_by('batch_number').last()
+        
+        if last_batch:
+            # Извлекаем последний номер и увеличиваем
+            try:
+                last_num = int(last_batch.batch_number.split('-')[-1])
+                next_num = f'{last_num + 1:03d}'  # 001, 002, ...
+            except (ValueError, IndexError):
+                next_num = '001'
+        else:
+            next_num = '001'
+        
+        suggested_number = f'{prefix}{next_num}'
+        
+        # Создаем форму с предзаполненным номером
+        form = ProductBatchForm(request.POST or None, initial={'batch_number': suggested_number})
+        
+        # Если передана номенклатура через GET - предзаполняем
+        nomenclature_id = request.GET.get('nomenclature_id')
+        if nomenclature_id and not request.POST:
+            try:
+                nomenclature = Nomenclature.objects.get(id=nomenclature_id)
+                form.initial['nomenclature'] = nomenclature
+            except Nomenclature.DoesNotExist:
+                pass
+
+    if request.method == "POST":
+        if form.is_valid():
+            batch = form.save(commit=False)
+            if not batch_id:
+                batch.reception_date = None
+            batch.save()
+                
+            return redirect("productbatch_list")
+
+    return render(
+        request,
+        "warehouse_app/productbatch_form.html",
+        {
+            "form": form,
+            "batch": batch,
+        }
+    )
+
+
+@require_POST
+def productbatch_receive(request, batch_id):
+    batch = get_object_or_404(ProductBatch, pk=batch_id)
+    # Партию можно принять только один раз, поэтому ключ по умолчанию — её id
+    key = request.POST.get('idempotency_key') or f"reception-{batch.pk}"
+    try:
+        result, repeated = run_once(
+            key, "reception",
+            lambda idempotency_key: batch.receive(note="Принятие через интерфейс", idempotency_key=idempotency_key)
+        )
+    except StockError as e:
+        messages.error(request, str(e))
+        return redirect("productbatch_list")
+    if repeated:
+        messages.info(request, f"Запрос уже обработан: {result}")
+    else:
+        messages.success(request, result)
+    return redirect("productbatch_list")
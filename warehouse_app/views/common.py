@@ -0,0 +1,86 @@
+"""
+Общие помощники представлений: асинхронная пагинация и рендеринг,
+условные GET-запросы (ETag), JSON-ошибки для API и период отчёта из запроса.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.core.paginator import Paginator
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import quote_etag
+
+
+async def apaginate(queryset, per_page, page_number):
+    """
+    Асинхронная пагинация: COUNT и выборка страницы выполняются через async ORM,
+    поэтому представление не занимает поток на время ожидания базы.
+    """
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()
+    page = paginator.get_page(page_number)
+    page.object_list = [obj async for obj in page.object_list]
+    return page
+
+
+async def arender(request, template_name, context):
+    """
+    Рендеринг шаблона из async-представления.
+    Шаблоны обращаются к request.user и perms синхронно, поэтому заранее
+    загружаем пользователя и его права через async API.
+    """
+    request.user = await request.auser()
+    if request.user.is_authenticated:
+        await request.user.aget_all_permissions()
+    return render(request, template_name, context)
+
+
+async def apage_etag(request, version):
+    """
+    ETag страницы по версии данных (versions.py), адресу и пользователю —
+    меню и кнопки у каждого пользователя свои.
+    None, если условный ответ недопустим: у пользователя есть непоказанные
+    сообщения, которые 304 не выведет. Сессия загружается здесь через async API.
+    """
+    request.user = await request.auser()
+    if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+        return None
+    raw = f"{request.user.pk}|{request.get_full_path()}|{version}"
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """Ответ 304 (или 412), если у клиента актуальная копия; иначе None"""
+    if etag is None and last_modified is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def with_etag(response, etag):
+    """
+    Проставляет ETag и требует от браузера перепроверки при каждом показе:
+    опрос неизменившейся страницы обходится одним запросом версии и ответом 304
+    """
+    if etag is not None and response.status_code == 200:
+        response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def json_error(error, status=400):
+    return JsonResponse({'ok': False, 'error': error}, status=status)
+
+
+def report_period(request):
+    """Период отчёта из GET/POST; по умолчанию — с начала месяца по сегодня"""
+    today = timezone.localdate()
+    start = parse_date(request.GET.get('start_date') or request.POST.get('start_date') or '')
+    end = parse_date(request.GET.get('end_date') or request.POST.get('end_date') or '')
+    start = start or today.replace(day=1)
+    end = end or today
+    if end < start:
+        start, end = end, start
+    return start, end
@@ -0,0 +1,142 @@
+"""
+Фоновые выгрузки: постановка в очередь, статус задания и скачивание файла.
+"""
+import os
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_POST
+
+from ..archive import archive_boundary
+from ..exports import EXPORT_BUILDERS, EXPORT_VERSION_PARTS, enqueue_export
+from ..incremental import commit_watermark, is_committed, plan_increment
+from ..models import ExportJob
+from ..reports import archive_cut_message
+from ..routers import use_replica
+from ..versions import data_version
+from .common import not_modified, report_period
+
+
+def _reusable_job(user, kind, params):
+    """Задание пользователя с теми же параметрами и версией данных: в очереди или с файлом"""
+    jobs = ExportJob.objects.filter(
+        created_by=user, kind=kind, params=params, status__in=("pending", "running", "done")
+    ).order_by('-created_at')
+    for job in jobs[:5]:
+        if job.status != "done" or os.path.exists(job.file_path):
+            return job
+    return None
+
+
+@login_required
+@use_replica
+def export_data(request):
+    """
+    Постановка выгрузки в очередь. Файл формирует воркер run_export_worker,
+    пользователь следит за статусом на странице задания.
+    """
+    if request.method == "POST":
+        export_type = request.POST.get("export_type")
+        if export_type not in EXPORT_BUILDERS:
+            return HttpResponse("Неверный тип экспорта", status=400)
+
+        params = {}
+        if export_type == "movement":
+            start, end = report_period(request)
+            error = archive_cut_message(start, end, archive_boundary())
+            if error:
+                messages.error(request, error)
+                return redirect('export_page')
+            params = {'start_date': start.isoformat(), 'end_date': end.isoformat()}
+        elif export_type == "operations_incremental":
+            # Отметку получателя сдвигает подтверждение — доступно только персоналу
+            if not request.user.is_staff:
+                return HttpResponse("Инкрементальная выгрузка доступна только персоналу", status=403)
+            consumer = request.POST.get("consumer", "").strip()
+            if not consumer:
+                return HttpResponse("Не указан получатель выгрузки", status=400)
+            from_id, to_id = plan_increment(consumer)
+            if to_id == from_id:
+                messages.info(request, f"Новых операций для «{consumer}» нет")
+                return redirect('export_page')
+            params = {'consumer': consumer, 'from_id': from_id, 'to_id': to_id}
+        # Пока данные не менялись, повторный запрос получает уже готовый файл
+        params['version'] = data_version(*EXPORT_VERSION_PARTS[export_type])
+
+        job = _reusable_job(request.user, export_type, params)
+        if job is None:
+            job = enqueue_export(export_type, user=request.user, params=params)
+        return redirect('export_job_detail', job_id=job.id)
+
+    # GET-запрос — показать страницу с выбором экспорта и последними заданиями
+    jobs = ExportJob.objects.filter(created_by=request.user)[:10]
+    return render(request, 'warehouse_app/export_page.html', {'jobs': jobs})
+
+
+def _get_export_job(request, job_id):
+    """Задание доступно автору и персоналу"""
+    job = get_object_or_404(ExportJob, pk=job_id)
+    if job.created_by_id != request.user.id and not request.user.is_staff:
+        raise Http404("Задание не найдено")
+    return job
+
+
+@login_required
+def export_job_detail(request, job_id):
+    job = _get_export_job(request, job_id)
+    committed = None
+    if job.kind == "operations_incremental":
+        committed = is_committed(job.params['consumer'], job.params['to_id'])
+    return render(request, 'warehouse_app/export_job.html', {'job': job, 'committed': committed})
+
+
+@login_required
+@require_POST
+def export_job_ack(request, job_id):
+    """
+    Подтверждение доставки инкрементальной выгрузки: отметка получателя
+    сдвигается на конец диапазона задания, если её не сдвинули раньше
+    """
+    job = _get_export_job(request, job_id)
+    if job.kind != "operations_incremental" or job.status != "done":
+        raise Http404("Подтверждать можно только готовую инкрементальную выгрузку")
+
+    params = job.params
+    if commit_watermark(params['consumer'], params['from_id'], params['to_id']):
+        messages.success(request, f"Получение подтверждено: операции до #{params['to_id']}")
+    elif is_committed(params['consumer'], params['to_id']):
+        messages.info(request, "Получение этой выгрузки уже подтверждено")
+    else:
+        messages.error(
+            request,
+            "Отметка получателя изменилась после постановки выгрузки в очередь. "
+            "Сформируйте выгрузку заново."
+        )
+    return redirect('export_job_detail', job_id=job.id)
+
+
+@login_required
+def export_job_download(request, job_id):
+    job = _get_export_job(request, job_id)
+    if job.status != "done" or not job.file_path:
+        raise Http404("Файл ещё не готов")
+
+    # Файл задания после формирования не меняется
+    etag = quote_etag(f"export-{job.pk}-{job.finished_at.timestamp():.0f}")
+    last_modified = int(job.finished_at.timestamp())
+    if response := not_modified(request, etag, last_modified):
+        return response
+
+    try:
+        file = open(job.file_path, 'rb')
+    except FileNotFoundError:
+        raise Http404("Файл выгрузки удалён")
+
+    extension = job.file_path.rsplit('.', 1)[-1]
+    response = FileResponse(file, as_attachment=True, filename=f"{job.kind}.{extension}")
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,91 @@
+"""
+Журнал операций: оперативная таблица и архив закрытых периодов.
+"""
+from datetime import datetime, time
+
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ..archive import aarchive_boundary, journal_queryset
+from ..models import Nomenclature, ProductBatch
+from ..routers import use_replica
+from ..versions import adata_version
+from .common import apage_etag, apaginate, arender, not_modified, with_etag
+
+
+@use_replica
+async def operation_list(request):
+    # Журнал только дополняется; архивация переносит операции между таблицами
+    etag = await apage_etag(request, await adata_version('operations', 'archive', 'nomenclature', 'batches'))
+    if response := not_modified(request, etag):
+        return response
+
+    query = request.GET.get('q', '')
+    start_date_str = request.GET.get('start_date', '')
+    end_date_str = request.GET.get('end_date', '')
+    order_by = request.GET.get('order_by', '-operation_date')
+    page_number = request.GET.get('page', 1)
+
+    filters = models.Q()
+
+    # Фильтр по тексту
+    if query:
+        filters &= (
+            models.Q(batch__batch_number__icontains=query) |
+            models.Q(nomenclature__name__icontains=query)
+        )
+
+    # Фильтр по диапазону дат с учётом времени
+    start_datetime = None
+    end_datetime = None
+
+    if start_date_str:
+        # начало дня
+        start_dt = parse_date(start_date_str)
+        if start_dt:
+            start_datetime = timezone.make_aware(datetime.combine(start_dt, time.min))
+
+    if end_date_str:
+        # конец дня
+        end_dt = parse_date(end_date_str)
+        if end_dt:
+            end_datetime = timezone.make_aware(datetime.combine(end_dt, time.max))
+
+    if start_datetime and end_datetime:
+        filters &= models.Q(operation_date__range=[start_datetime, end_datetime])
+    elif start_datetime:
+        filters &= models.Q(operation_date__gte=start_datetime)
+    elif end_datetime:
+        filters &= models.Q(operation_date__lte=end_datetime)
+
+    # Источник: оперативный журнал, архив или оба — по запрошенному периоду
+    archive_boundary = await aarchive_boundary()
+    operations, is_union = journal_queryset(filters, start_datetime, end_datetime, archive_boundary, order_by)
+    if not is_union:
+        operations = operations.select_related('batch', 'nomenclature')
+
+    # Пагинация
+    page_obj = await apaginate(operations, 10, page_number)  # 10 записей на страницу
+
+    if is_union:
+        # select_related недоступен для union: подгружаем связи отдельными запросами
+        batches = await ProductBatch.objects.ain_bulk({op.batch_id for op in page_obj if op.batch_id})
+        nomenclatures = await Nomenclature.objects.ain_bulk({op.nomenclature_id for op in page_obj if op.nomenclature_id})
+        for op in page_obj:
+            op.batch = batches.get(op.batch_id)
+            op.nomenclature = nomenclatures.get(op.nomenclature_id)
+
+    response = await arender(
+        request,
+        'warehouse_app/operation_list.html',
+        {
+            'operations': page_obj,
+            'query': query,
+            'start_date': start_date_str,
+            'end_date': end_date_str,
+            'order_by': order_by,
+            'archive_boundary': archive_boundary,
+        }
+    )
+    return with_etag(response, etag)
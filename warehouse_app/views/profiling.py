@@ -0,0 +1,42 @@
+"""
+Сохранённые профили запросов (profiling.py): самые медленные запросы,
+сводка cProfile и журнал SQL выбранного запроса. Только для персонала.
+"""
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+from ..profiling import load_profile, load_profiles, profile_root
+
+
+@staff_member_required
+def profile_list(request):
+    return render(request, 'warehouse_app/profile_list.html', {
+        'profiles': load_profiles()[:100],
+        'header': settings.PROFILE_HEADER,
+    })
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise Http404("Профиль не найден")
+    queries = sorted(profile['queries'], key=lambda query: query['ms'], reverse=True)
+    return render(request, 'warehouse_app/profile_detail.html', {
+        'profile': profile,
+        'slowest_queries': queries[:20],
+    })
+
+
+@staff_member_required
+def profile_download(request, profile_id):
+    """Файл .prof для pstats, snakeviz и подобных инструментов"""
+    if load_profile(profile_id, limit=0) is None:
+        raise Http404("Профиль не найден")
+    return FileResponse(
+        open(profile_root() / f"{profile_id}.prof", 'rb'),
+        as_attachment=True,
+        filename=f"{profile_id}.prof"
+    )
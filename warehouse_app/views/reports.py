@@ -0,0 +1,93 @@
+"""
+Отчёты: движение продукции за период и прогноз расхода.
+"""
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import models
+from django.shortcuts import render
+
+from ..archive import aarchive_boundary
+from ..forecast import cached_forecast
+from ..models import Operation
+from ..reports import (
+    archive_cut_message, archived_reasons_queryset, finish_rows, movement_queryset, reason_summaries_queryset,
+    reasons_queryset, summaries_queryset, top_reasons,
+)
+from ..routers import use_replica
+from .common import apaginate, arender, report_period
+
+
+@login_required
+@use_replica
+async def movement_report(request):
+    """
+    Отчёт о движении продукции за период: начальный остаток, приход, расход
+    по причинам, конечный остаток и оборачиваемость по каждой номенклатуре.
+    """
+    start, end = report_period(request)
+    page_number = request.GET.get('page', 1)
+
+    # По архивным месяцам есть только итоги за месяц целиком
+    error = archive_cut_message(start, end, await aarchive_boundary())
+    if error:
+        return await arender(request, 'warehouse_app/report_movement.html', {
+            'rows': [],
+            'reasons': [],
+            'error': error,
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+        })
+
+    # Ключ кэша меняется с каждой новой операцией
+    last = await Operation.objects.aaggregate(last_id=models.Max('id'))
+    cache_key = f"movement_report:{start}:{end}:{page_number}:{last['last_id']}"
+    cached = await cache.aget(cache_key)
+    if cached is None:
+        reasons = top_reasons(
+            [row async for row in reasons_queryset(start, end)],
+            [row async for row in archived_reasons_queryset(start, end)],
+        )
+        page = await apaginate(movement_queryset(start, end, reasons), 20, page_number)
+        nomenclature_ids = [row['id'] for row in page]
+        summaries = [s async for s in summaries_queryset(nomenclature_ids, start, end)]
+        reason_summaries = [
+            s async for s in reason_summaries_queryset(nomenclature_ids, start, end, reasons)
+        ]
+        rows = finish_rows(list(page), summaries, start, end, reasons, reason_summaries)
+        cached = (reasons, rows, page.paginator.count)
+        await cache.aset(cache_key, cached, settings.REPORT_CACHE_TIMEOUT)
+
+    reasons, rows, count = cached
+    paginator = Paginator([], 20)
+    paginator.count = count
+    page = paginator.get_page(page_number)
+    page.object_list = rows
+
+    return await arender(request, 'warehouse_app/report_movement.html', {
+        'rows': page,
+        'reasons': reasons,
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+    })
+
+
+@login_required
+@use_replica
+def forecast_report(request):
+    """
+    Прогноз расхода и запас в днях по каждой номенклатуре.
+    Сначала номенклатуры, которых хватит на меньшее число дней.
+    """
+    rows = sorted(
+        cached_forecast(),
+        key=lambda row: (row['days_of_cover'] is None, row['days_of_cover'] or 0, row['code'])
+    )
+    page = Paginator(rows, 20).get_page(request.GET.get('page', 1))
+    return render(request, 'warehouse_app/report_forecast.html', {
+        'rows': page,
+        'history_days': settings.FORECAST_HISTORY_DAYS,
+        'horizon_days': settings.FORECAST_HORIZON_DAYS,
+        'window_days': settings.FORECAST_SMA_WINDOW,
+    })
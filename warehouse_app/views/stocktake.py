@@ -0,0 +1,120 @@
+"""
+Инвентаризация: сессии пересчёта, загрузка фактических остатков и проведение.
+"""
+import json
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import models
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
+
+from ..models import Nomenclature, StocktakeSession, StorageLocation
+from ..stock import StockError
+from ..stocktake import (
+    cancel_stocktake, load_counts, parse_counts_csv, post_stocktake, start_stocktake, variance_queryset,
+)
+from .common import json_error
+
+
+@login_required
+def stocktake_list(request):
+    """Список инвентаризаций и открытие новой"""
+    if request.method == "POST":
+        location = StorageLocation.objects.filter(code=request.POST.get('location', '')).first()
+        codes = request.POST.get('codes', '').split()
+        nomenclature_ids = None
+        if codes:
+            nomenclature_ids = list(Nomenclature.objects.filter(code__in=codes).values_list('id', flat=True))
+            if not nomenclature_ids:
+                messages.error(request, "Номенклатура с указанными кодами не найдена")
+                return redirect('stocktake_list')
+        try:
+            session = start_stocktake(location, nomenclature_ids, request.user, request.POST.get('note', '').strip())
+        except StockError as e:
+            messages.error(request, str(e))
+            return redirect('stocktake_list')
+        messages.success(request, f"Инвентаризация {session.document} открыта, проводки по её номенклатуре приостановлены")
+        return redirect('stocktake_detail', session_id=session.id)
+
+    sessions = StocktakeSession.objects.select_related('location', 'created_by')
+    return render(request, 'warehouse_app/stocktake_list.html', {
+        'sessions': Paginator(sessions, 20).get_page(request.GET.get('page')),
+        'locations': StorageLocation.objects.filter(is_active=True),
+    })
+
+
+@login_required
+def stocktake_detail(request, session_id):
+    """
+    Строки инвентаризации с расхождениями, загрузка файла пересчёта,
+    проведение и отмена.
+    """
+    session = get_object_or_404(StocktakeSession.objects.select_related('location'), pk=session_id)
+
+    if request.method == "POST":
+        action = request.POST.get('action')
+        try:
+            if action == 'upload':
+                uploaded = request.FILES.get('file')
+                if uploaded is None:
+                    raise StockError("Выберите файл пересчёта")
+                loaded, errors = load_counts(session, parse_counts_csv(uploaded))
+                messages.success(request, f"Загружено строк пересчёта: {loaded}")
+                for error in errors[:20]:
+                    messages.warning(request, error)
+            elif action == 'post':
+                count = post_stocktake(session, zero_uncounted=bool(request.POST.get('zero_uncounted')))
+                messages.success(request, f"Инвентаризация проведена, корректировок: {count}")
+            elif action == 'cancel':
+                cancel_stocktake(session)
+                messages.info(request, "Инвентаризация отменена")
+        except StockError as e:
+            messages.error(request, str(e))
+        return redirect('stocktake_detail', session_id=session.id)
+
+    lines = variance_queryset(session).select_related(
+        'product_batch', 'location', 'nomenclature'
+    ).order_by('nomenclature__code', 'product_batch__batch_number')
+    only_differences = bool(request.GET.get('differences'))
+    if only_differences and session.status == "open":
+        lines = lines.filter(models.Q(counted_quantity__isnull=True) | ~models.Q(difference=0))
+    elif only_differences:
+        lines = lines.exclude(variance=0).exclude(variance__isnull=True)
+    summary = lines.aggregate(total=models.Count('id'), counted=models.Count('counted_quantity'))
+
+    return render(request, 'warehouse_app/stocktake_detail.html', {
+        'session': session,
+        'lines': Paginator(lines, 50).get_page(request.GET.get('page')),
+        'summary': summary,
+        'only_differences': only_differences,
+    })
+
+
+@require_POST
+def stocktake_counts(request, session_id):
+    """
+    Пакетная загрузка пересчёта со сканера.
+    JSON: {"lines": [{"batch": номер партии, "location": код места, "quantity": количество}, ...]}
+    """
+    if not request.user.is_authenticated:
+        return json_error("Требуется авторизация", status=401)
+    session = StocktakeSession.objects.filter(pk=session_id).first()
+    if session is None:
+        return json_error("Инвентаризация не найдена", status=404)
+
+    try:
+        rows = [
+            (str(line['batch']), str(line['location']), float(line['quantity']))
+            for line in json.loads(request.body)['lines']
+        ]
+    except (ValueError, KeyError, TypeError):
+        return json_error("Ожидается JSON со списком lines: batch, location, quantity")
+
+    try:
+        loaded, errors = load_counts(session, rows)
+    except StockError as e:
+        return json_error(str(e), status=409)
+    return JsonResponse({'ok': not errors, 'loaded': loaded, 'errors': errors})
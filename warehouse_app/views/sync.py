@@ -0,0 +1,38 @@
+"""
+Синхронизация ТСД: полный снимок остатков и изменения после номера журнала.
+Ответы сжимаются gzip — терминалы работают по слабому Wi-Fi.
+"""
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from ..sync import changes_since, snapshot_lines
+from .common import json_error
+
+
+@gzip_page
+@require_GET
+def sync_changes(request):
+    """
+    Изменения после номера since: GET /sync/changes/?since=N.
+    Клиент повторяет запрос с полученным seq, пока more == true.
+    """
+    if not request.user.is_authenticated:
+        return json_error("Требуется авторизация", status=401)
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return json_error("Некорректный номер since")
+    return JsonResponse(changes_since(since, settings.SYNC_CHANGES_LIMIT), json_dumps_params={'ensure_ascii': False})
+
+
+@gzip_page
+@require_GET
+def sync_snapshot(request):
+    """Полный снимок номенклатуры, остатков и активных партий потоком NDJSON"""
+    if not request.user.is_authenticated:
+        return json_error("Требуется авторизация", status=401)
+    response = StreamingHttpResponse(snapshot_lines(), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="snapshot.ndjson"'
+    return response
@@ -0,0 +1,230 @@
+"""
+Складские остатки, поток их изменений для открытой страницы склада
+и списание по партиям.
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+
+from ..balances import with_balance
+from ..forms import WarehouseDeductionForm
+from ..models import LiveBatch, LocationStock, StorageLocation, Warehouse
+from ..stock import StockError, deduct, next_document_number, run_once
+from ..sync import alast_seq, astock_updates
+from ..versions import adata_version
+from .common import apage_etag, apaginate, arender, not_modified, with_etag
+
+logger = logging.getLogger(__name__)
+
+
+async def warehouse_list(request):
+    # Остатки меняются только проводками (каждая создаёт операцию),
+    # правкой номенклатуры или мест хранения; строки остатков — отдельными частями
+    etag = await apage_etag(request, await adata_version(
+        'operations', 'nomenclature', 'locations', 'warehouse', 'location_stock', 'live_batches'
+    ))
+    if response := not_modified(request, etag):
+        return response
+
+    query = request.GET.get('q', '')
+    location_code = request.GET.get('location', '')
+
+    sort = request.GET.get('sort', 'nomenclature__code')
+    direction = request.GET.get('direction', 'asc')
+    # Остаток сортируется по аннотации: с частями он не совпадает с current_quantity
+    order_field = 'balance' if sort == 'current_quantity' else sort
+    order_by = order_field if direction == 'asc' else f'-{order_field}'
+
+    warehouses = with_balance(Warehouse.objects.select_related('nomenclature'))
+
+    if query:
+        warehouses = warehouses.filter(
+            models.Q(nomenclature__code__icontains=query) |
+            models.Q(nomenclature__name__icontains=query)
+        )
+
+    # Общий остаток берётся из сводной таблицы; при выборе места хранения
+    # остаток в нём ищется по уникальному индексу (место, номенклатура)
+    location = None
+    if location_code:
+        location = await StorageLocation.objects.filter(code=location_code).afirst()
+    if location is not None:
+        location_stock = LocationStock.objects.filter(
+            location=location,
+            nomenclature_id=models.OuterRef('nomenclature_id')
+        )
+        warehouses = warehouses.annotate(
+            location_quantity=models.Subquery(location_stock.values('current_quantity')[:1])
+        ).filter(location_quantity__gt=0)
+
+    warehouses = warehouses.order_by(order_by)
+
+    warehouses_page = await apaginate(warehouses, 10, request.GET.get('page'))
+    locations = [loc async for loc in StorageLocation.objects.filter(is_active=True)]
+
+    response = await arender(
+        request,
+        'warehouse_app/warehouse_list.html',
+        {
+            'warehouses': warehouses_page,
+            'query': query,
+            'location': location,
+            'location_code': location_code,
+            'locations': locations,
+            'sort': sort,
+            'direction': direction,
+        }
+    )
+    return with_etag(response, etag)
+
+
+async def warehouse_events(request):
+    """
+    Поток Server-Sent Events с изменениями остатков для открытой страницы склада.
+    Источник — журнал изменений ChangeLog (его пишут приёмка, списание и другие
+    проводки), поэтому события видны из любого процесса сервера.
+    Журнал опрашивается раз в SSE_POLL_SECONDS одним запросом по индексу.
+    Соединение закрывается через SSE_MAX_SECONDS; браузер переподключается сам
+    и передаёт Last-Event-ID, так что изменения не теряются.
+    Работает под ASGI (warehouse/asgi.py): под WSGI поток занимал бы поток воркера.
+    """
+    location_id = None
+    location_code = request.GET.get('location', '')
+    if location_code:
+        location_id = await StorageLocation.objects.filter(code=location_code).values_list('id', flat=True).afirst()
+
+    try:
+        since = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        since = await alast_seq()
+
+    async def stream():
+        nonlocal since
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        deadline = time.monotonic() + settings.SSE_MAX_SECONDS
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            since, updates = await astock_updates(since, location_id)
+            if updates:
+                yield f"id: {since}\nevent: stock\ndata: {json.dumps(updates, ensure_ascii=False)}\n\n"
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= settings.SSE_HEARTBEAT_SECONDS:
+                # Комментарий не даёт прокси закрыть «молчащее» соединение
+                yield ": ping\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(settings.SSE_POLL_SECONDS)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx не должен буферизовать поток
+    return response
+
+
+@login_required
+def warehouse_deduction(request, warehouse_id):
+    """
+    Оформление списания продукции со склада по партиям.
+    """
+    warehouse = get_object_or_404(with_balance(Warehouse.objects), pk=warehouse_id)
+    
+    # Активные партии номенклатуры в порядке FEFO: LiveBatch создаётся только
+    # при приёмке, поэтому все партии в нём уже приняты
+    live_batches = LiveBatch.objects.filter(
+        nomenclature_id=warehouse.nomenclature_id
+    ).select_related('product_batch', 'location').order_by('expiration_date')
+
+    # Проверяем, есть ли вообще принятые партии для списания
+    if not live_batches.exists():
+        messages.warning(
+            request,
+            f"Нет принятых партий для списания по '{warehouse.nomenclature.name}'. "
+            f"Сначала примите партии на склад."
+        )
+        return redirect('warehouse_list')
+
+    if request.method == "POST":
+        # Обработка списания по партиям
+        logger.debug(
+            "Списание %s, поля партий: %s", warehouse.nomenclature_id,
+            [f'{k}={v}' for k, v in request.POST.items() if k.startswith('batch_')]
+        )
+        reason = request.POST.get('reason', '').strip()
+        document = request.POST.get('document', '').strip()
+        note = request.POST.get('note', '').strip()
+        
+        # Если документ не указан - генерируем автоматически
+        if not document:
+            document = next_document_number()
+        
+        if not reason:
+            messages.error(request, "Укажите причину списания")
+            return redirect('warehouse_deduction', warehouse_id=warehouse.id)
+        
+        # Собираем количества по выбранным партиям
+        quantities = {}
+        for lb in live_batches:
+            qty_str = request.POST.get(f"batch_{lb.id}", '').strip()
+            if not qty_str:
+                continue
+            try:
+                qty = float(qty_str)
+                if not math.isfinite(qty):
+                    raise ValueError(qty_str)
+            except ValueError:
+                messages.error(request, f"Некорректное количество для партии {lb.product_batch.batch_number}")
+                return redirect('warehouse_deduction', warehouse_id=warehouse.id)
+            if qty > 0:
+                quantities[lb.id] = qty
+
+        if not quantities:
+            messages.error(request, "Выберите хотя бы одну партию для списания")
+            return redirect('warehouse_deduction', warehouse_id=warehouse.id)
+
+        def perform(idempotency_key):
+            total_deducted, batches_processed = deduct(
+                warehouse, quantities, reason, document, note,
+                idempotency_key=idempotency_key
+            )
+            return (
+                f"Списание оформлено (документ: {document}). "
+                f"Списано {total_deducted:.2f} {warehouse.nomenclature.unit} из {len(batches_processed)} партий. "
+                f"Партии: {', '.join(batches_processed)}"
+            )
+
+        try:
+            result, repeated = run_once(request.POST.get('idempotency_key'), "deduction", perform)
+        except StockError as e:
+            messages.error(request, str(e))
+            return redirect('warehouse_deduction', warehouse_id=warehouse.id)
+
+        if repeated:
+            messages.info(request, f"Запрос уже обработан: {result}")
+        else:
+            messages.success(request, result)
+        return redirect('warehouse_list')
+    
+    else:
+        # GET-запрос: создаем форму с автогенерацией номера документа
+        # и ключом идемпотентности для защиты от повторной отправки
+        form = WarehouseDeductionForm(initial={
+            'document': next_document_number(),
+            'idempotency_key': uuid.uuid4().hex,
+        })
+
+    return render(request, 'warehouse_app/warehouse_deduction_form.html', {
+        'warehouse': warehouse,
+        'form': form,
+        'live_batches': live_batches,
+        'now': timezone.now().date()
+    })